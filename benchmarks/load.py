@@ -0,0 +1,424 @@
+"""
+End-to-end load test: a project generated from the `slim_cli` template runs under uvicorn on localhost,
+with a seeded SQLite database, and is driven by an asyncio HTTP/WebSocket client.
+
+    python benchmarks/load.py                                   # 32 connections, 10 seconds
+    python benchmarks/load.py -c 64 -d 30 -o result.json
+    python benchmarks/load.py --mix get=5,list=5,set=2,new=1,delete=1,info=1,hello=1,ws=1
+
+Operations of the mix:
+    get, list, set, new, delete: CRUD interfaces of `example` table
+    info, hello: `MiscView` of the template
+    ws: a message echoed by a websocket (uvicorn needs `websockets` or `wsproto` installed)
+
+Throughput and p50/p95/p99 latency of every operation are printed, and written as json with `-o`.
+The request sequence is decided by `--seed`, so runs of different slim versions are comparable.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT_DIR)
+
+DEFAULT_MIX = 'get=4,list=4,set=1,new=1,delete=1,info=1'
+
+# Runs in the generated project directory
+SERVER_SCRIPT = '''
+import random
+import sys
+
+import uvicorn
+from slim.base.permission import Ability
+from slim.base.ws import WebSocket
+from slim.utils.autoload import import_path
+
+import config
+from app import app
+import permissions.roles_apply
+import model._models
+from model.example import Example
+from permissions.roles import visitor
+
+import_path('./api')
+
+# visitors have all permissions of example table in load tests
+visitor.rules.update(Ability({'example': '*'}).rules)
+
+
+@app.route.websocket('echo')
+class EchoWebSocket(WebSocket):
+    async def on_receive(self, data):
+        await self.send(data)
+
+
+rows, seed = int(sys.argv[1]), int(sys.argv[2])
+rnd = random.Random(seed)
+Example.delete().execute()
+with Example._meta.database.atomic():
+    for i in range(0, rows, 500):
+        Example.insert_many([{'test': 'row %d %x' % (j, rnd.getrandbits(64))}
+                             for j in range(i, min(i + 500, rows))]).execute()
+
+app.prepare()
+uvicorn.run(app, host=config.HOST, port=config.PORT, log_level='error', access_log=False)
+'''
+
+
+class HTTPConnection:
+    """
+    Minimal HTTP/1.1 keep-alive client, enough for the responses of uvicorn
+    """
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+
+    async def request(self, method: str, path: str, body: Optional[bytes] = None,
+                      content_type='application/json') -> Tuple[int, bytes]:
+        if self.writer is None:
+            await self.connect()
+
+        lines = ['%s %s HTTP/1.1' % (method, path), 'Host: %s:%d' % (self.host, self.port)]
+        if body is not None:
+            lines.append('Content-Type: %s' % content_type)
+            lines.append('Content-Length: %d' % len(body))
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + (body or b''))
+
+        try:
+            status_line = await self.reader.readuntil(b'\r\n')
+            status = int(status_line.split(b' ', 2)[1])
+            headers = {}
+            while True:
+                line = await self.reader.readuntil(b'\r\n')
+                if line == b'\r\n':
+                    break
+                k, v = line.decode('latin-1').split(':', 1)
+                headers[k.strip().lower()] = v.strip()
+
+            if 'content-length' in headers:
+                data = await self.reader.readexactly(int(headers['content-length']))
+            elif headers.get('transfer-encoding') == 'chunked':
+                chunks = []
+                while True:
+                    size = int((await self.reader.readuntil(b'\r\n')).split(b';', 1)[0], 16)
+                    chunks.append((await self.reader.readexactly(size + 2))[:size])  # with trailing \r\n
+                    if size == 0:
+                        break
+                data = b''.join(chunks)
+            else:
+                data = await self.reader.read()
+                self.close()
+
+            if headers.get('connection') == 'close':
+                self.close()
+            return status, data
+        except Exception:
+            self.close()
+            raise
+
+
+class WebSocketConnection:
+    """
+    Minimal websocket client, text frames only
+    """
+
+    def __init__(self, host: str, port: int, path: str):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        key = base64.b64encode(os.urandom(16)).decode('ascii')
+        self.writer.write((
+            'GET %s HTTP/1.1\r\nHost: %s:%d\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+            'Sec-WebSocket-Key: %s\r\nSec-WebSocket-Version: 13\r\n\r\n' % (self.path, self.host, self.port, key)
+        ).encode('latin-1'))
+        head = await self.reader.readuntil(b'\r\n\r\n')
+        if not head.startswith(b'HTTP/1.1 101'):
+            self.close()
+            raise ConnectionError('websocket handshake failed: %r' % head.split(b'\r\n', 1)[0])
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+
+    async def echo(self, text: str) -> str:
+        if self.writer is None:
+            await self.connect()
+
+        payload = text.encode('utf-8')
+        mask = os.urandom(4)
+        header = bytearray([0x81])  # FIN, text
+        if len(payload) < 126:
+            header.append(0x80 | len(payload))
+        else:
+            header.append(0x80 | 126)
+            header += len(payload).to_bytes(2, 'big')
+        masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        self.writer.write(bytes(header) + mask + masked)
+
+        b1, b2 = await self.reader.readexactly(2)
+        length = b2 & 0x7f
+        if length == 126:
+            length = int.from_bytes(await self.reader.readexactly(2), 'big')
+        elif length == 127:
+            length = int.from_bytes(await self.reader.readexactly(8), 'big')
+        return (await self.reader.readexactly(length)).decode('utf-8')
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class LoadClient:
+    def __init__(self, host: str, port: int, mix: Dict[str, int], rows: int, seed: int):
+        self.host = host
+        self.port = port
+        self.ops = list(mix.keys())
+        self.weights = list(mix.values())
+        self.rows = rows
+        self.seed = seed
+
+        self.latencies: Dict[str, List[float]] = {x: [] for x in self.ops}
+        self.errors: Dict[str, int] = {x: 0 for x in self.ops}
+        self.new_ids: List[int] = []  # records created by `new`, removed by `delete`
+
+    async def do(self, op: str, rnd: random.Random, http: HTTPConnection, ws: WebSocketConnection) -> bool:
+        if op == 'ws':
+            text = 'ping %d' % rnd.getrandbits(32)
+            return await ws.echo(text) == text
+
+        if op == 'get':
+            status, data = await http.request('GET', '/api/example/get?' + urlencode({'id': rnd.randint(1, self.rows)}))
+        elif op == 'list':
+            status, data = await http.request('GET', '/api/example/list/%d?order=id.desc' % rnd.randint(1, 10))
+        elif op == 'set':
+            body = json.dumps({'test': 'updated %x' % rnd.getrandbits(32)}).encode('utf-8')
+            status, data = await http.request('POST', '/api/example/set?id=%d' % rnd.randint(1, self.rows), body)
+        elif op == 'new':
+            body = json.dumps({'test': 'new %x' % rnd.getrandbits(32)}).encode('utf-8')
+            status, data = await http.request('POST', '/api/example/new?returning=true', body)
+            if status == 200:
+                ret = json.loads(data)
+                if ret.get('code') == 0 and isinstance(ret.get('data'), dict):
+                    self.new_ids.append(ret['data']['id'])
+        elif op == 'delete':
+            if not self.new_ids:
+                return True  # nothing to delete, do not count it
+            status, data = await http.request('POST', '/api/example/delete?id=%d' % self.new_ids.pop())
+        elif op == 'info':
+            status, data = await http.request('GET', '/api/misc/info')
+        elif op == 'hello':
+            status, data = await http.request('POST', '/api/misc/hello', b'{"name": "load"}')
+        else:
+            raise ValueError('unknown operation: %s' % op)
+
+        return status == 200 and json.loads(data).get('code') == 0
+
+    async def worker(self, index: int, deadline: float):
+        rnd = random.Random(self.seed * 100003 + index)
+        http = HTTPConnection(self.host, self.port)
+        ws = WebSocketConnection(self.host, self.port, '/ws/echo')
+        try:
+            while time.perf_counter() < deadline:
+                op = rnd.choices(self.ops, self.weights)[0]
+                start = time.perf_counter()
+                try:
+                    ok = await self.do(op, rnd, http, ws)
+                except (OSError, asyncio.IncompleteReadError, ValueError):
+                    ok = False
+                elapsed = time.perf_counter() - start
+
+                if ok:
+                    self.latencies[op].append(elapsed)
+                else:
+                    self.errors[op] += 1
+                    if not http.writer:
+                        await asyncio.sleep(0.01)  # connection refused or closed, do not spin
+        finally:
+            http.close()
+            ws.close()
+
+    async def run(self, concurrency: int, duration: float) -> float:
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*[self.worker(i, deadline) for i in range(concurrency)])
+        return time.perf_counter() - start
+
+    def report(self, elapsed: float) -> dict:
+        ret = {}
+        total = 0
+        for op in self.ops:
+            values = sorted(self.latencies[op])
+            total += len(values)
+            ret[op] = {
+                'count': len(values),
+                'errors': self.errors[op],
+                'rps': len(values) / elapsed,
+                'mean_ms': sum(values) / len(values) * 1000 if values else 0.0,
+                'p50_ms': percentile(values, 0.5) * 1000,
+                'p95_ms': percentile(values, 0.95) * 1000,
+                'p99_ms': percentile(values, 0.99) * 1000,
+                'max_ms': values[-1] * 1000 if values else 0.0,
+            }
+        return {'elapsed': elapsed, 'requests': total, 'rps': total / elapsed, 'operations': ret}
+
+
+def parse_mix(text: str) -> Dict[str, int]:
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        weight = int(weight or 1)
+        if weight > 0:
+            mix[name.strip()] = weight
+    return mix
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def make_project(workdir: str, port: int) -> str:
+    from slim_cli.main import gen
+
+    project_dir = os.path.join(workdir, 'loadtest')
+    gen(project_dir, 'loadtest')
+    with open(os.path.join(project_dir, 'private.py'), 'w', encoding='utf-8') as f:
+        f.write('import logging\n')
+        f.write('HOST = %r\n' % '127.0.0.1')
+        f.write('PORT = %d\n' % port)
+        f.write('DEBUG_LEVEL = logging.ERROR\n')
+        f.write('DOC_ENABLE = False\n')
+        f.write('DATABASE_URI = %r\n' % ('sqlite:///' + os.path.join(project_dir, 'database.db')))
+    with open(os.path.join(project_dir, 'load_server.py'), 'w', encoding='utf-8') as f:
+        f.write(SERVER_SCRIPT)
+    return project_dir
+
+
+async def wait_server(host: str, port: int, proc: subprocess.Popen, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError('server exited with code %s' % proc.returncode)
+        conn = HTTPConnection(host, port)
+        try:
+            status, _ = await conn.request('GET', '/api/misc/info')
+            if status == 200:
+                return
+        except OSError:
+            pass
+        finally:
+            conn.close()
+        await asyncio.sleep(0.1)
+    raise TimeoutError('server not ready in %ss' % timeout)
+
+
+def environment() -> dict:
+    import slim
+    return {
+        'slim': slim.__version__,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'time': time.time(),
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='slim load test')
+    parser.add_argument('-c', '--concurrency', type=int, default=32, help='number of connections')
+    parser.add_argument('-d', '--duration', type=float, default=10, help='seconds')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='weights of operations, default: ' + DEFAULT_MIX)
+    parser.add_argument('--rows', type=int, default=10000, help='rows seeded to the table')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--warmup', type=float, default=1, help='seconds before measuring')
+    parser.add_argument('--workdir', help='directory of the generated project, a temporary one by default')
+    parser.add_argument('-o', '--output', help='write result to a json file')
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    host, port = '127.0.0.1', free_port()
+    workdir = args.workdir or tempfile.mkdtemp(prefix='slim-load-')
+    project_dir = make_project(workdir, port)
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [os.path.abspath(ROOT_DIR), env.get('PYTHONPATH')]))
+    proc = subprocess.Popen([sys.executable, 'load_server.py', str(args.rows), str(args.seed)],
+                            cwd=project_dir, env=env)
+    try:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(wait_server(host, port, proc))
+
+        if args.warmup:
+            loop.run_until_complete(LoadClient(host, port, mix, args.rows, args.seed).run(args.concurrency, args.warmup))
+
+        client = LoadClient(host, port, mix, args.rows, args.seed)
+        elapsed = loop.run_until_complete(client.run(args.concurrency, args.duration))
+        report = client.report(elapsed)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print('%-8s %8s %7s %9s %9s %9s %9s' % ('op', 'count', 'errors', 'rps', 'p50(ms)', 'p95(ms)', 'p99(ms)'),
+          file=sys.stderr)
+    for op, i in report['operations'].items():
+        print('%-8s %8d %7d %9.1f %9.2f %9.2f %9.2f' % (op, i['count'], i['errors'], i['rps'], i['p50_ms'],
+                                                        i['p95_ms'], i['p99_ms']), file=sys.stderr)
+    print('total %d requests, %.1f req/s' % (report['requests'], report['rps']), file=sys.stderr)
+    ws = report['operations'].get('ws')
+    if ws and ws['errors'] and not ws['count']:
+        print('note: all websocket requests failed, is `websockets` or `wsproto` installed?', file=sys.stderr)
+
+    output = {
+        'environment': environment(),
+        'options': {'concurrency': args.concurrency, 'duration': args.duration, 'mix': mix, 'rows': args.rows,
+                    'seed': args.seed},
+        'result': report,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(output, f, indent=2)
+    else:
+        print(json.dumps(output, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,320 @@
+"""
+Microbenchmarks of the hot paths of slim, run in process without network.
+Requests are sent by calling `Application.__call__` with synthetic scopes, like `slim.tools.test.make_mocked_request`.
+
+    python benchmarks/run.py                          # run all
+    python benchmarks/run.py -k route -k sqlquery     # run benchmarks whose name contains the keywords
+    python benchmarks/run.py -o result.json           # save the result as json
+    python benchmarks/run.py --compare result.json    # compare with a previous result
+
+Times are nanoseconds per operation. The best of repeats is the most stable number to compare.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import peewee  # noqa: E402
+
+import slim  # noqa: E402
+from slim import Application, ALL_PERMISSION  # noqa: E402
+from slim.base.permission import Ability, A  # noqa: E402
+from slim.base.sqlquery import SQLQueryInfo  # noqa: E402
+from slim.base.view import BaseView  # noqa: E402
+from slim.base.web import JSONResponse  # noqa: E402
+from slim.support.peewee import PeeweeView  # noqa: E402
+from slim.tools.test import make_mocked_request, make_mocked_view  # noqa: E402
+
+BENCHMARKS: Dict[str, Callable] = {}
+
+
+def bench(name):
+    """
+    Register a benchmark. The decorated function does the setup and returns the operation to time,
+    which could be a function or a coroutine function without arguments.
+    """
+    def wrapper(func):
+        BENCHMARKS[name] = func
+        return func
+    return wrapper
+
+
+async def _noop_send(message):
+    pass
+
+
+def _make_app(views=1, **kwargs):
+    app = Application(cookies_secret=b'bench', permission=ALL_PERMISSION, log_level=None, doc_enable=False, **kwargs)
+    db = peewee.SqliteDatabase(':memory:')
+
+    class Topic(peewee.Model):
+        title = peewee.CharField(max_length=255)
+        content = peewee.TextField(default='')
+        time = peewee.BigIntegerField(default=0)
+
+        class Meta:
+            database = db
+            table_name = 'topic'
+
+    db.create_tables([Topic])
+    with db.atomic():
+        for i in range(100):
+            Topic.create(title='Topic %d' % i, content='content of topic %d' % i, time=i)
+
+    for i in range(views):
+        name = 'topic' if i == 0 else 'topic%d' % i
+        app.route.view(name)(type('TopicView%d' % i, (PeeweeView,), {'model': Topic}))
+
+    @app.route.get('hello')
+    async def hello(view):
+        return 'hello'
+
+    app.prepare()
+    return app
+
+
+def _request_func(app, method, path, *, headers=None, body=None, expect_status=200):
+    req = make_mocked_request(method, path, headers=headers)
+    scope = req.scope
+
+    async def receive():
+        return {'type': 'http.request', 'body': body or b''}
+
+    async def func():
+        await app(scope, receive, _noop_send)
+
+    # make sure the request works
+    status = {}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status['status'] = message['status']
+
+    asyncio.get_event_loop().run_until_complete(app(scope, receive, send))
+    assert status['status'] == expect_status, 'request failed: %s %s -> %s' % (method, path, status['status'])
+    view = app._last_view
+    if view and isinstance(view.ret_val, dict):
+        assert view.ret_val.get('code') == 0, 'request failed: %s %s -> %r' % (method, path, view.ret_val)
+    return func
+
+
+@bench('route_lookup_1_view')
+def _():
+    app = _make_app(1)
+    return lambda: app.route.query_path('GET', '/api/topic/list/1')
+
+
+@bench('route_lookup_100_views')
+def _():
+    app = _make_app(100)
+    return lambda: app.route.query_path('GET', '/api/topic99/list/1')
+
+
+@bench('asgi_function_route')
+def _():
+    return _request_func(_make_app(1), 'GET', '/api/hello')
+
+
+@bench('asgi_not_found')
+def _():
+    return _request_func(_make_app(1), 'GET', '/api/not_exists', expect_status=404)
+
+
+@bench('sqlquery_parse')
+def _():
+    params = {'title.like': 'Topic%', 'time.ge': '10', 'order': 'time.desc,id', 'select': 'id,title,time'}
+    return lambda: SQLQueryInfo(params)
+
+
+@bench('sqlquery_parse_bind')
+def _():
+    app = _make_app(1)
+    view = asyncio.get_event_loop().run_until_complete(
+        make_mocked_view(app, app.tables['topic'], 'GET', '/api/topic/list/1'))
+    params = {'title.like': 'Topic%', 'time.ge': '10', 'order': 'time.desc,id', 'select': 'id,title,time'}
+
+    def func():
+        info = SQLQueryInfo(params)
+        info.bind(view)
+    return func
+
+
+@bench('ability_can_with_columns')
+def _():
+    ability = Ability({
+        'topic': {
+            'id': (A.QUERY, A.READ),
+            'title': (A.QUERY, A.READ, A.WRITE),
+            'content': (A.READ,),
+            '|': (A.CREATE,),
+        },
+    })
+    columns = ['id', 'title', 'content', 'time']
+    return lambda: ability.can_with_columns(None, A.READ, 'topic', columns)
+
+
+@bench('json_response_20_records')
+def _():
+    data = {'code': 0, 'data': {
+        'page': 1, 'size': 20, 'info': {'page_size': 20, 'page_count': 5, 'items_count': 100},
+        'items': [{'id': i, 'title': 'Topic %d' % i, 'content': 'content ' * 20, 'time': 1600000000 + i}
+                  for i in range(20)]}}
+    return lambda: JSONResponse(200, data).dumps()
+
+
+def _post_data_func(content_type, body):
+    app = _make_app(1)
+
+    async def func():
+        req = make_mocked_request('POST', '/api/x', headers={'Content-Type': content_type}, body=body)
+        view = BaseView(app, req)
+        await view.post_data()
+    return func
+
+
+@bench('post_data_json')
+def _():
+    body = json.dumps({'title': 'hello', 'content': 'world' * 20, 'time': 1}).encode('utf-8')
+    return _post_data_func('application/json', body)
+
+
+@bench('post_data_urlencoded')
+def _():
+    return _post_data_func('application/x-www-form-urlencoded', b'title=hello&content=' + b'world' * 20 + b'&time=1')
+
+
+@bench('post_data_multipart')
+def _():
+    boundary = 'slimbenchboundary'
+    parts = []
+    for k, v in (('title', 'hello'), ('content', 'world' * 20), ('time', '1')):
+        parts.append('--%s\r\nContent-Disposition: form-data; name="%s"\r\n\r\n%s\r\n' % (boundary, k, v))
+    parts.append('--%s--\r\n' % boundary)
+    body = ''.join(parts).encode('utf-8')
+    return _post_data_func('multipart/form-data; boundary=%s' % boundary, body)
+
+
+@bench('sqlite_get')
+def _():
+    return _request_func(_make_app(1), 'GET', '/api/topic/get?id=50')
+
+
+@bench('sqlite_list')
+def _():
+    return _request_func(_make_app(1), 'GET', '/api/topic/list/1?order=time.desc')
+
+
+@bench('sqlite_set')
+def _():
+    body = json.dumps({'content': 'updated'}).encode('utf-8')
+    return _request_func(_make_app(1), 'POST', '/api/topic/set?id=50',
+                         headers={'Content-Type': 'application/json'}, body=body)
+
+
+def _time_ops(func, is_async, number) -> float:
+    if is_async:
+        async def runner():
+            start = time.perf_counter()
+            for _ in range(number):
+                await func()
+            return time.perf_counter() - start
+        return asyncio.get_event_loop().run_until_complete(runner())
+
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    return time.perf_counter() - start
+
+
+def run_benchmark(name, repeat=5, min_time=0.2) -> dict:
+    func = BENCHMARKS[name]()
+    is_async = asyncio.iscoroutinefunction(func)
+
+    # warm up, then find the number of operations which takes at least `min_time`
+    number = 1
+    while True:
+        elapsed = _time_ops(func, is_async, number)
+        if elapsed >= min_time or number >= 10 ** 7:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9) * 1.1))
+
+    samples = [_time_ops(func, is_async, number) / number * 1e9 for _ in range(repeat)]
+    return {
+        'name': name,
+        'number': number,
+        'repeat': repeat,
+        'best_ns': min(samples),
+        'median_ns': statistics.median(samples),
+        'mean_ns': statistics.mean(samples),
+        'stdev_ns': statistics.stdev(samples) if repeat > 1 else 0.0,
+        'ops_per_sec': 1e9 / min(samples),
+    }
+
+
+def environment() -> dict:
+    return {
+        'slim': getattr(slim, '__version__', None),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'peewee': peewee.__version__,
+        'time': time.time(),
+    }
+
+
+def compare(results: List[dict], old: dict):
+    old_map = {x['name']: x for x in old.get('results', [])}
+    print()
+    print('%-28s %12s %12s %8s' % ('name', 'old(ns)', 'new(ns)', 'ratio'))
+    for i in results:
+        prev = old_map.get(i['name'])
+        if prev:
+            ratio = i['best_ns'] / prev['best_ns']
+            print('%-28s %12.1f %12.1f %7.2fx' % (i['name'], prev['best_ns'], i['best_ns'], ratio))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='slim microbenchmarks')
+    parser.add_argument('-k', dest='keywords', action='append', default=[], help='run benchmarks matched')
+    parser.add_argument('-o', '--output', help='write result to a json file')
+    parser.add_argument('--compare', help='a json file of previous result')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds of every repeat')
+    parser.add_argument('--list', action='store_true', help='list benchmarks')
+    args = parser.parse_args(argv)
+
+    names = [x for x in BENCHMARKS if not args.keywords or any(k in x for k in args.keywords)]
+    if args.list:
+        print('\n'.join(names))
+        return
+
+    logging.disable(logging.WARNING)  # keep the output clean, and logging of requests is usually off in production
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    results = []
+    for name in names:
+        ret = run_benchmark(name, args.repeat, args.min_time)
+        results.append(ret)
+        print('%-28s %12.1f ns/op %12.0f op/s' % (name, ret['best_ns'], ret['ops_per_sec']), file=sys.stderr)
+
+    output = {'environment': environment(), 'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(output, f, indent=2)
+    else:
+        print(json.dumps(output, indent=2))
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
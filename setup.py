@@ -46,7 +46,6 @@ setup(
 
         'Programming Language :: Python',
         'Programming Language :: Python :: 3 :: Only',
-        'Programming Language :: Python :: 3.6',
         'Programming Language :: Python :: 3.7',
         'Programming Language :: Python :: 3.8'
     ],
@@ -79,7 +78,7 @@ setup(
         'python-multipart==0.0.5',
         'msgpack>=0.5.6,<2.0'],
 
-    python_requires='>=3.6.9',
+    python_requires='>=3.7',
 
     extras_require={
         'full': ['peewee', 'asyncpg', 'msgpack', 'psycopg2-binary'],
@@ -1,7 +1,9 @@
+import asyncio
+import hashlib
 import json
 import logging
 from abc import abstractmethod
-from typing import Tuple, Union, Dict, Iterable, Type, List, Optional, Mapping
+from typing import Tuple, Union, Dict, Iterable, Type, List, Optional, Mapping, Any
 
 import schematics
 from multidict import istr
@@ -9,19 +11,23 @@ from schematics.types import BaseType
 
 from slim.base.types import BuiltinInterface
 from .base_view import BaseView
-from ..web import ASGIRequest
+from ..web import ASGIRequest, etag_match
+from .. import const
 from .err_catch_context import ErrorCatchContext
 from .view_options import SQLViewOptions
 from slim.exception import SlimException, PermissionDenied, FinishQuitException, InvalidParams, RecordNotFound, \
     InvalidRole, InvalidPostData
 
-from slim.base.sqlquery import SQLQueryInfo, SQLForeignKey, SQLValuesToWrite, ALL_COLUMNS, PRIMARY_KEY, SQL_OP
+from slim.base.sqlquery import SQLQueryInfo, SQLForeignKey, SQLValuesToWrite, ALL_COLUMNS, PRIMARY_KEY, SQL_OP, \
+    DictDataRecord
+from slim.base.cache import ResultCache
+from slim.base.timing import measure
 from slim.base.app import Application
 from slim.base.permission import A, DataRecord
 from slim.base.sqlfuncs import AbstractSQLFunctions
 from slim.retcode import RETCODE
 from slim.utils.cls_property import classproperty
-from slim.utils import pagination_calc, async_call, get_ioloop, get_class_full_name
+from slim.utils import pagination_calc, async_call, get_ioloop, get_class_full_name, run_sync
 from ..route import Route
 
 logger = logging.getLogger(__name__)
@@ -31,6 +37,12 @@ class AbstractSQLView(BaseView):
     LIST_PAGE_SIZE = 20  # list 单次取出的默认大小，若为-1取出所有
     LIST_PAGE_SIZE_CLIENT_LIMIT = None  # None 为与LIST_PAGE_SIZE相同，-1 为无限
     LIST_ACCEPT_SIZE_FROM_CLIENT = False  # 是否允许客户端指定 page size
+    BULK_INSERT_MODE = 'insert'  # bulk_insert 的写入方式，'insert' 或 'copy'（分块流式写入，如 PostgreSQL COPY）
+    BULK_INSERT_CHUNK_SIZE = 1000  # copy 模式下每块的记录数
+    BULK_SET_CHUNK_SIZE = 500  # bulk_set 单条语句更新的记录数
+    RESULT_CACHE: Optional[ResultCache] = None  # get/list 的查询结果缓存，None 为不缓存
+    COALESCE_READS = False  # 合并并发的相同 get/list 查询，只执行一次
+    ETAG_SOURCE: Optional[str] = None  # get/list 在查询前计算 ETag 的来源：'version'（表版本，需要 RESULT_CACHE）或列名（如 updated_at）
 
     options_cls = SQLViewOptions
     _sql_cls = AbstractSQLFunctions
@@ -42,6 +54,8 @@ class AbstractSQLView(BaseView):
 
     foreign_keys: Dict[str, List[SQLForeignKey]] = {}
     foreign_keys_table_alias: Dict[str, str] = {}  # to hide real table name
+    _inflight_reads: Dict[str, asyncio.Future] = {}
+    _fields_fetched = False
 
     @classproperty
     def fields(cls) -> Dict[str, BaseType]:  # OrderedDict
@@ -112,17 +126,46 @@ class AbstractSQLView(BaseView):
         if isinstance(cls.LIST_PAGE_SIZE_CLIENT_LIMIT, int):
             assert cls.LIST_PAGE_SIZE_CLIENT_LIMIT == -1 or cls.LIST_PAGE_SIZE_CLIENT_LIMIT > 0, \
                 '%s.LIST_PAGE_SIZE must be None or -1 or more than 0' % cls_full_name
+        assert cls.BULK_INSERT_MODE in ('insert', 'copy'), \
+            "%s.BULK_INSERT_MODE must be 'insert' or 'copy'" % cls_full_name
+        assert isinstance(cls.BULK_INSERT_CHUNK_SIZE, int) and cls.BULK_INSERT_CHUNK_SIZE > 0, \
+            '%s.BULK_INSERT_CHUNK_SIZE must be int and more than 0' % cls_full_name
+        assert isinstance(cls.BULK_SET_CHUNK_SIZE, int) and cls.BULK_SET_CHUNK_SIZE > 0, \
+            '%s.BULK_SET_CHUNK_SIZE must be int and more than 0' % cls_full_name
+        assert cls.RESULT_CACHE is None or isinstance(cls.RESULT_CACHE, ResultCache), \
+            '%s.RESULT_CACHE must be None or ResultCache' % cls_full_name
+        # in-flight reads of COALESCE_READS, not shared with parent classes
+        cls._inflight_reads = {}
+        assert cls.ETAG_SOURCE != 'version' or cls.RESULT_CACHE, \
+            "%s.RESULT_CACHE is required when ETAG_SOURCE is 'version'" % cls_full_name
+
+        # fields are fetched by `Application.prepare()` for all views at once, see `_fetch_fields_all`
+        cls._fields_fetched = False
 
-        async def func():
-            await cls._fetch_fields(cls)
-            if not cls._is_skip_check():
-                assert cls.table_name
-                assert cls.data_model
-                # assert cls.fields
-                # assert cls.primary_key
-                # assert cls.foreign_keys
+    @classmethod
+    async def _fetch_fields_once(cls):
+        if cls._fields_fetched:
+            return
+        await cls._fetch_fields(cls)
+        if not cls._is_skip_check():
+            assert cls.table_name
+            assert cls.data_model
+            # assert cls.fields
+            # assert cls.primary_key
+            # assert cls.foreign_keys
+        cls._fields_fetched = True
 
-        get_ioloop().run_until_complete(func())
+    @staticmethod
+    def _fetch_fields_all(views: Iterable[Type['AbstractSQLView']]):
+        """
+        Fetch fields of views in one run of event loop
+        """
+        views = [x for x in views if not x._fields_fetched]
+        if views:
+            async def func():
+                for i in views:
+                    await i._fetch_fields_once()
+            run_sync(func())
 
     def _load_role(self, role):
         # TODO: 当未继承自UserView的时候给出不同的提示
@@ -174,6 +217,7 @@ class AbstractSQLView(BaseView):
         route.get(summary='获取单项')(cls.get)
         route.get(summary='获取列表', url='list/:page/:size?')(cls.list)
         route.post(summary='更新')(cls.set)
+        route.post(summary='更新(批量，逐项赋值)')(cls.bulk_set)
         route.post(summary='新建')(cls.new)
         route.post(summary='新建(批量)')(cls.bulk_insert)
         route.post(summary='删除')(cls.delete)
@@ -181,10 +225,15 @@ class AbstractSQLView(BaseView):
         cls.get._route_info.builtin_interface = BuiltinInterface.GET
         cls.list._route_info.builtin_interface = BuiltinInterface.LIST
         cls.set._route_info.builtin_interface = BuiltinInterface.SET
+        cls.bulk_set._route_info.builtin_interface = BuiltinInterface.BULK_SET
         cls.new._route_info.builtin_interface = BuiltinInterface.NEW
         cls.bulk_insert._route_info.builtin_interface = BuiltinInterface.BULK_INSERT
         cls.delete._route_info.builtin_interface = BuiltinInterface.DELETE
 
+        if cls.RESULT_CACHE:
+            # 同一张表的写入需要让所有相关视图的缓存失效
+            route._app.result_caches.setdefault(cls.table_name, set()).add(cls.RESULT_CACHE)
+
         if cls.interface_register != AbstractSQLView.interface_register:
             # TODO: deprecated?
             pass
@@ -192,6 +241,8 @@ class AbstractSQLView(BaseView):
 
     async def _prepare(self):
         await super()._prepare()
+        if not self._fields_fetched:  # views not bound to an application
+            await self._fetch_fields_once()
 
         # _sql 里使用了 self.err 存放数据
         # 那么可以推测在并发中，cls._sql.err 会被多方共用导致出错
@@ -203,6 +254,187 @@ class AbstractSQLView(BaseView):
                          (self.current_request_role, type(self).__name__, type(self).table_name, user.id if user else None))
             raise InvalidRole(self.current_request_role)
 
+    async def _read_key(self, info: SQLQueryInfo, page, size) -> str:
+        cache = self.RESULT_CACHE
+        version = await cache.get_version(self.table_name) if cache else 0
+        return ResultCache.make_key(self.table_name, version, self.ability.role, info, page, size)
+
+    async def _single_flight(self, key: str, func) -> Tuple[bool, Any]:
+        """
+        Concurrent calls with the same key run `func` only once, the others wait for its result.
+        :return: is_leader, result of func
+        """
+        inflight = self._inflight_reads
+        fut = inflight.get(key)
+        if fut:
+            try:
+                return False, await asyncio.shield(fut)
+            except asyncio.CancelledError:
+                if not fut.cancelled():
+                    raise
+                # the leader was cancelled, not this request, so run it again
+                return await self._single_flight(key, func)
+
+        fut = get_ioloop().create_future()
+        inflight[key] = fut
+        try:
+            ret = await func()
+            fut.set_result(ret)
+            return True, ret
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()  # mark as retrieved, no warning if nobody is waiting
+            raise
+        finally:
+            del inflight[key]
+
+    async def _read(self, key: Optional[str], fetch, snapshot_func):
+        """
+        Run query with RESULT_CACHE and COALESCE_READS.
+        `fetch` returns (result, snapshot), snapshot is plain data for the cache and waiting requests.
+        :return: result of the query, or snapshot if the result is shared
+        """
+        cache = self.RESULT_CACHE
+        if cache:
+            data = await cache.get(key)
+            if data is not None:
+                return snapshot_func(data)
+
+        async def run():
+            ret, snapshot = await fetch()
+            if cache:
+                await cache.set(key, snapshot)
+            return ret, snapshot
+
+        if self.COALESCE_READS:
+            is_leader, (ret, snapshot) = await self._single_flight(key, run)
+            # 记录会在权限检查时被修改，所以其他请求各自从快照重建
+            return ret if is_leader else snapshot_func(snapshot)
+        ret, snapshot = await run()
+        return ret
+
+    async def _read_one(self, info: SQLQueryInfo) -> DataRecord:
+        """
+        select_one with RESULT_CACHE and COALESCE_READS
+        """
+        sql = await self._get_read_sql()
+        if not (self.RESULT_CACHE or self.COALESCE_READS):
+            return await sql.select_one(info)
+
+        async def fetch():
+            try:
+                record = await sql.select_one(info)
+            except RecordNotFound:
+                return None, {'record': None}
+            return record, {'record': record.to_dict() if record else None}
+
+        def from_snapshot(data):
+            return DictDataRecord(self.table_name, data['record']) if data['record'] is not None else None
+
+        # page 与 size 为 None，避免与 list 的第一页（size 为 1）冲突
+        key = await self._read_key(info, None, None)
+        record = await self._read(key, fetch, from_snapshot)
+        if record is None:
+            raise RecordNotFound(self.table_name)
+        return record
+
+    async def _read_page(self, info: SQLQueryInfo, page=1, size=1) -> Tuple[Tuple[DataRecord, ...], int]:
+        """
+        select_page with RESULT_CACHE and COALESCE_READS
+        """
+        sql = await self._get_read_sql()
+        if not (self.RESULT_CACHE or self.COALESCE_READS):
+            return await sql.select_page(info, page, size)
+
+        async def fetch():
+            records, count = await sql.select_page(info, page, size)
+            return (records, count), {'records': [x.to_dict() for x in records], 'count': count}
+
+        def from_snapshot(data):
+            return tuple(DictDataRecord(self.table_name, x) for x in data['records']), data['count']
+
+        key = await self._read_key(info, page, size)
+        return await self._read(key, fetch, from_snapshot)
+
+    async def _cheap_etag(self, info: SQLQueryInfo, page, size) -> Optional[str]:
+        """
+        ETag computed before the query, from table version or max value of ETAG_SOURCE column.
+        Queries with loadfk are skipped, because records of other tables could be changed.
+        """
+        source = self.ETAG_SOURCE
+        if not source or info.loadfk:
+            return
+
+        if source == 'version':
+            token = await self.RESULT_CACHE.get_version_token(self.table_name)
+        else:
+            sql = await self._get_read_sql()
+            token = await sql.select_max(info, source)
+
+        # 数据经过逐用户的权限过滤，因此 ETag 与用户相关
+        user = self.current_user if self.can_get_user else None
+        raw = repr((self.table_name, token, self.ability.role, user.id if user else None, info.normalize(), page, size))
+        return '"%s"' % hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def _check_not_modified(self, etag: Optional[str]) -> bool:
+        if etag and etag_match(self.headers.get(const.IF_NONE_MATCH), etag):
+            self.finish_not_modified(etag)
+            return True
+        return False
+
+    async def _get_read_sql(self) -> AbstractSQLFunctions:
+        """
+        SQL functions used by reads of get/list/load_fk, could be overridden to read from replicas.
+        """
+        return self._sql
+
+    async def _after_write(self, inserted: Iterable[DataRecord] = None,
+                           updated: Tuple[Iterable[DataRecord], Iterable[DataRecord]] = None,
+                           deleted: Iterable[DataRecord] = None):
+        """
+        Called after records written by set/bulk_set/new/bulk_insert/delete
+        :param inserted: records inserted
+        :param updated: (old records, new records)
+        :param deleted: records deleted
+        """
+        await self._invalidate_result_cache()
+        hub = self.app.live_queries
+        if hub.has_subscriptions(self.table_name):
+            self._notify_live_queries(hub, inserted, updated, deleted)
+
+    def _notify_live_queries(self, hub, inserted, updated, deleted):
+        """
+        Push the changes to live queries, before records are filtered by the permission of the writer
+        """
+        pairs = []
+        if updated:
+            pk = self.primary_key
+            old_records, new_records = updated
+            old_map = {x.get(pk): x for x in old_records}
+            for new in new_records:
+                new = new.to_dict()
+                old = old_map.get(new.get(pk))
+                # columns not selected when reading the old records are regarded as unchanged
+                pairs.append(({**new, **old.to_dict()} if old is not None else new, new))
+
+        hub.notify(self.table_name,
+                   inserted=[x.to_dict() for x in inserted or ()],
+                   updated=pairs,
+                   deleted=[x.to_dict() for x in deleted or ()])
+
+    async def _invalidate_result_cache(self):
+        """
+        Called after writing, make cached results of this table outdated
+        """
+        caches = set(self.app.result_caches.get(self.table_name, ()))
+        if self.RESULT_CACHE:
+            caches.add(self.RESULT_CACHE)
+        for cache in caches:
+            await cache.invalidate(self.table_name)
+
     async def load_fk(self, info: SQLQueryInfo, records: Iterable[DataRecord]) -> Union[List, Iterable]:
         """
         :param info:
@@ -253,7 +485,7 @@ class AbstractSQLView(BaseView):
                     # info2.check_query_permission_full(self.current_user, fktable, ability)
 
                     try:
-                        fk_records, count = await v._sql.select_page(info2, size=-1)
+                        fk_records, count = await v._read_page(info2, size=-1)
                     except RecordNotFound:
                         # 外键没有找到值，也许全部都是null，这很常见
                         continue
@@ -276,7 +508,9 @@ class AbstractSQLView(BaseView):
                     if fkvalues['loadfk']:
                         await check(fkvalues['loadfk'], fk_records)
 
-        await check(info.loadfk, records)
+        if info.loadfk:
+            with measure('load_fk'):
+                await check(info.loadfk, records)
         return records
 
     async def _call_handle(self, func, *args):
@@ -316,11 +550,12 @@ class AbstractSQLView(BaseView):
         return page, client_size
 
     async def check_records_permission(self, info, records, *, exception_cls: Type[SlimException] = PermissionDenied):
-        user = self.current_user if self.can_get_user else None
-        for record in records:
-            columns = record.set_info(info, self.ability, user)
-            if not columns: raise exception_cls(self.table_name)
-        await self._call_handle(self.after_read, records)
+        with measure('permission'):
+            user = self.current_user if self.can_get_user else None
+            for record in records:
+                columns = record.set_info(info, self.ability, user)
+                if not columns: raise exception_cls(self.table_name)
+            await self._call_handle(self.after_read, records)
 
     async def get(self):
         """
@@ -329,14 +564,17 @@ class AbstractSQLView(BaseView):
         with ErrorCatchContext(self):
             info = await SQLQueryInfo.build(self)
             await self._call_handle(self.before_query, info)
-            record = await self._sql.select_one(info)
+            etag = await self._cheap_etag(info, 1, 1)
+            if self._check_not_modified(etag):
+                return
+            record = await self._read_one(info)
 
             if record:
                 records = [record]
                 # , exception_cls=RecordNotFound
                 await self.check_records_permission(info, records)
                 data_dict = await self.load_fk(info, records)
-                self.finish(RETCODE.SUCCESS, data_dict[0])
+                self.finish(RETCODE.SUCCESS, data_dict[0], headers={const.ETAG: etag} if etag else None)
             else:
                 self.finish(RETCODE.NOT_FOUND)
 
@@ -348,7 +586,10 @@ class AbstractSQLView(BaseView):
             page, size = self._get_list_page_and_size(page, size)
             info = await SQLQueryInfo.build(self)
             await self._call_handle(self.before_query, info)
-            records, count = await self._sql.select_page(info, page, size)
+            etag = await self._cheap_etag(info, page, size)
+            if self._check_not_modified(etag):
+                return
+            records, count = await self._read_page(info, page, size)
             # records should be list because after_read maybe change it
             records = list(records)
             await self.check_records_permission(info, records)
@@ -360,7 +601,7 @@ class AbstractSQLView(BaseView):
             records = await self.load_fk(info, records)
             pg["items"] = records
 
-            self.finish(RETCODE.SUCCESS, pg)
+            self.finish(RETCODE.SUCCESS, pg, headers={const.ETAG: etag} if etag else None)
 
     async def set(self):
         """
@@ -390,6 +631,7 @@ class AbstractSQLView(BaseView):
 
                 # 注：此处returning为true是因为后续要检查数据的权限，和前端要求无关
                 new_records = await self._sql.update(records, values, returning=True)
+                await self._after_write(updated=(records, new_records))
                 await self.check_records_permission(None, new_records)
                 await self._call_handle(self.after_update, values, records, new_records)
                 if await self.is_returning():
@@ -399,7 +641,90 @@ class AbstractSQLView(BaseView):
             else:
                 self.finish(RETCODE.NOT_FOUND)
 
-    async def _base_insert(self, raw_values_lst, ignore_exists):
+    async def bulk_set(self):
+        """
+        批量更新接口，每项可以赋予不同的值
+        post: {"items": [{"pk": <主键值>, "values": {...}}, ...]}
+        赋值规则参考 https://fy0.github.io/slim/#/quickstart/query_and_modify?id=修改新建
+        """
+        with ErrorCatchContext(self):
+            post = await self.post_data()
+            items = post.get('items') if post else None
+            if not isinstance(items, (list, tuple)) or not items:
+                raise InvalidPostData("`items` is required")
+
+            pk_type = self.fields[self.primary_key]
+            raw_values_map = {}
+            raw_pks = {}
+            for i in items:
+                if not (isinstance(i, Mapping) and 'pk' in i and isinstance(i.get('values'), Mapping)):
+                    raise InvalidPostData("Every item should be {'pk': ..., 'values': {...}}")
+                try:
+                    pk = pk_type.validate(i['pk'])
+                except Exception:
+                    raise InvalidPostData({'pk': ["Can not convert to data type of the field"]})
+                if pk in raw_values_map:
+                    raise InvalidPostData("Duplicated pk: %r" % i['pk'])
+                raw_values_map[pk] = i['values']
+                raw_pks[pk] = i['pk']
+
+            info = SQLQueryInfo()
+            info.add_condition(PRIMARY_KEY, SQL_OP.IN, list(raw_values_map.keys()))
+            info.bind(self)
+
+            await self._call_handle(self.before_query, info)
+            records, count = await self._sql.select_page(info, size=-1)
+
+            def norm_pk(val):
+                # 数据库返回的主键值可能与提交的类型不同（如 UUID 与 str），统一转换后再比较
+                try:
+                    return pk_type.validate(val)
+                except Exception:
+                    return val
+
+            records_map = {norm_pk(x.get(self.primary_key)): x for x in records}
+            missing = [raw_pks[pk] for pk in raw_values_map if pk not in records_map]
+            if missing:
+                # 按批次校验，有任何一项不存在都不写入
+                return self.finish(RETCODE.NOT_FOUND, {'missing': missing})
+
+            update_items = []
+            for pk, record in records_map.items():
+                values = SQLValuesToWrite(raw_values_map[pk])
+                values.bind(self, A.WRITE, [record])
+                await self._call_handle(self.before_update, values, [record])
+
+                if len(values) == 0:
+                    raise InvalidPostData("No value to set for table: %s" % self.table_name)
+                update_items.append((record, values))
+
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('update record(s): %s' % [x[1] for x in update_items])
+
+            # 与 set 相同，returning 是为了检查数据的权限
+            new_records = await self._sql.update_many(update_items, returning=True, chunk_size=self.BULK_SET_CHUNK_SIZE)
+            await self._after_write(updated=([x[0] for x in update_items], new_records))
+            await self.check_records_permission(None, new_records)
+
+            new_records_map = {norm_pk(x.get(self.primary_key)): x for x in new_records}
+            for record, values in update_items:
+                new_record = new_records_map.get(norm_pk(record.get(self.primary_key)))
+                await self._call_handle(self.after_update, values, [record], [new_record] if new_record else [])
+
+            if await self.is_returning():
+                self.finish(RETCODE.SUCCESS, new_records)
+            else:
+                self.finish(RETCODE.SUCCESS, len(new_records))
+
+    async def _base_insert(self, raw_values_lst, ignore_exists, *, use_copy=False, returning=True):
+        """
+        :param raw_values_lst:
+        :param ignore_exists:
+        :param use_copy: write by `_sql.copy_insert` in chunks
+        :param returning: only works with `use_copy`, return count instead of records if False.
+            records are still read back if `after_insert` is overridden.
+        :return: records, or count when `use_copy` and not `returning`
+        """
         with ErrorCatchContext(self):
             if isinstance(raw_values_lst, str):
                 try:
@@ -417,19 +742,48 @@ class AbstractSQLView(BaseView):
             for values in values_lst:
                 values.validate_before_execute_insert(self)
 
-            records = await self._sql.insert(values_lst, returning=True, ignore_exists=ignore_exists)
+            if use_copy:
+                # 覆盖了 after_insert 的视图总是回读记录，保证 after_insert 和权限检查拿到写入的数据
+                read_back = returning or self._is_after_insert_overridden()
+                ret = await self._sql.copy_insert(values_lst, returning=read_back, ignore_exists=ignore_exists,
+                                                  chunk_size=self.BULK_INSERT_CHUNK_SIZE)
+                await self._after_write(inserted=ret if read_back else None)
+                if not read_back:
+                    return ret
+                records = ret
+                if not returning:
+                    await self.check_records_permission(None, records)
+                    await self._call_handle(self.after_insert, values_lst, records)
+                    return len(records)
+            else:
+                records = await self._sql.insert(values_lst, returning=True, ignore_exists=ignore_exists)
+                await self._after_write(inserted=records)
+
             await self.check_records_permission(None, records)
             await self._call_handle(self.after_insert, values_lst, records)
             return records
 
+    def _is_after_insert_overridden(self):
+        return type(self).after_insert is not AbstractSQLView.after_insert
+
     async def bulk_insert(self):
         """
         批量新建接口
+        与 insert 模式相同，copy 模式下已存在的记录会被忽略（PostgreSQL 上经临时表合并写入）
         赋值规则参考 https://fy0.github.io/slim/#/quickstart/query_and_modify?id=修改新建
         """
         post = await self.post_data()
         if not 'items' in post:
             raise InvalidPostData("`items` is required")
+
+        if self.BULK_INSERT_MODE == 'copy':
+            returning = await self.is_returning()
+            # records if returning, otherwise count
+            ret = await self._base_insert(post['items'], True, use_copy=True, returning=returning)
+            if not self.is_finished:
+                self.finish(RETCODE.SUCCESS, ret)
+            return
+
         records = await self._base_insert(post['items'], True)
         if self.is_finished:
             return
@@ -481,6 +835,7 @@ class AbstractSQLView(BaseView):
 
                 await self._call_handle(self.before_delete, records)
                 num = await self._sql.delete(records)
+                await self._after_write(deleted=records)
                 await self._call_handle(self.after_delete, records)
                 self.finish(RETCODE.SUCCESS, num)
             else:
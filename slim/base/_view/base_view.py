@@ -194,6 +194,7 @@ class BaseView(HTTPMixin, metaclass=MetaClassForInit):
 
         self._post_data_cache = sentinel
         self._ = self.temp_storage = TempStorage()
+        self._background_tasks = []
 
     @classmethod
     async def _build(cls, app, request: ASGIRequest, *, _hack_func=None) -> 'BaseView':
@@ -225,12 +226,16 @@ class BaseView(HTTPMixin, metaclass=MetaClassForInit):
         pass
 
     async def _on_finish(self):
-        if self.session:
+        if self.session is not None and self.session.dirty:
             await self.session.save()
 
         await async_call(self.on_finish)
 
-        if self.response:
+        for func, args, kwargs in self._background_tasks:
+            self.app.tasks.submit(func, *args, **kwargs)
+        self._background_tasks.clear()
+
+        if self.response and logger.isEnabledFor(logging.DEBUG):
             if isinstance(self.response, JSONResponse):
                 if self.response.written > 200:
                     logger.debug('finish: json (%d bytes)' % self.response.written)
@@ -244,6 +249,13 @@ class BaseView(HTTPMixin, metaclass=MetaClassForInit):
     async def on_finish(self):
         pass
 
+    def add_background_task(self, func, *args, **kwargs):
+        """
+        Run the function by `app.tasks` after the response sent, discarded if the request failed.
+        Arguments are passed to `TaskQueue.submit`, including `retries` and `name`.
+        """
+        self._background_tasks.append((func, args, kwargs))
+
     @property
     def retcode(self):
         if self.is_finished:
@@ -274,6 +286,15 @@ class BaseView(HTTPMixin, metaclass=MetaClassForInit):
         self.response = JSONResponse(data=data, json_dumps=json_ex_dumps, headers=headers, status=status,
                                      cookies=self._cookie_set)
 
+    def finish_not_modified(self, etag: str):
+        """
+        Set response as 304 Not Modified
+        :param etag:
+        :return:
+        """
+        self.ret_val = None
+        self.response = Response(status=304, headers={const.ETAG: etag}, cookies=self._cookie_set)
+
     def finish_raw(self, data: Union[bytes, str, StreamReadFunc] = b'', status: int = 200, content_type: str = 'text/plain', *,
                    headers=None):
         """
@@ -386,7 +407,7 @@ class BaseView(HTTPMixin, metaclass=MetaClassForInit):
         timestamp = int(time.time())
         # version, utctime, name, value
         # assert isinatance(value, (str, list, tuple, bytes, int))
-        to_sign = [1, timestamp, name, value]
+        to_sign = [self.app.options.cookies_sign_version, timestamp, name, value]
         secret = self.app.options.cookies_secret
         self.set_cookie(name, create_signed_value(secret, to_sign), max_age=max_age, httponly=httponly)
 
@@ -395,9 +416,9 @@ class BaseView(HTTPMixin, metaclass=MetaClassForInit):
         value = self.get_cookie(name)
         if value:
             data = decode_signed_value(secret, value)
-            # TODO: max_age_days 过期计算
             if data and data[2] == name:
-                return data[3]
+                if max_age_days is None or time.time() - data[1] <= max_age_days * 86400:
+                    return data[3]
         return default
 
     def set_header(self):
@@ -39,6 +39,14 @@ async def view_validate_check(view: "BaseView", va_query: Optional[Type[Model]],
                             write_values.append(do_validate(va_write_value, i, InvalidPostData))
                     else:
                         raise InvalidPostData("`items` from post data should be list")
+                elif view.current_interface == BuiltinInterface.BULK_SET:
+                    items = post_data.get('items')
+                    if isinstance(items, (List, Tuple)):
+                        for i in items:
+                            values = i.get('values') if isinstance(i, dict) else None
+                            write_values.append(do_validate(va_write_value, values, InvalidPostData))
+                    else:
+                        raise InvalidPostData("`items` from post data should be list")
                 elif view.current_interface in (BuiltinInterface.SET, BuiltinInterface.NEW):
                     write_values.append(do_validate(va_write_value, post_data, InvalidPostData))
 
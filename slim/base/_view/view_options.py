@@ -1,16 +1,31 @@
 from typing import Type, TYPE_CHECKING
 
 if TYPE_CHECKING:
+    from slim.base.cache import ResultCache
     from slim.base._view.abstract_sql_view import AbstractSQLView
 
 
 class SQLViewOptions:
-    def __init__(self, *, list_page_size=20, list_accept_size_from_client=False, list_page_size_client_limit=None):
+    def __init__(self, *, list_page_size=20, list_accept_size_from_client=False, list_page_size_client_limit=None,
+                 bulk_insert_mode='insert', bulk_insert_chunk_size=1000, bulk_set_chunk_size=500,
+                 result_cache: 'ResultCache' = None, etag_source=None, coalesce_reads=False):
         self.list_page_size = list_page_size
         self.list_accept_size_from_client = list_accept_size_from_client
         self.list_page_size_client_limit = list_page_size_client_limit
+        self.bulk_insert_mode = bulk_insert_mode
+        self.bulk_insert_chunk_size = bulk_insert_chunk_size
+        self.bulk_set_chunk_size = bulk_set_chunk_size
+        self.result_cache = result_cache
+        self.etag_source = etag_source
+        self.coalesce_reads = coalesce_reads
 
     def assign(self, obj: Type["AbstractSQLView"]):
         obj.LIST_PAGE_SIZE = self.list_page_size
         obj.LIST_PAGE_SIZE_CLIENT_LIMIT = self.list_page_size_client_limit
         obj.LIST_ACCEPT_SIZE_FROM_CLIENT = self.list_page_size_client_limit
+        obj.BULK_INSERT_MODE = self.bulk_insert_mode
+        obj.BULK_INSERT_CHUNK_SIZE = self.bulk_insert_chunk_size
+        obj.BULK_SET_CHUNK_SIZE = self.bulk_set_chunk_size
+        obj.RESULT_CACHE = self.result_cache
+        obj.ETAG_SOURCE = self.etag_source
+        obj.COALESCE_READS = self.coalesce_reads
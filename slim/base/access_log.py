@@ -0,0 +1,136 @@
+import json
+import logging
+import queue
+import random
+import sys
+import threading
+import time
+from typing import Optional, Dict, IO
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class AccessLogger:
+    """
+    Access log written as JSON lines by a background thread.
+    The event loop only puts a tuple into a queue, formatting and writing are done in the thread.
+    If the queue is full, entries are dropped and counted in `dropped`.
+
+        app = Application(access_log=AccessLogger('access.log', sample_rates={'TopicView.list': 0.1}))
+
+    Every line is like:
+        {"ts": 1600000000.0, "method": "GET", "path": "/api/topic/list/1", "query": "", "status": 200,
+         "handler": "TopicView.list", "ip": "127.0.0.1", "took": 1.23, "retcode": 0, "sample_rate": 0.1}
+    """
+
+    def __init__(self, filename: Optional[str] = None, *, stream: Optional[IO[str]] = None, sample_rate=1.0,
+                 sample_rates: Dict[str, float] = None, always_log_status=500, max_queue_size=10000):
+        """
+        :param filename: append lines to the file, `stream` is used if None
+        :param stream: sys.stdout by default
+        :param sample_rate: probability of a request being logged
+        :param sample_rates: sample rates by handler name (like 'TopicView.list'), for high-QPS routes
+        :param always_log_status: responses with status >= it are always logged, None to disable
+        :param max_queue_size:
+        """
+        self.filename = filename
+        self.stream = stream
+        self.sample_rate = sample_rate
+        self.sample_rates = sample_rates or {}
+        self.always_log_status = always_log_status
+        self.dropped = 0
+
+        self._queue = queue.Queue(max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def log(self, method: str, path: str, query_string: bytes, status: int, handler_name: Optional[str],
+            client: Optional[tuple], took: float, retcode: Optional[int] = None):
+        """
+        Called in the event loop, keep it cheap.
+        :param took: milliseconds
+        """
+        rate = self.sample_rates.get(handler_name, self.sample_rate)
+        if rate < 1 and (self.always_log_status is None or status < self.always_log_status):
+            if random.random() >= rate:
+                return
+
+        if self._thread is None:
+            self._start()
+
+        try:
+            self._queue.put_nowait((time.time(), method, path, query_string, status, handler_name, client, took,
+                                    retcode, rate))
+        except queue.Full:
+            self.dropped += 1
+
+    @staticmethod
+    def format(item: tuple) -> str:
+        ts, method, path, query_string, status, handler_name, client, took, retcode, rate = item
+        return json.dumps({
+            'ts': ts,
+            'method': method,
+            'path': path,
+            'query': query_string.decode('latin-1') if query_string else '',
+            'status': status,
+            'handler': handler_name,
+            'ip': client[0] if client else None,
+            'took': took,
+            'retcode': retcode,
+            'sample_rate': rate,
+        }, ensure_ascii=False)
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='slim-access-log', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        if self.filename:
+            out = open(self.filename, 'a', encoding='utf-8')
+        else:
+            out = self.stream or sys.stdout
+
+        try:
+            while True:
+                item = self._queue.get()
+                stop = item is _STOP
+                lines = [] if stop else [self.format(item)]
+
+                # write entries in the queue at one time
+                while not stop:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stop = True
+                    else:
+                        lines.append(self.format(item))
+
+                if lines:
+                    try:
+                        out.write('\n'.join(lines) + '\n')
+                        out.flush()
+                    except Exception as e:
+                        logger.error('failed to write access log: %s', e)
+
+                if stop:
+                    break
+        finally:
+            if self.filename:
+                out.close()
+
+    def close(self, timeout=5):
+        """
+        Write all entries in the queue and stop the thread
+        """
+        thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        self._thread = None
@@ -1,16 +1,23 @@
 import logging
+import os
 from typing import Optional, TYPE_CHECKING, Type
 
 from slim.base.types.doc import ApplicationDocInfo
 from slim.ext.openapi.serve import doc_serve
-from .session import CookieSession
-from .user import BaseUserViewMixin
+from slim.ext.metrics import metrics_serve
+from slim.base.metrics import MetricsRegistry
+from slim.base.access_log import AccessLogger
+from .session import CookieSession, ServerSideSession
+from .user import BaseUserViewMixin, UserCache
 from .web import handle_request, CORSOptions
 from ..utils.jsdict import JsDict
 from . import log
 
 if TYPE_CHECKING:
     from .permission import Permissions
+    from slim.ext.openapi.serve import OpenAPIDocCache
+    from .ws_bus import BroadcastBus
+    from .tasks import TaskQueue
 
 logger = logging.getLogger(__name__)
 
@@ -25,30 +32,67 @@ class SlimTables(JsDict):
 class ApplicationOptions:
     def __init__(self):
         self.cookies_secret = b'secret code'
+        self.cookies_sign_version = 1
         self.session_cls = CookieSession
+        self.etag = False
+        self.slow_query_threshold = 0.5
+        self.n_plus_one_threshold = 5
 
 
 class Application:
     def __init__(self, *, cookies_secret: bytes = b'secret code', log_level=logging.INFO, session_cls=CookieSession,
                  mountpoint: str = '/api', doc_enable=True, doc_info=ApplicationDocInfo(),
                  permission: Optional['Permissions'] = None, client_max_size=100 * 1024 * 1024,
-                 cors_options: Optional[CORSOptions] = None):
+                 cors_options: Optional[CORSOptions] = None, etag=False, debug=False, metrics_enable=False,
+                 slow_query_threshold: Optional[float] = 0.5, n_plus_one_threshold: Optional[int] = 5,
+                 access_log: Optional[AccessLogger] = None, cookies_sign_version=1,
+                 user_cache: Optional[UserCache] = None, ws_bus: Optional['BroadcastBus'] = None,
+                 tasks: Optional['TaskQueue'] = None):
         """
         :param cookies_secret:
         :param log_level:
         :param permission: `ALL_PERMISSION`, `EMPTY_PERMISSION` or a `Permissions` object
-        :param session_cls:
+        :param session_cls: `CookieSession` by default, `ServerSideSession` (or a subclass) to keep data at server side
         :param mountpoint:
         :param doc_enable:
         :param doc_info:
         :param client_max_size: 100MB
+        :param etag: add strong ETag to JSON responses of GET requests, and reply 304 if If-None-Match matched
+        :param debug: debug mode, add Server-Timing header to responses
+        :param metrics_enable: collect metrics and serve them at /metrics
+        :param slow_query_threshold: log SQL statements slower than it (seconds), None to disable
+        :param n_plus_one_threshold: warn if a statement executed so many times in one request, None to disable
+        :param access_log: write access log as JSON lines off the event loop, instead of logging every request
+        :param cookies_sign_version: signature of secure cookies, 1: HMAC-SHA256, 2: keyed BLAKE2b (faster).
+            Cookies of both versions are accepted
+        :param user_cache: cache users resolved by `get_user_by_token`
+        :param ws_bus: relay `send_all`/`publish` of websockets to other worker processes, e.g. `UnixDatagramBus()`
+        :param tasks: queue of background tasks, `TaskQueue()` by default
         """
         from .route import Route
         from .permission import Permissions, Ability, ALL_PERMISSION, EMPTY_PERMISSION
+        from .live_query import LiveQueryHub
+        from .scheduler import Scheduler
+        from .tasks import TaskQueue
 
         self.running = False
+        self.worker_id: Optional[int] = None  # index of worker process when running with multiple workers
+        self.debug = debug
         self.on_startup = []
         self.on_shutdown = []
+        self.on_request_timing = []  # func(timing: RequestTiming), called after response sent
+        self.metrics: Optional[MetricsRegistry] = MetricsRegistry() if metrics_enable else None
+        self.access_log = access_log
+        self.user_cache = user_cache
+        if access_log:
+            self.on_shutdown.append(access_log.close)
+        if isinstance(session_cls, type) and issubclass(session_cls, ServerSideSession):
+            self.on_shutdown.append(session_cls.backend.close)
+        self.ws_bus = ws_bus
+        if ws_bus:
+            ws_bus.app = self
+            self.on_startup.append(ws_bus.start)
+            self.on_shutdown.append(ws_bus.close)
 
         self.user_mixin_class = None
         self.mountpoint = mountpoint
@@ -56,9 +100,13 @@ class Application:
         self.doc_enable = doc_enable
         self.doc_info = doc_info
 
+        self.doc_cache: Optional['OpenAPIDocCache'] = None  # set by doc_serve
         if self.doc_enable:
             doc_serve(self)
 
+        if self.metrics:
+            metrics_serve(self)
+
         if permission is ALL_PERMISSION:
             logger.warning('app.permission is ALL_PERMISSION, it means everyone has all permissions for any table')
             logger.warning("This option should only be used in development environment")
@@ -71,6 +119,11 @@ class Application:
             permission.app = self
 
         self.tables = SlimTables()
+        self.result_caches = {}  # table_name: Set[ResultCache], filled by views with RESULT_CACHE
+        self.live_queries = LiveQueryHub(self)
+        self.scheduler = Scheduler(self)
+        self.tasks = tasks or TaskQueue()
+        self.tasks.app = self
 
         if log_level:
             log.enable(log_level)
@@ -82,10 +135,13 @@ class Application:
 
         self.options = ApplicationOptions()
         self.options.cookies_secret = cookies_secret
+        self.options.cookies_sign_version = cookies_sign_version
         self.options.session_cls = session_cls
+        self.options.etag = etag
+        self.options.slow_query_threshold = slow_query_threshold
+        self.options.n_plus_one_threshold = n_plus_one_threshold
         self.client_max_size = client_max_size
 
-        self._timers_before_running = []
         self._last_view = None  # use for tests
         self._last_resp = None  # use for tests
 
@@ -98,8 +154,32 @@ class Application:
     def set_user_mixin_class(self, cls: Type[BaseUserViewMixin]):
         self.user_mixin_class = cls
 
-    def run(self, host, port):
+    def run(self, host, port, *, workers=1, reuse_port=False, graceful_timeout=30, loop='auto', http='auto'):
+        """
+        :param host:
+        :param port:
+        :param workers: number of prefork worker processes, see `slim.base.workers.Supervisor`
+        :param reuse_port: every worker binds its own socket with SO_REUSEPORT, instead of sharing one socket
+        :param graceful_timeout: seconds to wait for workers finishing requests on shutdown or rolling restart
+        :param loop: 'auto' uses uvloop if installed
+        :param http: 'auto' uses httptools if installed
+        """
         import uvicorn
         logger.info(f'Running on http://{host}:{port}')
         logger.info('(Press CTRL+C to quit)')
-        uvicorn.run(self, host=host, port=port, log_level='error')
+        options = dict(loop=loop, http=http, log_level='error')
+
+        if workers > 1:
+            if not hasattr(os, 'fork'):
+                logger.warning('multiple workers are not supported on this platform, run in a single process')
+            else:
+                from .workers import Supervisor
+                logger.info(f'Starting {workers} workers, pid {os.getpid()}')
+                Supervisor(self, host, port, workers, reuse_port=reuse_port, graceful_timeout=graceful_timeout,
+                           **options).run()
+                return
+
+        from .workers import uvicorn_options
+        # uvicorn without `timeout_graceful_shutdown` waits for all connections on shutdown
+        options = uvicorn_options(timeout_graceful_shutdown=graceful_timeout, **options)
+        uvicorn.run(self, host=host, port=port, **options)
@@ -0,0 +1,122 @@
+import hashlib
+import secrets
+import time
+from abc import abstractmethod
+from collections import OrderedDict
+from typing import Any, Optional, Tuple, Dict, Hashable
+
+from .sqlquery import SQLQueryInfo
+
+
+class BaseCacheBackend:
+    """
+    Storage of `ResultCache`.
+    An external backend (redis, memcached, ...) should implement these methods,
+    and serialize values by itself. Values are lists/dicts of primitive types.
+    """
+    # identifies the versions of the backend, versions of backends with different nonces are not comparable
+    version_nonce = ''
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float):
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def get_version(self, table: str) -> int:
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def incr_version(self, table: str) -> int:
+        raise NotImplementedError()
+
+
+class MemoryCacheBackend(BaseCacheBackend):
+    """
+    In-process backend, size-bounded LRU with expire time.
+    Versions start from 0 in every process, so they are distinguished by a random nonce of the backend.
+    """
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.version_nonce = secrets.token_hex(8)
+        self._data: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._versions: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self._data)
+
+    async def get(self, key: str) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+
+        expire_at, value = item
+        if expire_at < time.monotonic():
+            del self._data[key]
+            return None
+
+        self._data.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float):
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    async def get_version(self, table: str) -> int:
+        return self._versions.get(table, 0)
+
+    async def incr_version(self, table: str) -> int:
+        self._versions[table] = self._versions.get(table, 0) + 1
+        return self._versions[table]
+
+
+class ResultCache:
+    """
+    Read-through cache for `get` and `list` of SQL views.
+    Results are keyed by (table, role, normalized query, page, size) and the version of table,
+    the version is increased by writes of slim (set/bulk_set/new/bulk_insert/delete),
+    so outdated entries will never be hit.
+    Note: writes not through slim could only be seen after `ttl`.
+    """
+
+    def __init__(self, backend: BaseCacheBackend = None, *, ttl: float = 60, max_size=1024):
+        """
+        :param backend: `MemoryCacheBackend` by default
+        :param ttl: seconds
+        :param max_size: max entries of the default backend
+        """
+        self.backend = backend or MemoryCacheBackend(max_size)
+        self.ttl = ttl
+
+    @staticmethod
+    def make_key(table: str, version: int, role: Hashable, info: SQLQueryInfo, page, size) -> str:
+        raw = repr((role, info.normalize(), page, size))
+        digest = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+        return 'slim:%s:%d:%s' % (table, version, digest)
+
+    async def get_version(self, table: str) -> int:
+        return await self.backend.get_version(table)
+
+    async def get_version_token(self, table: str) -> str:
+        """
+        Version of table which is unique across processes and restarts, for ETag
+        """
+        return '%s:%d' % (self.backend.version_nonce, await self.backend.get_version(table))
+
+    async def get(self, key: str) -> Optional[Any]:
+        return await self.backend.get(key)
+
+    async def set(self, key: str, value: Any):
+        await self.backend.set(key, value, self.ttl)
+
+    async def invalidate(self, table: str):
+        """
+        Invalidate all cached results of table
+        """
+        await self.backend.incr_version(table)
@@ -4,6 +4,12 @@ SET_COOKIE = istr('Set-Cookie')
 CONTENT_TYPE = istr('Content-Type')
 X_FORWARDED_FOR = istr('X-Forwarded-For')
 X_FORWARDED_HOST = istr('X-Forwarded-Host')
+ETAG = istr('ETag')
+IF_NONE_MATCH = istr('If-None-Match')
+SERVER_TIMING = istr('Server-Timing')
+ACCEPT_ENCODING = istr('Accept-Encoding')
+CONTENT_ENCODING = istr('Content-Encoding')
+VARY = istr('Vary')
 
 ACCESS_CONTROL_ALLOW_CREDENTIALS = istr('Access-Control-Allow-Credentials')
 ACCESS_CONTROL_ALLOW_HEADERS = istr('Access-Control-Allow-Headers')
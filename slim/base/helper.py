@@ -2,6 +2,8 @@ import base64
 import hashlib
 import hmac
 import logging
+from collections import OrderedDict
+from typing import Optional, Tuple
 
 import msgpack
 
@@ -18,22 +20,77 @@ def _value_decode(data: bytes):
     return msgpack.loads(data, raw=False)
 
 
+SIGN_VERSION_HMAC_SHA256 = 1
+SIGN_VERSION_BLAKE2 = 2
+
+_IMMUTABLE_TYPES = (str, bytes, int, float, bool, type(None))
+
+
+def _blake2_key(secret: bytes) -> bytes:
+    # key of blake2b is 64 bytes at most
+    return secret if len(secret) <= 64 else hashlib.sha512(secret).digest()
+
+
 def _create_signature(secret: bytes, s):
-    # hash = hashlib.blake2s(_signature_encode(s), key=secret[:32]) py3.6+
+    if s and s[0] == SIGN_VERSION_BLAKE2:
+        return hashlib.blake2b(_value_encode(s), key=_blake2_key(secret), digest_size=32).hexdigest()
     m = hmac.new(secret, digestmod=hashlib.sha256)
     m.update(_value_encode(s))
     return m.hexdigest()
 
 
 def create_signed_value(secret, s: [list, tuple]):
+    """
+    :param s: [version, ...], version 1 is signed by HMAC-SHA256, version 2 by keyed BLAKE2b (faster)
+    """
     sign = _create_signature(secret, s)
     return str(base64.b64encode(_value_encode(s + [sign])), 'utf-8')
 
 
+class _VerifiedValues:
+    """
+    LRU of signed values verified recently, skip decoding and signing again for the same cookie.
+    """
+
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        # (secret, value): (raw, decoded data if all items are immutable)
+        self._data: 'OrderedDict[Tuple[bytes, str], Tuple[bytes, Optional[tuple]]]' = OrderedDict()
+
+    def get(self, secret: bytes, s: str) -> Optional[list]:
+        item = self._data.get((secret, s))
+        if item is None:
+            return None
+        self._data.move_to_end((secret, s))
+        raw, data = item
+        if data is not None:
+            return list(data)
+        # don't share mutable values between requests
+        return _value_decode(raw)[:-1]
+
+    def set(self, secret: bytes, s: str, raw: bytes, data: list):
+        immutable = all(isinstance(x, _IMMUTABLE_TYPES) for x in data)
+        self._data[(secret, s)] = (raw, tuple(data) if immutable else None)
+        if len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+
+verified_values = _VerifiedValues()
+
+
 def decode_signed_value(secret, s):
-    s = _value_decode(base64.b64decode(bytes(s, 'utf-8')))
-    data = s[:-1]
+    data = verified_values.get(secret, s)
+    if data is not None:
+        return data
+
+    raw = base64.b64decode(bytes(s, 'utf-8'))
+    s_decoded = _value_decode(raw)
+    data = s_decoded[:-1]
     sign = _create_signature(secret, data)
-    if sign != s[-1]:
+    if not isinstance(s_decoded[-1], str) or not hmac.compare_digest(sign, s_decoded[-1]):
         return None
+    verified_values.set(secret, s, raw, data)
     return data
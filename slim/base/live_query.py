@@ -0,0 +1,352 @@
+import json
+import logging
+import operator
+import re
+from typing import Dict, Set, Any, Optional, List, Tuple, Iterable, Mapping, TYPE_CHECKING
+
+from .sqlquery import SQLQueryInfo, SQL_OP, DictDataRecord
+from .ws import WebSocket, encode_message
+from .web import ASGIRequest
+from ..exception import TableNotFound, InvalidParams, SlimException, FinishQuitException
+from ..retcode import RETCODE
+from ..utils import sentinel
+from ..utils.json_ex import json_ex_dumps
+
+if TYPE_CHECKING:
+    from .app import Application
+    from .permission import Ability
+    from .user import BaseUser
+
+logger = logging.getLogger(__name__)
+
+_like_patterns: Dict[Tuple[str, int], 're.Pattern'] = {}
+
+
+def _like_match(value, pattern, flags=0) -> bool:
+    if not isinstance(value, str) or not isinstance(pattern, str):
+        return False
+    regex = _like_patterns.get((pattern, flags))
+    if regex is None:
+        parts = []
+        for c in pattern:
+            if c == '%':
+                parts.append('.*')
+            elif c == '_':
+                parts.append('.')
+            else:
+                parts.append(re.escape(c))
+        regex = _like_patterns[(pattern, flags)] = re.compile(''.join(parts), flags | re.DOTALL)
+    return regex.fullmatch(value) is not None
+
+
+def _compare(func):
+    def wrapper(a, b):
+        # comparing with NULL is never true in SQL
+        if a is None or b is None:
+            return False
+        return func(a, b)
+    return wrapper
+
+
+_OPS = {
+    SQL_OP.EQ: lambda a, b: a is None if b is None else a == b,
+    SQL_OP.NE: lambda a, b: a is not None if b is None else (a is not None and a != b),
+    SQL_OP.LT: _compare(operator.lt),
+    SQL_OP.LE: _compare(operator.le),
+    SQL_OP.GE: _compare(operator.ge),
+    SQL_OP.GT: _compare(operator.gt),
+    SQL_OP.IN: lambda a, b: a is not None and a in b,
+    SQL_OP.NOT_IN: lambda a, b: a is not None and a not in b,
+    SQL_OP.IS: lambda a, b: a is None if b is None else a == b,
+    SQL_OP.IS_NOT: lambda a, b: a is not None if b is None else a != b,
+    SQL_OP.PREFIX: lambda a, b: isinstance(a, str) and a.startswith(b),
+    SQL_OP.CONTAINS: lambda a, b: a is not None and all(x in a for x in b),
+    SQL_OP.CONTAINS_ANY: lambda a, b: a is not None and any(x in a for x in b),
+    SQL_OP.LIKE: lambda a, b: _like_match(a, b),
+    SQL_OP.ILIKE: lambda a, b: _like_match(a, b, re.IGNORECASE),
+}
+
+
+class LiveQueryRejected(SlimException):
+    """
+    The subscription is rejected by `before_query` of the view (the view finished)
+    """
+    def __init__(self, ret_val: Dict):
+        super().__init__(ret_val)
+        self.ret_val = ret_val
+
+
+class LiveQuery:
+    """
+    A query subscribed by a websocket connection, bound under the role of the connection.
+    """
+    __slots__ = ('id', 'conn', 'table', 'info', 'ability', 'user', 'index_key')
+
+    def __init__(self, id_: str, conn: WebSocket, table: str, info: SQLQueryInfo, ability: 'Ability',
+                 user: Optional['BaseUser']):
+        self.id = id_
+        self.conn = conn
+        self.table = table
+        self.info = info
+        self.ability = ability
+        self.user = user
+        self.index_key: Optional[Tuple[str, Any]] = None  # (column, value) of an equality condition
+
+        for column, op, value in sorted(info.conditions, key=lambda x: x[0]):
+            if op == SQL_OP.EQ and value is not None:
+                try:
+                    hash(value)
+                except TypeError:
+                    continue
+                self.index_key = (column, value)
+                break
+
+    def match(self, record: Mapping) -> bool:
+        for column, op, value in self.info.conditions:
+            try:
+                if not _OPS[op](record.get(column), value):
+                    return False
+            except TypeError:
+                return False
+        return True
+
+    def visible(self, record: Mapping) -> Optional[Dict]:
+        """
+        Columns of the record could be read by subscriber
+        """
+        rec = DictDataRecord(self.table, record)
+        if not rec.set_info(self.info, self.ability, self.user):
+            return None
+        return rec.to_dict()
+
+
+class _TableIndex:
+    def __init__(self):
+        self.eq: Dict[str, Dict[Any, Set[LiveQuery]]] = {}
+        self.scan: Set[LiveQuery] = set()  # queries without equality conditions
+
+    def __bool__(self):
+        return bool(self.eq or self.scan)
+
+    def add(self, q: LiveQuery):
+        if q.index_key is None:
+            self.scan.add(q)
+        else:
+            column, value = q.index_key
+            self.eq.setdefault(column, {}).setdefault(value, set()).add(q)
+
+    def remove(self, q: LiveQuery):
+        if q.index_key is None:
+            self.scan.discard(q)
+            return
+
+        column, value = q.index_key
+        values = self.eq.get(column)
+        if values is not None:
+            queries = values.get(value)
+            if queries is not None:
+                queries.discard(q)
+                if not queries:
+                    del values[value]
+                    if not values:
+                        del self.eq[column]
+
+    def candidates(self, record: Mapping, ret: Set[LiveQuery]):
+        for column, values in self.eq.items():
+            try:
+                queries = values.get(record.get(column))
+            except TypeError:
+                continue
+            if queries:
+                ret.update(queries)
+        ret.update(self.scan)
+
+
+class LiveQueryHub:
+    """
+    Live queries of an application (`app.live_queries`).
+    Changes written by SQL views (set/bulk_set/new/bulk_insert/delete) are matched against subscribed queries in memory,
+    and pushed to the connections as deltas:
+        {"op": "add" | "update" | "remove", "id": <subscription id>, "table": "topic", "record": {...}}
+    Only changes made through the views of this process are seen.
+    """
+
+    def __init__(self, app: 'Application'):
+        self.app = app
+        self._tables: Dict[str, _TableIndex] = {}
+        self._queries: Dict[str, LiveQuery] = {}
+        self._by_conn: Dict[WebSocket, Dict[str, LiveQuery]] = {}
+        self._next_id = 0
+
+    def __len__(self):
+        return len(self._queries)
+
+    def has_subscriptions(self, table: str) -> bool:
+        return table in self._tables
+
+    async def subscribe(self, conn: WebSocket, table: str, params: Mapping, *, role=sentinel) -> LiveQuery:
+        """
+        Subscribe a query, it's checked like `list` of the view by the user and role of connection,
+        `before_query` of the view is called. Raise `LiveQueryRejected` if the view finished in it.
+        :param conn:
+        :param table:
+        :param params: like query parameters of `list`, e.g. {'board_id': 1, 'select': 'id,title'}
+        :param role: `Role` header of the connection by default
+        """
+        view_cls = self.app.tables.get(table)
+        if view_cls is None:
+            raise TableNotFound(table)
+
+        request = conn.request
+        if role is not sentinel:
+            # checked as a request with the `Role` header
+            headers = [x for x in request.scope['headers'] if x[0].lower() != b'role']
+            if role is not None:
+                headers.append((b'role', str(role).encode('utf-8')))
+            request = ASGIRequest(dict(request.scope, headers=headers), request.receive, request.send)
+
+        view = view_cls(self.app, request)
+        await view._prepare()
+        info = SQLQueryInfo(params, view=view)
+        try:
+            # rows restricted by the view are hidden too, as `list` does
+            await view._call_handle(view.before_query, info)
+        except FinishQuitException:
+            raise LiveQueryRejected(view.ret_val)
+        user = view.current_user if view.can_get_user else None
+
+        self._next_id += 1
+        q = LiveQuery(str(self._next_id), conn, table, info, view.ability, user)
+        self._queries[q.id] = q
+        self._by_conn.setdefault(conn, {})[q.id] = q
+        self._tables.setdefault(table, _TableIndex()).add(q)
+        return q
+
+    def unsubscribe(self, conn: WebSocket, query_id: str) -> bool:
+        q = self._queries.get(query_id)
+        if q is None or q.conn is not conn:
+            return False
+        self._remove(q)
+        return True
+
+    def remove_connection(self, conn: WebSocket):
+        for q in list(self._by_conn.get(conn, {}).values()):
+            self._remove(q)
+
+    def _remove(self, q: LiveQuery):
+        del self._queries[q.id]
+        queries = self._by_conn[q.conn]
+        del queries[q.id]
+        if not queries:
+            del self._by_conn[q.conn]
+
+        index = self._tables[q.table]
+        index.remove(q)
+        if not index:
+            del self._tables[q.table]
+
+    def notify(self, table: str, inserted: Iterable[Mapping] = (), updated: Iterable[Tuple[Mapping, Mapping]] = (),
+               deleted: Iterable[Mapping] = ()) -> int:
+        """
+        Push changes of table to matched subscriptions
+        :param table:
+        :param inserted: new records
+        :param updated: pairs of (old record, new record)
+        :param deleted: old records
+        :return: number of deltas pushed
+        """
+        index = self._tables.get(table)
+        if index is None:
+            return 0
+
+        num = 0
+        for record in inserted:
+            num += self._push(index, table, None, record)
+        for old, new in updated:
+            num += self._push(index, table, old, new)
+        for record in deleted:
+            num += self._push(index, table, record, None)
+        return num
+
+    def _push(self, index: _TableIndex, table: str, old: Optional[Mapping], new: Optional[Mapping]) -> int:
+        candidates = set()
+        if old is not None:
+            index.candidates(old, candidates)
+        if new is not None:
+            index.candidates(new, candidates)
+
+        num = 0
+        for q in candidates:
+            old_match = old is not None and q.match(old)
+            new_match = new is not None and q.match(new)
+            if new_match:
+                op = 'update' if old_match else 'add'
+                record = q.visible(new)
+            elif old_match:
+                op = 'remove'
+                record = q.visible(old)
+            else:
+                continue
+
+            if record is None:
+                continue
+            data = json_ex_dumps({'op': op, 'id': q.id, 'table': table, 'record': record})
+            q.conn.enqueue(encode_message(data))
+            num += 1
+        return num
+
+
+class LiveQueryWebSocket(WebSocket):
+    """
+    Websocket endpoint of live queries, messages are JSON:
+        -> {"op": "subscribe", "table": "topic", "query": {"board_id": 1}, "role": "user", "ref": 1}
+        <- {"op": "subscribed", "id": "1", "ref": 1}
+        <- {"op": "add", "id": "1", "table": "topic", "record": {...}}
+        -> {"op": "unsubscribe", "id": "1", "ref": 2}
+        <- {"op": "unsubscribed", "id": "1", "ref": 2}
+        <- {"op": "error", "code": ..., "data": ..., "ref": ...}
+
+        app.route.websocket('live')(LiveQueryWebSocket)
+
+    Fetch the initial records by `list`, then apply the deltas.
+    """
+
+    def reply(self, data: Dict):
+        self.enqueue(encode_message(json_ex_dumps(data)))
+
+    async def on_receive(self, data: [str, bytes]):
+        from ._view.base_view import BaseView
+        from ._view.err_catch_context import ErrorCatchContext
+
+        try:
+            msg = json.loads(data)
+            assert isinstance(msg, dict)
+        except (ValueError, AssertionError):
+            return self.reply({'op': 'error', 'code': RETCODE.INVALID_PARAMS, 'data': 'invalid message'})
+
+        hub = self.app.live_queries
+        ref = msg.get('ref')
+        op = msg.get('op')
+
+        if op == 'subscribe':
+            query = msg.get('query') or {}
+            role = msg['role'] if 'role' in msg else sentinel
+            view = BaseView(self.app, self.request)
+            with ErrorCatchContext(view):
+                if not isinstance(query, dict) or not isinstance(msg.get('table'), str):
+                    raise InvalidParams('invalid subscribe message')
+                try:
+                    q = await hub.subscribe(self, msg['table'], query, role=role)
+                except LiveQueryRejected as e:
+                    return self.reply({'op': 'error', 'ref': ref, **e.ret_val})
+                return self.reply({'op': 'subscribed', 'id': q.id, 'ref': ref})
+            self.reply({'op': 'error', 'ref': ref, **view.ret_val})
+
+        elif op == 'unsubscribe':
+            if hub.unsubscribe(self, str(msg.get('id'))):
+                self.reply({'op': 'unsubscribed', 'id': msg.get('id'), 'ref': ref})
+            else:
+                self.reply({'op': 'error', 'code': RETCODE.NOT_FOUND, 'data': msg.get('id'), 'ref': ref})
+
+        else:
+            self.reply({'op': 'error', 'code': RETCODE.INVALID_PARAMS, 'data': 'unknown op: %r' % op, 'ref': ref})
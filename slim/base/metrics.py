@@ -0,0 +1,159 @@
+import math
+from bisect import bisect_left
+from typing import Dict, Tuple, List, Optional
+
+LabelsType = Tuple[Tuple[str, str], ...]
+
+
+def _make_bounds(low=1e-5, high=60.0, sub_buckets=4) -> Tuple[float, ...]:
+    # log-linear buckets like HDR histogram: `sub_buckets` linear steps in every power of 2
+    bounds = []
+    base = low
+    while base < high:
+        step = base / sub_buckets
+        for i in range(sub_buckets):
+            bounds.append(base + step * i)
+        base *= 2
+    bounds.append(base)
+    return tuple(bounds)
+
+
+class Counter:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def incr(self, num=1):
+        self.value += num
+
+
+class Histogram:
+    """
+    Latency histogram (seconds) with pre-allocated buckets.
+    Recording is a bisect and two additions, no lock is required in the event loop.
+    """
+    __slots__ = ('counts', 'sum', 'count')
+    BOUNDS = _make_bounds()
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)  # the last one for values greater than all bounds
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.BOUNDS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        Upper bound of the bucket which the quantile falls in
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for i, num in enumerate(self.counts):
+            seen += num
+            if seen >= rank:
+                return self.BOUNDS[i] if i < len(self.BOUNDS) else math.inf
+        return math.inf
+
+
+class MetricsRegistry:
+    """
+    In-process metrics: counters, gauges and latency histograms, labelled.
+    Exported as prometheus text format by `render`.
+    """
+
+    def __init__(self):
+        self.counters: Dict[str, Dict[LabelsType, Counter]] = {}
+        self.gauges: Dict[str, Dict[LabelsType, float]] = {}
+        self.histograms: Dict[str, Dict[LabelsType, Histogram]] = {}
+        # metrics objects of hot paths, skip building labels every time
+        self._request_metrics: Dict[tuple, Tuple[Counter, Histogram]] = {}
+        self._sql_metrics: Dict[tuple, Histogram] = {}
+
+    def counter(self, name: str, labels: LabelsType = ()) -> Counter:
+        metric = self.counters.setdefault(name, {})
+        c = metric.get(labels)
+        if c is None:
+            c = metric[labels] = Counter()
+        return c
+
+    def histogram(self, name: str, labels: LabelsType = ()) -> Histogram:
+        metric = self.histograms.setdefault(name, {})
+        h = metric.get(labels)
+        if h is None:
+            h = metric[labels] = Histogram()
+        return h
+
+    def incr(self, name: str, labels: LabelsType = (), num=1):
+        self.counter(name, labels).value += num
+
+    def observe(self, name: str, value: float, labels: LabelsType = ()):
+        self.histogram(name, labels).observe(value)
+
+    def set_gauge(self, name: str, value: float, labels: LabelsType = ()):
+        self.gauges.setdefault(name, {})[labels] = value
+
+    def get_gauge(self, name: str, labels: LabelsType = ()) -> Optional[float]:
+        return self.gauges.get(name, {}).get(labels)
+
+    def record_request(self, handler_name: Optional[str], status: int, retcode: Optional[int], elapsed: float):
+        key = (handler_name, status, retcode)
+        item = self._request_metrics.get(key)
+        if item is None:
+            labels = (('handler', handler_name or ''), ('status', str(status)),
+                      ('retcode', '' if retcode is None else str(retcode)))
+            item = self._request_metrics[key] = (self.counter('slim_requests_total', labels),
+                                                 self.histogram('slim_request_seconds', labels[:1]))
+        item[0].value += 1
+        item[1].observe(elapsed)
+
+    def record_sql(self, table: Optional[str], op: str, elapsed: float):
+        key = (table, op)
+        h = self._sql_metrics.get(key)
+        if h is None:
+            h = self._sql_metrics[key] = self.histogram('slim_sql_seconds', (('table', table or ''), ('op', op)))
+        h.observe(elapsed)
+
+    @staticmethod
+    def _format_labels(labels: LabelsType, extra: LabelsType = ()) -> str:
+        labels = labels + extra
+        if not labels:
+            return ''
+        items = []
+        for k, v in labels:
+            v = str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            items.append('%s="%s"' % (k, v))
+        return '{%s}' % ','.join(items)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        fmt = self._format_labels
+
+        for name, metric in self.counters.items():
+            lines.append('# TYPE %s counter' % name)
+            for labels, c in metric.items():
+                lines.append('%s%s %s' % (name, fmt(labels), c.value))
+
+        for name, metric in self.gauges.items():
+            lines.append('# TYPE %s gauge' % name)
+            for labels, v in metric.items():
+                lines.append('%s%s %s' % (name, fmt(labels), v))
+
+        for name, metric in self.histograms.items():
+            lines.append('# TYPE %s histogram' % name)
+            for labels, h in metric.items():
+                seen = 0
+                for bound, num in zip(h.BOUNDS, h.counts):
+                    seen += num
+                    if num:  # skip empty buckets to keep output small
+                        lines.append('%s_bucket%s %d' % (name, fmt(labels, (('le', '%g' % bound),)), seen))
+                lines.append('%s_bucket%s %d' % (name, fmt(labels, (('le', '+Inf'),)), h.count))
+                lines.append('%s_sum%s %s' % (name, fmt(labels), h.sum))
+                lines.append('%s_count%s %d' % (name, fmt(labels), h.count))
+
+        return '\n'.join(lines) + '\n'
@@ -147,6 +147,9 @@ class Route:
                 except Exception as e:
                     raise InvalidRouteUrl(_fullpath, e)
 
+        # fetch fields of all sql views at once
+        AbstractSQLView._fetch_fields_all(x.view_cls for x in self._views if issubclass(x.view_cls, AbstractSQLView))
+
         # bind views
         for view_info in self._views:
             view_cls = view_info.view_cls
@@ -200,6 +203,7 @@ class Route:
 
             fullpath = urljoin(self._app.mountpoint, meta.url)
             meta.fullpath = fullpath
+            meta.ws_cls._app = self._app
             add_to_url_ws_mapping(meta, fullpath)
 
     def query_ws_path(self, path) -> Tuple[Union[RouteWebsocketInfo, None], Optional[Dict]]:
@@ -0,0 +1,314 @@
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Callable, Set, TYPE_CHECKING
+
+from ..utils import async_call
+
+if TYPE_CHECKING:
+    from .app import Application
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduleMode:
+    FIXED_RATE = 'fixed_rate'  # runs at start + n * interval, no drift
+    FIXED_DELAY = 'fixed_delay'  # waits interval after the previous run finished
+
+
+class CronExpr:
+    """
+    Cron expression of five fields: minute hour day month weekday (0 or 7 is Sunday), in local time.
+    Supports `*`, `a-b`, `*/n`, `a-b/n`, lists like `1,15,30` and @yearly, @monthly, @weekly, @daily, @hourly.
+    As cron does, if both day and weekday are restricted, a time matches either of them.
+    """
+    ALIASES = {
+        '@yearly': '0 0 1 1 *',
+        '@annually': '0 0 1 1 *',
+        '@monthly': '0 0 1 * *',
+        '@weekly': '0 0 * * 0',
+        '@daily': '0 0 * * *',
+        '@hourly': '0 * * * *',
+    }
+    RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expr: str):
+        self.expr = expr
+        fields = self.ALIASES.get(expr.strip(), expr).split()
+        if len(fields) != 5:
+            raise ValueError('invalid cron expression: %r' % expr)
+
+        parsed = [self._parse_field(f, lo, hi) for f, (lo, hi) in zip(fields, self.RANGES)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = {x % 7 for x in weekdays}
+        self.day_restricted = fields[2] != '*'
+        self.weekday_restricted = fields[4] != '*'
+
+    @staticmethod
+    def _parse_field(field: str, lo: int, hi: int) -> Set[int]:
+        ret = set()
+        for part in field.split(','):
+            step = 1
+            if '/' in part:
+                part, step = part.split('/', 1)
+                step = int(step)
+                if step <= 0:
+                    raise ValueError('invalid cron step: %r' % field)
+            if part == '*':
+                start, end = lo, hi
+            elif '-' in part:
+                start, end = map(int, part.split('-', 1))
+            else:
+                start = end = int(part)
+                if step != 1:
+                    end = hi
+            if start < lo or end > hi or start > end:
+                raise ValueError('cron field out of range: %r' % field)
+            ret.update(range(start, end + 1, step))
+        return ret
+
+    def _match_day(self, dt: datetime) -> bool:
+        day = dt.day in self.days
+        weekday = (dt.weekday() + 1) % 7 in self.weekdays
+        if self.day_restricted and self.weekday_restricted:
+            return day or weekday
+        return day and weekday
+
+    def next_after(self, dt: datetime) -> datetime:
+        """
+        The first time matched later than dt
+        """
+        dt = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt + timedelta(days=366 * 5)
+        while dt < limit:
+            if dt.month not in self.months:
+                dt = (dt.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._match_day(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+            elif dt.hour not in self.hours:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+            elif dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+            else:
+                return dt
+        raise ValueError('cron expression never matches: %r' % self.expr)
+
+    def __repr__(self):
+        return '<CronExpr %r>' % self.expr
+
+
+class Job:
+    """
+    A periodic job of the scheduler, counters are for inspecting:
+        runs, failures, skipped (not started because of max_concurrency), last_error, last_duration
+    """
+
+    def __init__(self, name: str, func: Callable, *, interval: Optional[float] = None, cron: Optional[str] = None,
+                 mode=ScheduleMode.FIXED_RATE, jitter: float = 0, max_concurrency=1,
+                 exit_when: Optional[Callable[[], bool]] = None, run_immediately=False):
+        if (interval is None) == (cron is None):
+            raise ValueError('one of interval and cron is required')
+        if interval is not None and interval <= 0:
+            raise ValueError('interval must be positive')
+
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.cron = CronExpr(cron) if cron is not None else None
+        self.mode = mode
+        self.jitter = jitter
+        self.max_concurrency = max_concurrency
+        self.exit_when = exit_when
+        self.run_immediately = run_immediately
+
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_error: Optional[BaseException] = None
+        self.last_duration: Optional[float] = None
+        self.next_run_at: Optional[float] = None  # time.time()
+
+        self._task: Optional[asyncio.Task] = None
+        self._running: Set[asyncio.Task] = set()
+
+    @property
+    def running(self) -> int:
+        return len(self._running)
+
+    def __repr__(self):
+        return '<Job %s runs=%d failures=%d skipped=%d running=%d>' % (
+            self.name, self.runs, self.failures, self.skipped, self.running)
+
+
+class Scheduler:
+    """
+    Periodic jobs of an application (`app.scheduler`), started after startup hooks and cancelled on shutdown.
+
+        @app.scheduler.job(interval=60)
+        async def refresh():
+            ...
+
+        @app.scheduler.job(cron='*/5 * * * *', jitter=10)
+        async def report():
+            ...
+
+    `FIXED_RATE` jobs are started at fixed ticks, a tick is skipped if `max_concurrency` runs are going on.
+    `FIXED_DELAY` jobs wait `interval` after the previous run finished. Exceptions of a run are logged and counted,
+    the job keeps scheduled. Run time is recorded as `slim_scheduler_run_seconds` if metrics enabled.
+    """
+
+    def __init__(self, app: 'Application', *, shutdown_timeout: float = 10):
+        """
+        :param app:
+        :param shutdown_timeout: seconds to wait for running jobs on shutdown, then they are cancelled
+        """
+        self.app = app
+        self.shutdown_timeout = shutdown_timeout
+        self.jobs: Dict[str, Job] = {}
+        self.running = False
+
+    def add(self, func: Callable, *, interval: Optional[float] = None, cron: Optional[str] = None,
+            mode=ScheduleMode.FIXED_RATE, jitter: float = 0, max_concurrency=1,
+            exit_when: Optional[Callable[[], bool]] = None, run_immediately=False, name: Optional[str] = None) -> Job:
+        """
+        :param func: function or coroutine function without arguments
+        :param interval: seconds
+        :param cron: cron expression, instead of interval
+        :param mode: `ScheduleMode.FIXED_RATE` or `ScheduleMode.FIXED_DELAY`, cron jobs are fixed rate
+        :param jitter: add random 0 ~ jitter seconds to every wait, avoid workers running at the same time
+        :param max_concurrency: runs of the job at the same time
+        :param exit_when: the job is stopped when it returns True
+        :param run_immediately: run once when started, or wait for the first interval
+        :param name: `func.__qualname__` by default, numbered if exists
+        """
+        if name is None:
+            # lambdas, closures or a function added twice get unique names like `<lambda>#2`
+            base = getattr(func, '__qualname__', None) or repr(func)
+            name, n = base, 1
+            while name in self.jobs:
+                n += 1
+                name = '%s#%d' % (base, n)
+        elif name in self.jobs:
+            raise ValueError('job exists: %s' % name)
+        job = Job(name, func, interval=interval, cron=cron, mode=mode, jitter=jitter, max_concurrency=max_concurrency,
+                  exit_when=exit_when, run_immediately=run_immediately)
+        self.jobs[name] = job
+        if self.running:
+            job._task = asyncio.ensure_future(self._run_job(job))
+        return job
+
+    def job(self, **kwargs):
+        """
+        Decorator of `add`
+        """
+        def wrapper(func):
+            self.add(func, **kwargs)
+            return func
+        return wrapper
+
+    def remove(self, name: str):
+        job = self.jobs.pop(name)
+        if job._task:
+            job._task.cancel()
+            job._task = None
+
+    async def start(self):
+        self.running = True
+        for job in self.jobs.values():
+            if job._task is None:
+                job._task = asyncio.ensure_future(self._run_job(job))
+
+    async def stop(self):
+        """
+        Stop scheduling, wait for running jobs until `shutdown_timeout`, then cancel them
+        """
+        self.running = False
+        tasks = [job._task for job in self.jobs.values() if job._task]
+        for job in self.jobs.values():
+            job._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        running: Dict[asyncio.Task, Job] = {t: job for job in self.jobs.values() for t in job._running}
+        if running:
+            done, pending = await asyncio.wait(running, timeout=self.shutdown_timeout)
+            for task in pending:
+                logger.warning('job %s cancelled on shutdown', running[task].name)
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def _delay(self, job: Job) -> float:
+        return random.uniform(0, job.jitter) if job.jitter else 0
+
+    async def _run_job(self, job: Job):
+        loop = asyncio.get_event_loop()
+        anchor = loop.time()
+        ticks = 0
+        first = job.run_immediately
+
+        while True:
+            # wait for next run
+            if job.cron:
+                now = datetime.now()
+                wait = (job.cron.next_after(now) - now).total_seconds()
+            elif job.mode == ScheduleMode.FIXED_DELAY:
+                wait = job.interval
+            else:
+                if not first:
+                    ticks += 1
+                target = anchor + ticks * job.interval
+                if target < loop.time():
+                    # missed ticks (e.g. the loop was blocked), resume from now
+                    ticks = int((loop.time() - anchor) // job.interval) + 1
+                    target = anchor + ticks * job.interval
+                wait = target - loop.time()
+
+            if first:
+                wait = 0
+                first = False
+            wait += self._delay(job)
+            job.next_run_at = time.time() + wait
+            await asyncio.sleep(wait)
+
+            if job.exit_when and job.exit_when():
+                job._task = None
+                return
+
+            if job.running >= job.max_concurrency:
+                job.skipped += 1
+                logger.warning('job %s skipped, %d runs not finished', job.name, job.running)
+                self._record_metrics('slim_scheduler_skipped_total', job)
+                continue
+
+            task = asyncio.ensure_future(self._execute(job))
+            job._running.add(task)
+            task.add_done_callback(job._running.discard)
+            if job.mode == ScheduleMode.FIXED_DELAY and not job.cron:
+                await asyncio.shield(task)
+
+    async def _execute(self, job: Job):
+        start = time.perf_counter()
+        try:
+            await async_call(job.func)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job.failures += 1
+            job.last_error = e
+            logger.exception('job %s failed', job.name)
+            self._record_metrics('slim_scheduler_failures_total', job)
+        finally:
+            job.runs += 1
+            job.last_duration = time.perf_counter() - start
+            metrics = self.app.metrics
+            if metrics:
+                metrics.observe('slim_scheduler_run_seconds', job.last_duration, (('job', job.name),))
+
+    def _record_metrics(self, name, job: Job):
+        metrics = self.app.metrics
+        if metrics:
+            metrics.incr(name, (('job', job.name),))
@@ -1,38 +1,82 @@
+import asyncio
 import logging
+import secrets
+import time
 from abc import abstractmethod
+from collections import OrderedDict
+from typing import Optional, Tuple, Any, Dict
+
+import msgpack
+
+from .helper import decode_signed_value
+from ..utils.resp import RESPClient
 
 logger = logging.getLogger(__name__)
 
 
 class BaseSession:
+    """
+    Data is loaded at the first access if `load_sync` is implemented, otherwise loaded by `get_session`.
+    It's saved at the end of request only if modified,
+    call `mark_dirty()` after changing a mutable value in place, like `session['items'].append(1)`.
+    """
+    _attrs = ('_view', '_data', 'key', '_loaded', '_dirty')
+    require_key = True
+
     def __init__(self, view):
         self.key = None
         self._view = view
         self._data = {}
+        self._loaded = False
+        self._dirty = False
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self._data = self.load_sync() or {}
+            self._loaded = True
 
     def __delitem__(self, key):
+        self._ensure_loaded()
         del self._data[key]
+        self._dirty = True
 
     def __getitem__(self, key):
+        self._ensure_loaded()
         return self._data.get(key)
 
     def __setitem__(self, key, value):
-        if self.key is None:
+        if self.require_key and self.key is None:
             raise AttributeError("Use `session.create` to set a key before store value")
+        self._ensure_loaded()
         self._data[key] = value
+        self._dirty = True
 
     def __setattr__(self, key, value):
-        if key not in ('_view', '_data', 'key'):
+        if key not in self._attrs:
             raise AttributeError("use session[%r] = ... to set value" % key)
         super().__setattr__(key, value)
 
     def __contains__(self, item):
+        self._ensure_loaded()
         return item in self._data
 
+    @property
+    def dirty(self) -> bool:
+        return self._dirty
+
+    def mark_dirty(self):
+        self._dirty = True
+
     @abstractmethod
     async def get_key(self):
         raise NotImplementedError
 
+    def load_sync(self):
+        """
+        Load data without IO, implement it to load data lazily
+        """
+        raise NotImplementedError
+
     @abstractmethod
     async def load(self):
         raise NotImplementedError
@@ -50,19 +94,41 @@ class BaseSession:
         """
         session = cls(view)
         session.key = await session.get_key()
-        session._data = await session.load() or {}
+        if cls.load_sync is BaseSession.load_sync:
+            session._data = await session.load() or {}
+            session._loaded = True
         return session
 
 
 class CookieSession(BaseSession):
+    """
+    Data is signed and stored in cookie `s`, decoded at the first access.
+    The cookie is issued again if older than half of `max_age` when used, to keep the expiration sliding.
+    """
+    require_key = False
+    max_age = 30 * 24 * 60 * 60
+
     async def get_key(self):
         pass
 
+    def load_sync(self):
+        value = self._view.get_cookie('s')
+        if value:
+            data = decode_signed_value(self._view.app.options.cookies_secret, value)
+            if data and data[2] == 's':
+                age = time.time() - data[1]
+                if age > self.max_age:
+                    return {}
+                if age > self.max_age / 2:
+                    self._dirty = True
+                return data[3]
+        return {}
+
     async def load(self):
-        return self._view.get_secure_cookie('s') or {}
+        return self.load_sync()
 
     async def save(self):
-        self._view.set_secure_cookie('s', self._data)
+        self._view.set_secure_cookie('s', self._data, max_age=self.max_age)
 
 
 class BaseHeaderKeySession(BaseSession):
@@ -75,15 +141,217 @@ class BaseHeaderKeySession(BaseSession):
 
 
 class MemoryHeaderKeySession(BaseHeaderKeySession):
+    """
+    Sessions are kept in a dict forever, for development only.
+    Use `ServerSideSession` for expiration and bounded memory.
+    """
     data = {}
 
     def create(self, key, expire=30):
         if key not in MemoryHeaderKeySession.data:
             MemoryHeaderKeySession.data[key] = {}
         self.key = key
+        self._dirty = True
 
     async def load(self):
         return self.data.get(self.key, None)
 
     async def save(self):
         self.data[self.key] = self._data
+
+
+class BaseSessionBackend:
+    """
+    Storage of `ServerSideSession`.
+    Values are dicts of primitive types, an external backend should serialize them by itself.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def set(self, key: str, value: Dict[str, Any], ttl: float):
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def delete(self, key: str):
+        raise NotImplementedError()
+
+    async def close(self):
+        pass
+
+
+class MemorySessionBackend(BaseSessionBackend):
+    """
+    In-process backend, size-bounded LRU with expire time.
+    Expired sessions are removed when accessed, and by a sweeper task every `sweep_interval` seconds,
+    so sessions never visited again don't stay in memory.
+    """
+
+    def __init__(self, max_size=10000, sweep_interval: Optional[float] = 60):
+        """
+        :param max_size: the least recently used sessions are evicted beyond it
+        :param sweep_interval: seconds, None to disable the sweeper
+        """
+        self.max_size = max_size
+        self.sweep_interval = sweep_interval
+        self._data: 'OrderedDict[str, Tuple[float, Dict[str, Any]]]' = OrderedDict()
+        self._sweeper: Optional[asyncio.Task] = None
+        self._sweeper_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def __len__(self):
+        return len(self._data)
+
+    def _ensure_sweeper(self):
+        if self.sweep_interval is None:
+            return
+        loop = asyncio.get_running_loop()
+        sweeper = self._sweeper
+        if sweeper is None or sweeper.done() or self._sweeper_loop is not loop:
+            self._sweeper = loop.create_task(self._sweep_forever())
+            self._sweeper_loop = loop
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.sweep()
+
+    def sweep(self) -> int:
+        """
+        Remove expired sessions
+        :return: number of removed
+        """
+        now = time.monotonic()
+        expired = [k for k, (expire_at, _) in self._data.items() if expire_at < now]
+        for k in expired:
+            del self._data[k]
+        return len(expired)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        self._ensure_sweeper()
+        item = self._data.get(key)
+        if item is None:
+            return None
+
+        expire_at, value = item
+        if expire_at < time.monotonic():
+            del self._data[key]
+            return None
+
+        self._data.move_to_end(key)
+        return dict(value)
+
+    async def set(self, key: str, value: Dict[str, Any], ttl: float):
+        self._ensure_sweeper()
+        # copy it, changes of a session not saved should not be seen by others
+        self._data[key] = (time.monotonic() + ttl, dict(value))
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    async def delete(self, key: str):
+        self._data.pop(key, None)
+
+    async def close(self):
+        if self._sweeper:
+            self._sweeper.cancel()
+            self._sweeper = None
+            self._sweeper_loop = None
+
+
+class RedisSessionBackend(BaseSessionBackend):
+    """
+    Sessions stored in redis (or any server speaks redis protocol), expired by the server.
+    Values are serialized by msgpack.
+    """
+
+    def __init__(self, client: RESPClient = None, *, prefix='slim:session:'):
+        """
+        :param client: `RESPClient()` (127.0.0.1:6379) by default
+        :param prefix: prefix of keys
+        """
+        self.client = client or RESPClient()
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = await self.client.execute('GET', self.prefix + key)
+        if raw is None:
+            return None
+        return msgpack.loads(raw, raw=False)
+
+    async def set(self, key: str, value: Dict[str, Any], ttl: float):
+        raw = msgpack.dumps(value, use_bin_type=True)
+        await self.client.execute('SET', self.prefix + key, raw, 'PX', max(int(ttl * 1000), 1))
+
+    async def delete(self, key: str):
+        await self.client.execute('DEL', self.prefix + key)
+
+    async def close(self):
+        await self.client.close()
+
+
+class ServerSideSession(BaseHeaderKeySession):
+    """
+    Session data stored at server side, the key is sent by client in `Session` header.
+    Expiration is sliding: a session used after half of its ttl is saved again, extended to `ttl` seconds later.
+
+        class MySession(ServerSideSession):
+            backend = RedisSessionBackend(RESPClient('127.0.0.1', 6379))
+            ttl = 7 * 24 * 3600
+
+        app = Application(session_cls=MySession)
+
+        # in a view
+        key = await self.session.new()  # send the key to client
+        self.session['uid'] = user.id
+    """
+    _attrs = BaseSession._attrs + ('_ttl',)
+
+    backend: BaseSessionBackend = MemorySessionBackend()
+    ttl: float = 30 * 24 * 3600
+
+    def __init__(self, view):
+        super().__init__(view)
+        self._ttl = None
+
+    def create(self, key: str = None, expire: float = None):
+        """
+        :param key: a random key is generated if None
+        :param expire: seconds, `ttl` of the class if None
+        """
+        self.key = key or secrets.token_urlsafe(32)
+        self._ttl = expire
+        self._dirty = True
+
+    async def new(self, key: str = None, expire: float = None) -> str:
+        self.create(key, expire)
+        return self.key
+
+    async def load(self):
+        if not self.key:
+            return None
+        value = await self.backend.get(self.key)
+        if value is None:
+            # unknown or expired, don't accept a key chosen by client
+            self.key = None
+            return None
+        self._ttl = value.get('ttl')
+        if time.time() - value.get('ts', 0) > (self._ttl or self.ttl) / 2:
+            self._dirty = True
+        return value['data']
+
+    async def save(self):
+        if self.key is None:
+            return
+        ttl = self._ttl or self.ttl
+        await self.backend.set(self.key, {'data': self._data, 'ttl': self._ttl, 'ts': time.time()}, ttl)
+
+    async def destroy(self):
+        """
+        Remove the session from backend, e.g. signout
+        """
+        if self.key is not None:
+            await self.backend.delete(self.key)
+        self.key = None
+        self._data = {}
@@ -1,7 +1,7 @@
 import logging
 from abc import abstractmethod
 from enum import Enum
-from typing import Tuple, Dict, Iterable, Union, List, Sequence
+from typing import Tuple, Dict, Iterable, Union, List, Sequence, Any
 from .sqlquery import SQLQueryInfo, SQLValuesToWrite, DataRecord
 
 logger = logging.getLogger(__name__)
@@ -32,6 +32,16 @@ class AbstractSQLFunctions:
         """
         raise NotImplementedError()
 
+    async def select_max(self, info: SQLQueryInfo, column: str) -> Tuple[Any, int]:
+        """
+        Select max value of column and count of records matched by conditions of info,
+        used for cheap ETag of views.
+        :param info:
+        :param column:
+        :return: max value, count
+        """
+        raise NotImplementedError()
+
     @abstractmethod
     async def update(self, records: Iterable[DataRecord], values: SQLValuesToWrite, returning=False) -> Union[int, Sequence[DataRecord]]:
         """
@@ -42,6 +52,26 @@ class AbstractSQLFunctions:
         """
         raise NotImplementedError()
 
+    async def update_many(self, items: Sequence[Tuple[DataRecord, SQLValuesToWrite]], returning=False,
+                          chunk_size=500) -> Union[int, List[DataRecord]]:
+        """
+        Update records with different values, used by `bulk_set`.
+        Backends could override it to update a chunk in one statement, the default is one update per record.
+        :param items: [(record, values), ...]
+        :param returning:
+        :param chunk_size:
+        :return: return count if returning is False, otherwise records
+        """
+        records = []
+        count = 0
+        for record, values in items:
+            ret = await self.update([record], values, returning=returning)
+            if returning:
+                records.extend(ret)
+            else:
+                count += ret
+        return records if returning else count
+
     @abstractmethod
     async def insert(self, values_lst: Iterable[SQLValuesToWrite], returning=False, ignore_exists=False) -> Union[int, List[DataRecord]]:
         """
@@ -52,6 +82,27 @@ class AbstractSQLFunctions:
         """
         raise NotImplementedError()
 
+    async def copy_insert(self, values_lst: Sequence[SQLValuesToWrite], returning=False, ignore_exists=False,
+                          chunk_size=1000) -> Union[int, List[DataRecord]]:
+        """
+        Bulk ingestion used by `bulk_insert` in copy mode.
+        Backends could override it with a COPY-style protocol, the default is chunked insert.
+        :param values_lst:
+        :param returning:
+        :param ignore_exists:
+        :param chunk_size:
+        :return: return count if returning is False, otherwise records
+        """
+        records = []
+        count = 0
+        for i in range(0, len(values_lst), chunk_size):
+            ret = await self.insert(values_lst[i:i + chunk_size], returning=returning, ignore_exists=ignore_exists)
+            if returning:
+                records.extend(ret)
+            else:
+                count += ret
+        return records if returning else count
+
     @abstractmethod
     async def delete(self, records: Iterable[DataRecord]) -> int:
         raise NotImplementedError()
@@ -2,7 +2,7 @@ import json
 import logging
 import traceback
 from enum import Enum
-from typing import Union, Iterable, List, TYPE_CHECKING, Dict, Set, Mapping
+from typing import Union, Iterable, List, TYPE_CHECKING, Dict, Set, Mapping, Tuple
 from typing_extensions import Literal
 from multidict import MultiDict
 from schematics.exceptions import DataError, ConversionError
@@ -93,6 +93,14 @@ class DataRecord:
         return self.to_dict().__repr__()
 
 
+class DictDataRecord(DataRecord):
+    """
+    Record built from a dict, for example, a cached record.
+    """
+    def _to_dict(self) -> Dict:
+        return self.val.copy()
+
+
 class SQLForeignKey:
     def __init__(self, rel_table: str, rel_field: str, is_soft_key=False):
         self.rel_table = rel_table  # 关联的表
@@ -203,6 +211,25 @@ class SQLQueryInfo:
         info.bind(view)
         return info
 
+    def normalize(self) -> Tuple:
+        """
+        A hashable and stable form of select, conditions and orders.
+        Query with the same normalized value always select the same records.
+        """
+        def freeze(value):
+            if isinstance(value, (list, tuple)):
+                return tuple(map(freeze, value))
+            elif isinstance(value, (set, frozenset)):
+                return tuple(sorted(map(freeze, value), key=repr))
+            elif isinstance(value, dict):
+                return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+            return value
+
+        select = self.select if self.select is ALL_COLUMNS else tuple(sorted(self.select))
+        conditions = tuple(sorted(((c[0], c[1].name, freeze(c[2])) for c in self.conditions), key=repr))
+        orders = tuple((x.column, x.order) for x in self.orders)
+        return select, conditions, orders
+
     def set_orders(self, orders: List[SQLQueryOrder]):
         assert isinstance(orders, list)
         for i in orders:
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import time
+from typing import Optional, Callable, List, TYPE_CHECKING
+
+from ..utils import async_call
+
+if TYPE_CHECKING:
+    from .app import Application
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundTask:
+    __slots__ = ('func', 'args', 'kwargs', 'retries', 'name')
+
+    def __init__(self, func: Callable, args: tuple, kwargs: dict, retries: int, name: str):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.retries = retries
+        self.name = name
+
+    def __repr__(self):
+        return '<BackgroundTask %s>' % self.name
+
+
+class TaskQueue:
+    """
+    In-process queue of background tasks (`app.tasks`), run by a bounded number of workers in the event loop.
+    Tasks added by `view.add_background_task` are submitted after the response sent, so they don't add latency
+    to the request:
+
+        async def after_insert(self, raw_post, values_lst, records):
+            self.add_background_task(send_notification, records[0]['id'])
+
+    Failed tasks are retried with exponential backoff, queued tasks are drained on shutdown.
+    Tasks are lost if the process exits unexpectedly, don't use it for work that must be done.
+    Metrics: slim_tasks_queue_depth, slim_task_seconds, slim_tasks_failed_total, slim_tasks_retried_total,
+    slim_tasks_dropped_total.
+    """
+
+    def __init__(self, concurrency=16, *, max_size=10000, retries=0, retry_delay=0.5, drain_timeout=30):
+        """
+        :param concurrency: number of tasks running at the same time
+        :param max_size: tasks submitted are dropped when the queue is full
+        :param retries: default retry times of a failed task
+        :param retry_delay: seconds before the first retry, doubled every retry
+        :param drain_timeout: seconds to wait for queued tasks on shutdown
+        """
+        self.app: Optional['Application'] = None
+        self.concurrency = concurrency
+        self.max_size = max_size
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.drain_timeout = drain_timeout
+        self.closed = False
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def __len__(self):
+        return self._queue.qsize() if self._queue else 0
+
+    def _ensure_workers(self):
+        loop = asyncio.get_running_loop()
+        if self._workers and self._loop is loop:
+            return
+        # first use, or the loop changed
+        self._loop = loop
+        self._queue = asyncio.Queue(self.max_size)
+        self._workers = [loop.create_task(self._work_forever()) for _ in range(self.concurrency)]
+
+    def submit(self, func: Callable, *args, retries: Optional[int] = None, name: Optional[str] = None,
+               **kwargs) -> bool:
+        """
+        Queue a function or coroutine function to run in the background
+        :param func:
+        :param args:
+        :param retries: `self.retries` by default
+        :param name: for logs and metrics, `func.__qualname__` by default
+        :param kwargs:
+        :return: False if dropped
+        """
+        name = name or getattr(func, '__qualname__', None) or repr(func)
+        if self.closed:
+            logger.warning('task %s dropped, the queue is closed', name)
+            return False
+
+        self._ensure_workers()
+        task = BackgroundTask(func, args, kwargs, self.retries if retries is None else retries, name)
+        try:
+            self._queue.put_nowait(task)
+        except asyncio.QueueFull:
+            logger.warning('task %s dropped, the queue is full', name)
+            self._record_metrics('slim_tasks_dropped_total', task)
+            return False
+
+        self._record_depth()
+        return True
+
+    async def _work_forever(self):
+        queue = self._queue
+        while True:
+            task: BackgroundTask = await queue.get()
+            self._record_depth()
+            try:
+                await self._run(task)
+            finally:
+                queue.task_done()
+
+    async def _run(self, task: BackgroundTask):
+        metrics = self.app.metrics if self.app else None
+        for attempt in range(task.retries + 1):
+            if attempt:
+                self._record_metrics('slim_tasks_retried_total', task)
+                await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1))
+
+            start = time.perf_counter()
+            try:
+                await async_call(task.func, *task.args, **task.kwargs)
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                if attempt == task.retries:
+                    logger.exception('task %s failed', task.name)
+                    self._record_metrics('slim_tasks_failed_total', task)
+                else:
+                    logger.warning('task %s failed, retry %d/%d', task.name, attempt + 1, task.retries,
+                                   exc_info=True)
+            finally:
+                if metrics:
+                    metrics.observe('slim_task_seconds', time.perf_counter() - start, (('task', task.name),))
+
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until queued tasks are done
+        :return: False if timeout
+        """
+        if self._queue is None:
+            return True
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def close(self):
+        """
+        Called on shutdown, stop accepting tasks and drain the queue until `drain_timeout`
+        """
+        self.closed = True
+        if not await self.drain(self.drain_timeout):
+            logger.warning('%d background tasks not finished on shutdown', len(self))
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def _record_depth(self):
+        metrics = self.app.metrics if self.app else None
+        if metrics:
+            metrics.set_gauge('slim_tasks_queue_depth', self._queue.qsize())
+
+    def _record_metrics(self, name, task: BackgroundTask):
+        metrics = self.app.metrics if self.app else None
+        if metrics:
+            metrics.incr(name, (('task', task.name),))
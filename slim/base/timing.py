@@ -0,0 +1,176 @@
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, TYPE_CHECKING, List, Tuple
+
+if TYPE_CHECKING:
+    from .metrics import MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class QueryRecord:
+    """
+    A SQL statement executed in a request.
+    The text keeps placeholders of parameters, values of parameters are never recorded.
+    """
+    __slots__ = ('sql', 'table', 'op', 'view', 'handler', 'phase', 'elapsed', 'rows')
+
+    def __init__(self, sql: str, table: Optional[str], op: Optional[str], view: Optional[str],
+                 handler: Optional[str], phase: Optional[str], elapsed: float, rows: Optional[int] = None):
+        self.sql = sql
+        self.table = table
+        self.op = op
+        self.view = view
+        self.handler = handler
+        self.phase = phase
+        self.elapsed = elapsed
+        self.rows = rows  # None if unknown
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    def __repr__(self):
+        return '<QueryRecord %s %.3fms rows=%s: %s>' % (self.table, self.elapsed * 1000, self.rows, self.sql)
+
+
+class RequestTiming:
+    """
+    Time used by each phase of a request, in seconds.
+
+    Phases:
+        route: route lookup
+        prepare: build view, load session and user
+        validate: validators of interface
+        handler: the interface function, includes sql, load_fk and permission
+        sql: database queries
+        load_fk: loading foreign keys, includes its queries and permission checks
+        permission: record permission checks and after_read
+        serialize: dumping json
+        send: writing response
+    Phases could overlap (sql happens in handler), so the sum may exceed the total.
+
+    SQL statements are recorded in `queries` (at most MAX_QUERY_RECORDS) and counted as `counters['sql_queries']`.
+    The same statement of a table executed `n_plus_one_threshold` times (or load_fk querying the same table
+    repeatedly) is flagged as N+1 in `n_plus_one`.
+    """
+    PHASES = ('route', 'prepare', 'validate', 'handler', 'sql', 'load_fk', 'permission', 'serialize', 'send')
+    MAX_QUERY_RECORDS = 200
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.end = None
+        self.phases: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+
+        self.method: Optional[str] = None
+        self.path: Optional[str] = None
+        self.handler_name: Optional[str] = None
+        self.status: Optional[int] = None
+
+        self.metrics: Optional['MetricsRegistry'] = None  # registry of app, fed by sql functions
+        self.slow_query_threshold: Optional[float] = None  # seconds, None to disable slow query log
+        self.n_plus_one_threshold: Optional[int] = 5  # None to disable
+
+        self.phase: Optional[str] = None  # the innermost phase being measured
+        self.queries: List[QueryRecord] = []
+        self._query_times: Dict[tuple, int] = {}
+
+    def add(self, phase: str, elapsed: float):
+        self.phases[phase] = self.phases.get(phase, 0) + elapsed
+
+    def incr(self, name: str, num=1):
+        self.counters[name] = self.counters.get(name, 0) + num
+
+    @contextmanager
+    def measure(self, phase: str):
+        start = time.perf_counter()
+        prev_phase, self.phase = self.phase, phase
+        try:
+            yield
+        finally:
+            self.phase = prev_phase
+            self.add(phase, time.perf_counter() - start)
+
+    @property
+    def query_count(self) -> int:
+        return self.counters.get('sql_queries', 0)
+
+    @property
+    def n_plus_one(self) -> List[Tuple[Optional[str], str, int]]:
+        """
+        Statements flagged as N+1: (table, sql or 'load_fk', times)
+        """
+        threshold = self.n_plus_one_threshold
+        if not threshold:
+            return []
+        return [(table, sql, times) for (table, sql), times in self._query_times.items() if times >= threshold]
+
+    def add_query(self, record: QueryRecord):
+        self.incr('sql_queries')
+        if len(self.queries) < self.MAX_QUERY_RECORDS:
+            self.queries.append(record)
+
+        if self.slow_query_threshold is not None and record.elapsed >= self.slow_query_threshold:
+            logger.warning('slow query %.2fms, %s -> %s: %s', record.elapsed * 1000, record.handler, record.table,
+                           record.sql)
+
+        if self.n_plus_one_threshold:
+            # queries of load_fk have different numbers of parameters, count them by table
+            key = (record.table, 'load_fk') if record.phase == 'load_fk' else (record.table, record.sql)
+            times = self._query_times.get(key, 0) + 1
+            self._query_times[key] = times
+            if times == self.n_plus_one_threshold:
+                logger.warning('possible N+1 queries, %s -> %s executed %d times: %s', record.handler,
+                               record.table, times, record.sql)
+
+    def finish(self):
+        self.end = time.perf_counter()
+
+    @property
+    def total(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+    def server_timing(self) -> str:
+        """
+        Value of Server-Timing header, durations in milliseconds
+        """
+        items = ['%s;dur=%.3f' % (k, v * 1000) for k, v in self.phases.items()]
+        items.append('total;dur=%.3f' % (self.total * 1000))
+        return ', '.join(items)
+
+    def to_dict(self):
+        return {
+            'method': self.method,
+            'path': self.path,
+            'handler': self.handler_name,
+            'status': self.status,
+            'total': self.total,
+            'phases': self.phases.copy(),
+            'counters': self.counters.copy(),
+            'n_plus_one': self.n_plus_one,
+        }
+
+
+_current_timing: ContextVar[Optional[RequestTiming]] = ContextVar('slim_request_timing', default=None)
+
+
+def get_current_timing() -> Optional[RequestTiming]:
+    """
+    Timing of the request handling in current context, None if outside a request
+    """
+    return _current_timing.get()
+
+
+@contextmanager
+def measure(phase: str):
+    """
+    Add time used to the phase of current request
+    """
+    timing = _current_timing.get()
+    if timing is None:
+        yield
+    else:
+        with timing.measure(phase):
+            yield
@@ -5,4 +5,5 @@ class BuiltinInterface:
     SET = 'set'
     NEW = 'new'
     BULK_INSERT = 'bulk_insert'
+    BULK_SET = 'bulk_set'
     DELETE = 'delete'
@@ -1,6 +1,8 @@
+import time
 import typing
 from abc import abstractmethod
-from typing import Union, Type
+from collections import OrderedDict
+from typing import Union, Type, Optional, Tuple, Any, Dict, Set, Hashable
 
 if typing.TYPE_CHECKING:
     from .view import BaseView
@@ -22,6 +24,103 @@ class BaseUser:
         return {None}
 
 
+class UserCache:
+    """
+    In-process cache of users resolved by tokens, size-bounded LRU with expire time.
+    Invalid tokens are cached too (for `negative_ttl`), repeated bad tokens won't hit the database.
+
+        app = Application(user_cache=UserCache(ttl=60))
+
+    Entries should be invalidated when a token is revoked or the roles of a user changed:
+        app.user_cache.invalidate(token)
+        app.user_cache.invalidate_user(user.id)
+    Note: it's per process, other processes see the changes after `ttl`.
+    """
+
+    def __init__(self, ttl: float = 60, negative_ttl: float = 10, max_size=10000):
+        """
+        :param ttl: seconds
+        :param negative_ttl: seconds for invalid tokens, 0 to disable
+        :param max_size:
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self._data: 'OrderedDict[Hashable, Tuple[float, Optional[BaseUser]]]' = OrderedDict()
+        self._tokens_by_user: Dict[Any, Set[Hashable]] = {}
+
+    def __len__(self):
+        return len(self._data)
+
+    @staticmethod
+    def get_user_id(user: BaseUser) -> Any:
+        return getattr(user, 'id', None)
+
+    @staticmethod
+    def cacheable(token) -> bool:
+        """
+        Tokens like lists or dicts (e.g. from secure cookies) are not cached
+        """
+        try:
+            hash(token)
+            return True
+        except TypeError:
+            return False
+
+    def get(self, token: Hashable) -> Tuple[bool, Optional[BaseUser]]:
+        """
+        :return: (hit, user)
+        """
+        item = self._data.get(token)
+        if item is None:
+            return False, None
+
+        expire_at, user = item
+        if expire_at < time.monotonic():
+            self._remove(token)
+            return False, None
+
+        self._data.move_to_end(token)
+        return True, user
+
+    def set(self, token: Hashable, user: Optional[BaseUser]):
+        ttl = self.ttl if user is not None else self.negative_ttl
+        if ttl <= 0:
+            return
+
+        self._remove(token)
+        self._data[token] = (time.monotonic() + ttl, user)
+        if user is not None:
+            self._tokens_by_user.setdefault(self.get_user_id(user), set()).add(token)
+
+        while len(self._data) > self.max_size:
+            self._remove(next(iter(self._data)))
+
+    def _remove(self, token: Hashable):
+        item = self._data.pop(token, None)
+        if item and item[1] is not None:
+            user_id = self.get_user_id(item[1])
+            tokens = self._tokens_by_user.get(user_id)
+            if tokens is not None:
+                tokens.discard(token)
+                if not tokens:
+                    del self._tokens_by_user[user_id]
+
+    def invalidate(self, token: Hashable):
+        self._remove(token)
+
+    def invalidate_user(self, user_id: Any):
+        """
+        Invalidate all tokens of the user, e.g. roles changed
+        """
+        for token in list(self._tokens_by_user.get(user_id, ())):
+            self._remove(token)
+
+    def clear(self):
+        self._data.clear()
+        self._tokens_by_user.clear()
+
+
 class BaseUserViewMixin:
     """
     应继承此类并实现自己的 UserMixin：
@@ -34,7 +133,26 @@ class BaseUserViewMixin:
 
     def get_current_user(self: Union['BaseUserViewMixin', 'BaseView']):
         key = self.get_user_token()
-        if key: return self.get_user_by_token(key)
+        if key:
+            cache: Optional[UserCache] = self.app.user_cache
+            if cache is None or not cache.cacheable(key):
+                return self.get_user_by_token(key)
+
+            hit, user = cache.get(key)
+            if not hit:
+                user = self.get_user_by_token(key)
+                cache.set(key, user)
+            return user
+
+    def invalidate_user_token(self: Union['BaseUserViewMixin', 'BaseView'], token=None):
+        """
+        Remove the token (current token if None) from `app.user_cache`, call it in `teardown_user_token`
+        """
+        cache: Optional[UserCache] = self.app.user_cache
+        if cache is not None:
+            token = self.get_user_token() if token is None else token
+            if token and cache.cacheable(token):
+                cache.invalidate(token)
 
     @abstractmethod
     def get_user_token(self: Union['BaseUserViewMixin', 'BaseView']):
@@ -72,6 +190,7 @@ class BaseSecureCookieUserViewMixin(BaseUserViewMixin):
 
     def teardown_user_token(self: Union['BaseUserViewMixin', 'BaseView'], token=None):
         """ invalidate the token here"""
+        self.invalidate_user_token(token)
         self.del_cookie('u')
 
 
@@ -2,7 +2,6 @@ import asyncio
 import hashlib
 import logging
 import os
-import time
 import traceback
 from dataclasses import dataclass, field
 from email.utils import formatdate
@@ -16,6 +15,7 @@ from multidict import CIMultiDict, istr
 from multipart import multipart
 
 from slim.base import const
+from slim.base.timing import RequestTiming, _current_timing
 from slim.base.types.route_meta_info import RouteStaticsInfo
 from slim.exception import InvalidResponse
 from slim.utils import async_call
@@ -113,6 +113,7 @@ class ASGIRequest:
     scope: Scope
     receive: Receive
     send: Send
+    timing: RequestTiming = field(default_factory=RequestTiming)
 
     _headers_cache = None
 
@@ -240,11 +241,63 @@ class JSONResponse(Response):
     content_type: str = 'application/json'
     json_dumps: FunctionType = json_ex_dumps
 
+    _body: Optional[bytes] = None
+
+    def dumps(self) -> bytes:
+        """
+        Serialize data, only once
+        """
+        if self._body is None:
+            self._body = self.json_dumps(self.data).encode('utf-8')
+        return self._body
+
+    def make_etag(self) -> str:
+        """
+        Strong ETag of body
+        """
+        return '"%s"' % hashlib.sha1(self.dumps()).hexdigest()
+
     async def get_reader(self, data) -> StreamReadFunc:
+        if self._body is not None and data is self.data:
+            return await super().get_reader(self._body)
         data = self.json_dumps(data)
         return await super().get_reader(data)
 
 
+def etag_match(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check If-None-Match header, weak comparison is used as RFC 7232 required.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    etag = etag[2:] if etag.startswith('W/') else etag
+    for i in if_none_match.split(','):
+        i = i.strip()
+        if i.startswith('W/'):
+            i = i[2:]
+        if i == etag:
+            return True
+    return False
+
+
+def apply_etag(request: 'ASGIRequest', resp: JSONResponse) -> Response:
+    """
+    Add ETag for response, return 304 response if matched
+    """
+    if resp.headers is None:
+        resp.headers = {}
+    etag = resp.headers.get(const.ETAG)
+    if etag is None:
+        etag = resp.make_etag()
+        resp.headers[const.ETAG] = etag
+
+    if etag_match(request.headers.get(const.IF_NONE_MATCH), etag):
+        return Response(304, headers={const.ETAG: etag}, cookies=resp.cookies)
+    return resp
+
+
 @dataclass
 class FileResponse(Response):
     static_file_path: str = None
@@ -311,11 +364,7 @@ async def handle_request(app: 'Application', scope: Scope, receive: Receive, sen
                     for func in app.on_startup:
                         await async_call(func)
                     app.running = True
-
-                    # start timer
-                    for interval_seconds, runner in app._timers_before_running:
-                        loop = asyncio.get_event_loop()
-                        loop.call_later(interval_seconds, runner)
+                    await app.scheduler.start()
 
                     await send({'type': 'lifespan.startup.complete'})
                 except Exception:
@@ -324,6 +373,8 @@ async def handle_request(app: 'Application', scope: Scope, receive: Receive, sen
                     return
 
             elif message['type'] == 'lifespan.shutdown':
+                await app.scheduler.stop()
+                await app.tasks.close()
                 for func in app.on_shutdown:
                     await async_call(func)
 
@@ -331,21 +382,27 @@ async def handle_request(app: 'Application', scope: Scope, receive: Receive, sen
                 return
 
     if scope['type'] == 'http':
-        t = time.perf_counter()
         handler_name = None
         view = None
 
         request = ASGIRequest(scope, receive, send)
+        timing = request.timing
+        timing.metrics = app.metrics
+        timing.slow_query_threshold = app.options.slow_query_threshold
+        timing.n_plus_one_threshold = app.options.n_plus_one_threshold
+        timing_token = _current_timing.set(timing)
         resp = None
 
         try:
             if request.method == 'OPTIONS':
                 resp = Response(200)
             else:
-                route_info, call_kwargs_raw = app.route.query_path(scope['method'], scope['path'])
+                with timing.measure('route'):
+                    route_info, call_kwargs_raw = app.route.query_path(scope['method'], scope['path'])
 
                 if route_info:
                     handler_name = route_info.get_handler_name()
+                    timing.handler_name = handler_name
 
                     if isinstance(route_info, RouteStaticsInfo):
                         resp = await route_info.responder.solve(request, call_kwargs_raw.get('file'))
@@ -361,7 +418,8 @@ async def handle_request(app: 'Application', scope: Scope, receive: Receive, sen
                             del call_kwargs[j]
 
                         # build a view instance
-                        view = await route_info.view_cls._build(app, request)
+                        with timing.measure('prepare'):
+                            view = await route_info.view_cls._build(app, request)
                         view._route_info = call_kwargs
                         app._last_view = view
 
@@ -374,15 +432,18 @@ async def handle_request(app: 'Application', scope: Scope, receive: Receive, sen
                         # note: view.prepare() may case finished
                         if not view.is_finished:
                             # user's validator check
-                            await view_validate_check(view, route_info.va_query, route_info.va_post, route_info.va_headers)
+                            with timing.measure('validate'):
+                                await view_validate_check(view, route_info.va_query, route_info.va_post,
+                                                          route_info.va_headers)
 
                             ret_resp = None
                             if not view.is_finished:
                                 # call the request handler
-                                if asyncio.iscoroutinefunction(handler):
-                                    view_ret = await handler(**call_kwargs)
-                                else:
-                                    view_ret = handler(**call_kwargs)
+                                with timing.measure('handler'):
+                                    if asyncio.iscoroutinefunction(handler):
+                                        view_ret = await handler(**call_kwargs)
+                                    else:
+                                        view_ret = handler(**call_kwargs)
 
                                 if not view.response:
                                     if isinstance(view_ret, Response):
@@ -394,10 +455,17 @@ async def handle_request(app: 'Application', scope: Scope, receive: Receive, sen
 
             if not resp:
                 resp = Response(404, b"Not Found")
+            elif isinstance(resp, JSONResponse):
+                with timing.measure('serialize'):
+                    resp.dumps()
+                if app.options.etag and request.method == 'GET' and resp.status == 200:
+                    resp = apply_etag(request, resp)
 
         except Exception as e:
             traceback.print_exc()
             resp = Response(500, b"Internal Server Error")
+            if view:
+                view._background_tasks.clear()
 
         try:
             # Configure CORS settings.
@@ -411,22 +479,45 @@ async def handle_request(app: 'Application', scope: Scope, receive: Receive, sen
                         resp.headers = i.pack_headers(request)
 
             app._last_resp = resp
-            await resp(scope, receive, send)
+            if app.debug:
+                if resp.headers is None:
+                    resp.headers = {}
+                resp.headers[const.SERVER_TIMING] = timing.server_timing()
 
-            took = round((time.perf_counter() - t) * 1000, 2)
-            # GET /api/get -> TopicView.get 200 30ms
-            path = scope['path']
-            if scope['query_string']:
-                path += '?' + scope['query_string'].decode('ascii')
+            with timing.measure('send'):
+                await resp(scope, receive, send)
+            timing.finish()
 
             if view:
                 view: BaseView
                 await view._on_finish()
 
-            if handler_name:
-                logger.info("{} - {:15s} {:8s} {} -> {}, took {}ms".format(resp.status, scope['client'][0], scope['method'], path, handler_name, took))
-            else:
-                logger.info("{} - {:15s} {:8s} {}, took {}ms".format(resp.status, scope['client'][0], scope['method'], path, took))
+            retcode = view.ret_val.get('code') if view and isinstance(view.ret_val, dict) else None
+            took = round(timing.total * 1000, 2)
+
+            if app.access_log:
+                app.access_log.log(scope['method'], scope['path'], scope['query_string'], resp.status, handler_name,
+                                   scope.get('client'), took, retcode)
+            elif logger.isEnabledFor(logging.INFO):
+                # GET /api/get -> TopicView.get 200 30ms
+                path = scope['path']
+                if scope['query_string']:
+                    path += '?' + scope['query_string'].decode('ascii')
+
+                if handler_name:
+                    logger.info("{} - {:15s} {:8s} {} -> {}, took {}ms".format(resp.status, scope['client'][0], scope['method'], path, handler_name, took))
+                else:
+                    logger.info("{} - {:15s} {:8s} {}, took {}ms".format(resp.status, scope['client'][0], scope['method'], path, took))
+
+            if app.metrics:
+                app.metrics.record_request(handler_name, resp.status, retcode, timing.total)
+
+            if app.on_request_timing:
+                timing.method = scope['method']
+                timing.path = scope['path']
+                timing.status = resp.status
+                for func in app.on_request_timing:
+                    await async_call(func, timing)
 
             if view:  # for debug
                 return view
@@ -436,6 +527,8 @@ async def handle_request(app: 'Application', scope: Scope, receive: Receive, sen
                 raise e
             else:
                 traceback.print_exc()
+        finally:
+            _current_timing.reset(timing_token)
 
     elif scope['type'] == 'websocket':
         request = ASGIRequest(scope, receive, send)
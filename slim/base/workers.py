@@ -0,0 +1,193 @@
+import inspect
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from typing import Optional, List, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .app import Application
+
+logger = logging.getLogger(__name__)
+
+
+def create_socket(host: str, port: int, *, reuse_port=False, backlog=2048) -> socket.socket:
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def uvicorn_options(**options) -> dict:
+    """
+    Options supported by `uvicorn.Config` of the installed version, others (like `timeout_graceful_shutdown`
+    which old versions don't have) are ignored
+    """
+    import uvicorn
+    params = inspect.signature(uvicorn.Config.__init__).parameters
+    return {k: v for k, v in options.items() if k in params}
+
+
+class _Worker:
+    def __init__(self, worker_id: int):
+        self.worker_id = worker_id
+        self.process: Optional[multiprocessing.Process] = None
+        self.ready = None
+        self.started_at = 0.0
+        self.fast_failures = 0  # exited soon after started, restarting is delayed
+        self.restart_at = 0.0
+
+
+class Supervisor:
+    """
+    Prefork workers of an application, used by `app.run(host, port, workers=4)`.
+    Every worker is a forked process running its own uvicorn server and event loop, so startup/shutdown hooks run
+    in every worker. Connections are accepted from a socket shared by workers, or sockets bound with SO_REUSEPORT
+    (`reuse_port=True`, Linux/BSD) which are balanced by the kernel.
+
+    Signals to the supervisor:
+        SIGINT/SIGTERM: graceful shutdown, workers are killed after `graceful_timeout`
+        SIGHUP: rolling restart, workers are replaced one by one, the old one is stopped after the new one ready
+
+    Crashed workers are restarted, a worker keeps crashing on startup is restarted with backoff.
+    Note that in-process states (memory session backend, caches, live queries, websocket connections) are per worker.
+    """
+    poll_interval = 0.2
+    min_uptime = 1  # exited before it (seconds) is regarded as a startup failure
+    max_backoff = 10
+
+    def __init__(self, app: 'Application', host: str, port: int, workers: int, *, reuse_port=False,
+                 graceful_timeout=30, ready_timeout=60, **uvicorn_options):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.reuse_port = reuse_port
+        self.graceful_timeout = graceful_timeout
+        self.ready_timeout = ready_timeout
+        self.uvicorn_options = uvicorn_options
+        self.workers: List[_Worker] = [_Worker(i) for i in range(workers)]
+
+        self._ctx = multiprocessing.get_context('fork')
+        self._sock: Optional[socket.socket] = None
+        self._stopping = False
+        self._reloading = False
+
+    def _worker_main(self, worker_id: int, ready):
+        # Ctrl+C of terminal is handled by the supervisor only
+        os.setpgrp()
+        signal.signal(signal.SIGHUP, signal.SIG_DFL)
+        import uvicorn
+        app = self.app
+        app.worker_id = worker_id
+        app.on_startup.append(ready.set)
+
+        if self.reuse_port:
+            sock = create_socket(self.host, self.port, reuse_port=True)
+        else:
+            sock = self._sock
+
+        config = uvicorn.Config(app, **uvicorn_options(timeout_graceful_shutdown=self.graceful_timeout,
+                                                     **self.uvicorn_options))
+        uvicorn.Server(config).run(sockets=[sock])
+
+    def _spawn(self, worker: _Worker):
+        ready = self._ctx.Event()
+        process = self._ctx.Process(target=self._worker_main, args=(worker.worker_id, ready),
+                                    name='slim-worker-%d' % worker.worker_id, daemon=False)
+        process.start()
+        worker.process = process
+        worker.ready = ready
+        worker.started_at = time.monotonic()
+        logger.info('worker %d started, pid %d', worker.worker_id, process.pid)
+        return process
+
+    def _stop_process(self, process: multiprocessing.Process):
+        if process.is_alive():
+            os.kill(process.pid, signal.SIGTERM)
+        process.join(self.graceful_timeout)
+        if process.is_alive():
+            logger.warning('worker pid %d not stopped in %ss, killed', process.pid, self.graceful_timeout)
+            process.kill()
+            process.join()
+
+    def _handle_exit(self, signum, frame):
+        self._stopping = True
+
+    def _handle_reload(self, signum, frame):
+        self._reloading = True
+
+    def _check_workers(self):
+        now = time.monotonic()
+        for worker in self.workers:
+            process = worker.process
+            if process is not None and not process.is_alive():
+                process.join()
+                worker.process = None
+                if now - worker.started_at < self.min_uptime:
+                    worker.fast_failures += 1
+                else:
+                    worker.fast_failures = 0
+                delay = min(0.5 * 2 ** (worker.fast_failures - 1), self.max_backoff) if worker.fast_failures else 0
+                worker.restart_at = now + delay
+                logger.error('worker %d (pid %d) exited with code %s, restart in %ss', worker.worker_id,
+                             process.pid, process.exitcode, delay)
+
+            if worker.process is None and now >= worker.restart_at:
+                self._spawn(worker)
+
+    def _rolling_restart(self):
+        logger.info('rolling restart of %d workers', len(self.workers))
+        for worker in self.workers:
+            if self._stopping:
+                return
+            old = worker.process
+            new = self._spawn(worker)
+            deadline = time.monotonic() + self.ready_timeout
+            while not worker.ready.wait(self.poll_interval):
+                if not new.is_alive() or self._stopping or time.monotonic() > deadline:
+                    break
+            if not worker.ready.is_set():
+                # the old one keeps serving if the new one failed
+                logger.error('worker %d failed to start on rolling restart', worker.worker_id)
+                if new.is_alive():
+                    self._stop_process(new)
+                worker.process = old
+                continue
+            if old is not None:
+                self._stop_process(old)
+
+    def run(self):
+        if not self.reuse_port:
+            self._sock = create_socket(self.host, self.port)
+
+        signal.signal(signal.SIGINT, self._handle_exit)
+        signal.signal(signal.SIGTERM, self._handle_exit)
+        signal.signal(signal.SIGHUP, self._handle_reload)
+
+        try:
+            for worker in self.workers:
+                self._spawn(worker)
+
+            while not self._stopping:
+                if self._reloading:
+                    self._reloading = False
+                    self._rolling_restart()
+                self._check_workers()
+                time.sleep(self.poll_interval)
+        finally:
+            processes = [x.process for x in self.workers if x.process is not None]
+            for process in processes:
+                if process.is_alive():
+                    os.kill(process.pid, signal.SIGTERM)
+            for process in processes:
+                self._stop_process(process)
+            if self._sock:
+                self._sock.close()
+            logger.info('all workers stopped')
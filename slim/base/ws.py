@@ -1,14 +1,15 @@
 import json
 import logging
+import time
 from abc import abstractmethod
 import asyncio
 
 import typing
-from typing import Set
+from typing import Set, Optional, Dict, Hashable, Iterable
 
 from ._view.base_view import HTTPMixin
 from .types.asgi import Scope, Receive, Send
-from ..utils import async_call
+from ..utils import async_call, get_class_full_name, sentinel
 
 if typing.TYPE_CHECKING:
     from .web import ASGIRequest, Application
@@ -16,44 +17,232 @@ if typing.TYPE_CHECKING:
 logger = logging.getLogger(__name__)
 
 
+class SlowConsumerPolicy:
+    DROP_OLDEST = 'drop_oldest'  # discard the oldest queued message
+    DROP_NEW = 'drop_new'  # discard the message being queued
+    DISCONNECT = 'disconnect'  # close the connection
+
+
+class BroadcastResult:
+    __slots__ = ('queued', 'dropped', 'disconnected', 'elapsed')
+
+    def __init__(self):
+        self.queued = 0
+        self.dropped = 0
+        self.disconnected = 0
+        self.elapsed = 0.0  # seconds of fan-out
+
+    def __repr__(self):
+        return '<BroadcastResult queued=%d dropped=%d disconnected=%d elapsed=%.6f>' % (
+            self.queued, self.dropped, self.disconnected, self.elapsed)
+
+
+def encode_message(data: [str, bytes]) -> dict:
+    if isinstance(data, bytes):
+        return {'type': 'websocket.send', 'bytes': data}
+    return {'type': 'websocket.send', 'text': data}
+
+
 class WebSocket(HTTPMixin):
     """
     Websocket handler based on asgi document:
     https://asgi.readthedocs.io/en/latest/specs/www.html#websocket
+
+    `send` writes to the connection directly.
+    `enqueue` and `broadcast` put messages to a bounded queue of every connection, written by a task of the connection,
+    so a slow client doesn't hold up others. If the queue of a connection is full, `slow_consumer_policy` is applied.
+
+    Connections could subscribe topics, `publish` sends a message to subscribers of the topic only:
+        self.subscribe('room:1')
+        ChatWebSocket.publish('room:1', 'hello')
+    Subscriptions are removed when the connection closed.
+
+    With `app.ws_bus`, `send_all` and `publish` also reach connections of other worker processes.
     """
     connections: Set['WebSocket']
+    topics: Dict[Hashable, Set['WebSocket']]
+    send_queue_size = 256
+    slow_consumer_policy = SlowConsumerPolicy.DROP_OLDEST
+    slow_consumer_close_code = 1008  # policy violation
+    _app: Optional['Application'] = None  # the application routed to
 
     def __init_subclass__(cls, **kwargs):
         cls.connections = set()
+        cls.topics = {}
 
     def __init__(self, app: 'Application', request: 'ASGIRequest', match_info: typing.Dict):
         super().__init__(app, request)
         self.match_info = match_info
+        self.closed = False
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self.subscriptions: Set[Hashable] = set()
+
+    def subscribe(self, topic: Hashable):
+        self.topics.setdefault(topic, set()).add(self)
+        self.subscriptions.add(topic)
+
+    def unsubscribe(self, topic: Hashable):
+        self.subscriptions.discard(topic)
+        subscribers = self.topics.get(topic)
+        if subscribers is not None:
+            subscribers.discard(self)
+            if not subscribers:
+                del self.topics[topic]
+
+    def unsubscribe_all(self):
+        for topic in list(self.subscriptions):
+            self.unsubscribe(topic)
+
+    def enqueue(self, message: dict) -> bool:
+        """
+        Queue a message (encoded by `encode_message`) to send in the background.
+        :return: False if the message or an old one dropped, or the connection closed by the policy
+        """
+        if self.closed:
+            return False
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.send_queue_size)
+            self._writer = asyncio.ensure_future(self._write_forever())
+
+        item = (message, time.perf_counter())
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        policy = self.slow_consumer_policy
+        if policy == SlowConsumerPolicy.DISCONNECT:
+            self._close_slow()
+            self._record_metrics('slim_ws_slow_disconnect_total', gauge=False)
+            return False
+
+        if policy == SlowConsumerPolicy.DROP_OLDEST:
+            self._queue.get_nowait()
+            self._queue.task_done()
+            self._queue.put_nowait(item)
+        self._record_metrics('slim_ws_dropped_total', gauge=False)
+        return False
+
+    def _on_closed(self):
+        self.closed = True
+        self.connections.discard(self)
+        self.unsubscribe_all()
+        if self.app:
+            self.app.live_queries.remove_connection(self)
+
+    def _discard_queued(self):
+        while not self._queue.empty():
+            self._queue.get_nowait()
+            self._queue.task_done()
+
+    def _close_slow(self):
+        self._on_closed()
+        self._discard_queued()
+        self._queue.put_nowait(({'type': 'websocket.close', 'code': self.slow_consumer_close_code}, None))
+        logger.info('WS slow consumer closed: %r, %d client(s) online' % (id(self), len(self.connections)))
+
+    async def _write_forever(self):
+        send = self.request.send
+        metrics = self.app.metrics if self.app else None
+        if metrics:
+            histogram = metrics.histogram('slim_ws_send_seconds', (('handler', get_class_full_name(type(self))),))
+
+        while True:
+            message, queued_at = await self._queue.get()
+            try:
+                await send(message)
+            except Exception as e:
+                # the client has gone
+                logger.debug('WS send failed: %r, %s' % (id(self), e))
+                self._on_closed()
+                # wake up drain()
+                self._queue.task_done()
+                self._discard_queued()
+                return
+
+            self._queue.task_done()
+            if queued_at is None:
+                return
+            if metrics:
+                histogram.observe(time.perf_counter() - queued_at)
+
+    async def drain(self):
+        """
+        Wait until queued messages are written
+        """
+        if self._queue is not None and not self.closed:
+            await self._queue.join()
+
+    def _stop_writer(self):
+        self.closed = True
+        if self._writer:
+            self._writer.cancel()
+            self._writer = None
+
+    @classmethod
+    def broadcast(cls, data: [str, bytes], connections: Iterable['WebSocket'] = None) -> BroadcastResult:
+        """
+        Encode once and queue to every connection, doesn't wait for sending.
+        :param data:
+        :param connections: `cls.connections` by default
+        """
+        ret = BroadcastResult()
+        start = time.perf_counter()
+        message = encode_message(data)
+        app = None
+
+        for i in list(cls.connections if connections is None else connections):
+            app = i.app
+            if i.enqueue(message):
+                ret.queued += 1
+            elif i.closed:
+                ret.disconnected += 1
+            else:
+                ret.dropped += 1
+
+        ret.elapsed = time.perf_counter() - start
+        if app and app.metrics:
+            app.metrics.observe('slim_ws_broadcast_seconds', ret.elapsed, (('handler', get_class_full_name(cls)),))
+        return ret
 
     async def send(self, data: [str, bytes]):
-        payload = {
-            'type': 'websocket.send',
-        }
-        if isinstance(data, bytes):
-            payload['bytes'] = data
-        elif isinstance(data, str):
-            payload['text'] = data
-        await self.request.send(payload)
+        await self.request.send(encode_message(data))
 
     async def send_json(self, data):
         return await self.send(json.dumps(data))
 
     @classmethod
-    async def send_all(cls, data: [str, bytes]):
-        lst = []
-        for i in cls.connections:
-            lst.append(i.send(data))
-        return await asyncio.gather(*lst)
+    def _bus_publish(cls, data: [str, bytes], topic: Hashable = sentinel):
+        bus = cls._app.ws_bus if cls._app else None
+        if bus:
+            bus.publish(cls, data, topic)
 
     @classmethod
-    async def send_all_json(cls, data):
+    async def send_all(cls, data: [str, bytes]) -> BroadcastResult:
+        """
+        Send to all connections, the result is of connections of current process
+        """
+        cls._bus_publish(data)
+        return cls.broadcast(data)
+
+    @classmethod
+    async def send_all_json(cls, data) -> BroadcastResult:
         return await cls.send_all(json.dumps(data))
 
+    @classmethod
+    def publish(cls, topic: Hashable, data: [str, bytes]) -> BroadcastResult:
+        """
+        Send to subscribers of the topic, encoded once
+        """
+        cls._bus_publish(data, topic)
+        return cls.broadcast(data, cls.topics.get(topic, ()))
+
+    @classmethod
+    def publish_json(cls, topic: Hashable, data) -> BroadcastResult:
+        return cls.publish(topic, json.dumps(data))
+
     async def __call__(self, scope: Scope, receive: Receive, send: Send):
         while True:
             message = await receive()
@@ -61,6 +250,7 @@ class WebSocket(HTTPMixin):
                 # {'type': 'websocket.connect'}
                 await send({'type': 'websocket.accept'})
                 await async_call(self.on_connect)
+                self._record_metrics('slim_ws_connect_total')
 
             elif message['type'] == 'websocket.receive':
                 # {'type': 'websocket.receive', 'text': '111'}
@@ -71,9 +261,20 @@ class WebSocket(HTTPMixin):
 
             elif message['type'] == 'websocket.disconnect':
                 # {'type': 'websocket.disconnect', 'code': 1005}  # 1001  # 1006 timeout
+                self._stop_writer()
                 await async_call(self.on_disconnect, message['code'])
+                self._on_closed()
+                self._record_metrics('slim_ws_disconnect_total')
                 break
 
+    def _record_metrics(self, name, gauge=True):
+        metrics = self.app.metrics if self.app else None
+        if metrics:
+            labels = (('handler', get_class_full_name(type(self))),)
+            metrics.incr(name, labels)
+            if gauge:
+                metrics.set_gauge('slim_ws_connections', len(self.connections), labels)
+
     async def on_connect(self):
         self.connections.add(self)
         logger.debug('WS connected: %r, %d client(s) online' % (id(self), len(self.connections)))
@@ -83,7 +284,8 @@ class WebSocket(HTTPMixin):
         pass
 
     async def on_disconnect(self, code: int):
-        self.connections.remove(self)
+        self.connections.discard(self)
+        self.unsubscribe_all()
 
         if code == 1006:
             logger.debug('WS conn timeout closed: %r, %d client(s) online' % (id(self), len(self.connections)))
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import os
+import secrets
+import socket
+import tempfile
+import time
+from abc import abstractmethod
+from typing import Optional, Dict, List, Type, Hashable, TYPE_CHECKING
+
+import msgpack
+
+from ..utils import get_class_full_name, sentinel
+
+if TYPE_CHECKING:
+    from .app import Application
+    from .ws import WebSocket
+
+logger = logging.getLogger(__name__)
+
+
+class BroadcastBus:
+    """
+    Relay `WebSocket.send_all` and `WebSocket.publish` to other processes, every process sends the message to its
+    own connections. Messages published in one loop iteration are serialized once and sent as a batch.
+
+        app = Application(ws_bus=UnixDatagramBus())
+
+    Subclass it and implement `start`, `send_batch` and `close` for other transports (e.g. a broker for
+    multiple nodes), call `dispatch` with batches received from others.
+    """
+
+    def __init__(self, *, max_batch_size=64 * 1024):
+        """
+        :param max_batch_size: bytes, messages larger than it are not relayed
+        """
+        self.app: Optional['Application'] = None
+        self.max_batch_size = max_batch_size
+        self._pending: List[bytes] = []
+        self._pending_size = 0
+        self._flush_handle: Optional[asyncio.Handle] = None
+        self._classes: Dict[str, Type['WebSocket']] = {}
+
+    @property
+    def running(self) -> bool:
+        return False
+
+    async def start(self):
+        self._classes = {get_class_full_name(x.ws_cls): x.ws_cls for x in self.app.route._websockets}
+
+    @abstractmethod
+    def send_batch(self, payload: bytes):
+        pass
+
+    async def close(self):
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush()
+
+    def publish(self, ws_cls: Type['WebSocket'], data: [str, bytes], topic: Hashable = sentinel):
+        """
+        :param ws_cls:
+        :param data:
+        :param topic: send to subscribers of the topic, or all connections of ws_cls if not set
+        """
+        if not self.running:
+            return
+
+        entry = (get_class_full_name(ws_cls), topic is not sentinel, None if topic is sentinel else topic, data)
+        packed = msgpack.dumps(entry, use_bin_type=True)
+        if len(packed) > self.max_batch_size:
+            logger.warning('message of %s is too large for ws bus (%d bytes), not relayed', entry[0], len(packed))
+            self._record_metrics('slim_ws_bus_dropped_total')
+            return
+
+        if self._pending_size + len(packed) > self.max_batch_size:
+            self._flush()
+        self._pending.append(packed)
+        self._pending_size += len(packed)
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_event_loop().call_soon(self._flush)
+
+    def _flush(self):
+        self._flush_handle = None
+        if not self._pending:
+            return
+        payload = b''.join(self._pending)
+        self._pending = []
+        self._pending_size = 0
+        self.send_batch(payload)
+        self._record_metrics('slim_ws_bus_sent_total')
+
+    def dispatch(self, payload: bytes):
+        """
+        Send messages of a batch from other processes to local connections
+        """
+        self._record_metrics('slim_ws_bus_received_total')
+        unpacker = msgpack.Unpacker(raw=False, use_list=False)
+        unpacker.feed(payload)
+        for name, is_topic, topic, data in unpacker:
+            ws_cls = self._classes.get(name)
+            if ws_cls is None:
+                continue
+            if is_topic:
+                ws_cls.broadcast(data, ws_cls.topics.get(topic, ()))
+            else:
+                ws_cls.broadcast(data)
+
+    def _record_metrics(self, name):
+        metrics = self.app.metrics if self.app else None
+        if metrics:
+            metrics.incr(name)
+
+
+class UnixDatagramBus(BroadcastBus):
+    """
+    Bus of worker processes on the same host, by Unix datagram sockets.
+    Every process binds a socket in a shared directory, batches are sent to all the other sockets in it.
+    The directory is under the temp directory and specified by the supervisor when running with multiple workers
+    (`app.run(..., workers=N)`), the bus is disabled in a single process if `path` not set.
+    """
+    peers_refresh_interval = 1
+
+    def __init__(self, path: Optional[str] = None, *, max_batch_size=64 * 1024):
+        """
+        :param path: directory of sockets
+        :param max_batch_size:
+        """
+        super().__init__(max_batch_size=max_batch_size)
+        self.path = path
+        self.address: Optional[str] = None
+        self._dir: Optional[str] = None
+        self._sock: Optional[socket.socket] = None
+        self._peers: List[str] = []
+        self._peers_updated = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._sock is not None
+
+    async def start(self):
+        await super().start()
+        path = self.path
+        if path is None:
+            if self.app.worker_id is None:
+                logger.debug('ws bus disabled in a single process')
+                return
+            path = os.path.join(tempfile.gettempdir(), 'slim-bus-%d' % os.getppid())
+        os.makedirs(path, mode=0o700, exist_ok=True)
+
+        self.address = os.path.join(path, '%d-%s.sock' % (os.getpid(), secrets.token_hex(4)))
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(self.address)
+        sock.setblocking(False)
+        self._sock = sock
+        self._dir = path
+        asyncio.get_event_loop().add_reader(sock.fileno(), self._on_readable)
+
+    def _get_peers(self) -> List[str]:
+        now = time.monotonic()
+        if now - self._peers_updated > self.peers_refresh_interval:
+            self._peers_updated = now
+            self._peers = [os.path.join(self._dir, x) for x in os.listdir(self._dir)
+                           if x.endswith('.sock') and os.path.join(self._dir, x) != self.address]
+        return self._peers
+
+    def send_batch(self, payload: bytes):
+        if self._sock is None:
+            return
+        for peer in list(self._get_peers()):
+            try:
+                self._sock.sendto(payload, peer)
+            except (FileNotFoundError, ConnectionRefusedError):
+                # the process has gone
+                self._peers.remove(peer)
+                try:
+                    os.unlink(peer)
+                except OSError:
+                    pass
+            except (BlockingIOError, OSError) as e:
+                # receiver is too busy to read
+                logger.warning('ws bus send to %s failed: %s', peer, e)
+                self._record_metrics('slim_ws_bus_dropped_total')
+
+    def _on_readable(self):
+        while self._sock is not None:
+            try:
+                payload = self._sock.recv(self.max_batch_size)
+            except (BlockingIOError, InterruptedError):
+                return
+            try:
+                self.dispatch(payload)
+            except Exception as e:
+                logger.error('ws bus dispatch failed: %s', e)
+
+    async def close(self):
+        await super().close()
+        if self._sock is None:
+            return
+        asyncio.get_event_loop().remove_reader(self._sock.fileno())
+        self._sock.close()
+        self._sock = None
+        try:
+            os.unlink(self.address)
+            os.rmdir(self._dir)  # removed by the last one
+        except OSError:
+            pass
@@ -161,41 +161,18 @@ def must_be_role(role=None):
 
 def timer(interval_seconds, app: 'Application', *, exit_when, loop=None):
     """
-    Set up a timer
+    Set up a timer, it's a fixed rate job of `app.scheduler`
     :param app:
     :param interval_seconds:
     :param exit_when:
-    :param loop:
+    :param loop: deprecated, jobs run in the loop of application
     :return:
     """
     from ..base.app import Application
     assert isinstance(app, Application), 'app must be `Application`'
 
-    if app.running:
-        loop = loop or asyncio.get_event_loop()
-
     def wrapper(func):
-        @functools.wraps(func)
-        def runner():
-            nonlocal loop
-            if exit_when and exit_when():
-                return
-
-            if not loop:
-                loop = loop or asyncio.get_event_loop()
-
-            loop.call_later(interval_seconds, runner)
-
-            if asyncio.iscoroutinefunction(func):
-                asyncio.ensure_future(func())
-            else:
-                func()
-
-        _decorator_fix(runner, func)
-        if loop:
-            loop.call_later(interval_seconds, runner)
-        else:
-            app._timers_before_running.append([interval_seconds, runner])
+        app.scheduler.add(func, interval=interval_seconds, exit_when=exit_when)
         return func
 
     return wrapper
@@ -0,0 +1,20 @@
+from typing import TYPE_CHECKING
+
+from slim.base.metrics import MetricsRegistry
+
+if TYPE_CHECKING:
+    from slim import Application
+    from slim.base.view import RequestView
+
+
+def metrics_serve(app: 'Application', url='/metrics'):
+    """
+    Serve metrics of app in prometheus text format.
+    Called by `Application(metrics_enable=True)`, or manually before `app.prepare()`.
+    """
+    if app.metrics is None:
+        app.metrics = MetricsRegistry()
+
+    @app.route.get(url)
+    async def metrics(request: 'RequestView'):
+        request.finish_raw(app.metrics.render(), content_type='text/plain; version=0.0.4')
@@ -273,6 +273,30 @@ class OpenAPIGenerator:
                                 "properties": view_info['sql_write_schema']
                             }
 
+                        if i.builtin_interface == BuiltinInterface.BULK_SET:
+                            if view_info['sql_cant_write']:
+                                continue
+                            add_returning_header()
+                            request_body_schema = {
+                                "type": "object",
+                                "properties": {
+                                    "items": {
+                                        "type": "array",
+                                        "description": "数据项，pk 为主键值，values 为要写入的值",
+                                        "items": {
+                                            "type": "object",
+                                            "properties": {
+                                                "pk": {},
+                                                "values": {
+                                                    "type": "object",
+                                                    "properties": view_info['sql_write_schema']
+                                                }
+                                            }
+                                        }
+                                    }
+                                }
+                            }
+
                         if i.builtin_interface == BuiltinInterface.NEW:
                             if view_info['sql_cant_create']:
                                 continue
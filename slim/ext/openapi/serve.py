@@ -1,21 +1,73 @@
+import gzip
+import hashlib
 import json
 from posixpath import join as urljoin
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Dict, Optional
 
+from slim.base import const
+from slim.base.web import etag_match
 from slim.ext.openapi.main import get_openapi
+from slim.retcode import RETCODE
 
 if TYPE_CHECKING:
     from slim import Application
     from slim.base.view import RequestView
 
 
-def doc_serve(app: 'Application'):
+class OpenAPIDocument:
+    __slots__ = ('body', 'body_gzip', 'etag')
+
+    def __init__(self, spec: dict, compress=True):
+        self.body = json.dumps(spec, ensure_ascii=False).encode('utf-8')
+        self.body_gzip = gzip.compress(self.body, mtime=0) if compress else None
+        self.etag = '"%s"' % hashlib.sha1(self.body).hexdigest()
+
+
+class OpenAPIDocCache:
+    """
+    Serialized openapi documents of roles, built once at the first request of every role.
+    Call `clear()` if views or permissions are changed after that.
+    """
+
+    def __init__(self, app: 'Application', compress=True):
+        self.app = app
+        self.compress = compress
+        self._docs: Dict[Optional[str], OpenAPIDocument] = {}
+
+    def get(self, role: Optional[str]) -> OpenAPIDocument:
+        doc = self._docs.get(role)
+        if doc is None:
+            doc = self._docs[role] = OpenAPIDocument(get_openapi(self.app, role), self.compress)
+        return doc
+
+    def clear(self):
+        self._docs.clear()
+
+
+def doc_serve(app: 'Application', compress=True):
+    """
+    :param app:
+    :param compress: serve gzip compressed documents to clients accepted
+    """
     spec_url = urljoin(app.mountpoint, '/openapi.json')
+    app.doc_cache = doc_cache = OpenAPIDocCache(app, compress)
 
     @app.route.get(spec_url)
     async def openapi(request: 'RequestView'):
         role = request.params.get('role')
-        request.finish_json(get_openapi(app, role))
+        if role is not None and role not in app.permission.roles:
+            return request.finish(RETCODE.INVALID_ROLE)
+
+        doc = doc_cache.get(role)
+        if etag_match(request.headers.get(const.IF_NONE_MATCH), doc.etag):
+            return request.finish_not_modified(doc.etag)
+
+        headers = {const.ETAG: doc.etag, const.VARY: 'Accept-Encoding'}
+        if doc.body_gzip is not None and 'gzip' in request.headers.get(const.ACCEPT_ENCODING, ''):
+            headers[const.CONTENT_ENCODING] = 'gzip'
+            request.finish_raw(doc.body_gzip, content_type='application/json', headers=headers)
+        else:
+            request.finish_raw(doc.body, content_type='application/json', headers=headers)
 
     @app.route.get('/redoc')
     async def redoc(request: 'RequestView'):
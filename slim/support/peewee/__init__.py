@@ -1 +1,2 @@
 from .view import PeeweeView
+from .replica import ReplicaSet
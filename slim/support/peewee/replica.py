@@ -0,0 +1,68 @@
+import itertools
+import time
+from typing import Sequence, Dict, Hashable
+
+import peewee
+
+
+class ReplicaSet:
+    """
+    Read replicas of a primary database.
+    Reads of views (get/list/load_fk) are routed to replicas, writes always go to the primary.
+    After a write, reads of the same session (or user, or ip) are sent to the primary for `sticky_seconds`,
+    so the client could read its own writes even if replicas are lagging.
+    Note: stickiness is kept in the memory of current process.
+    """
+    POLICIES = ('round_robin', 'least_latency')
+
+    def __init__(self, replicas: Sequence[peewee.Database], policy='round_robin', sticky_seconds: float = 5,
+                 latency_decay=0.2, max_sticky_keys=10000):
+        """
+        :param replicas: databases of replicas
+        :param policy: 'round_robin' or 'least_latency'
+        :param sticky_seconds: read from the primary in this window after a write, 0 to disable
+        :param latency_decay: weight of new sample of the moving average of latency
+        :param max_sticky_keys: expired keys will be purged when the number of keys exceeds it
+        """
+        assert replicas, 'at least one replica is required'
+        assert policy in self.POLICIES, 'policy must be one of %r' % (self.POLICIES,)
+        self.replicas = list(replicas)
+        self.policy = policy
+        self.sticky_seconds = sticky_seconds
+        self.latency_decay = latency_decay
+        self.max_sticky_keys = max_sticky_keys
+
+        self._rr = itertools.cycle(self.replicas)
+        self._latency: Dict[int, float] = {id(x): 0.0 for x in self.replicas}
+        self._sticky: Dict[Hashable, float] = {}
+
+    def choose(self) -> peewee.Database:
+        if self.policy == 'least_latency':
+            return min(self.replicas, key=lambda x: self._latency[id(x)])
+        return next(self._rr)
+
+    def report(self, db: peewee.Database, elapsed: float):
+        """
+        Report time used by a query, for 'least_latency'
+        """
+        key = id(db)
+        if key in self._latency:
+            old = self._latency[key]
+            self._latency[key] = elapsed if old == 0 else old + (elapsed - old) * self.latency_decay
+
+    def mark_write(self, sticky_key: Hashable):
+        if not self.sticky_seconds or sticky_key is None:
+            return
+        now = time.monotonic()
+        if len(self._sticky) >= self.max_sticky_keys:
+            self._sticky = {k: v for k, v in self._sticky.items() if v > now}
+        self._sticky[sticky_key] = now + self.sticky_seconds
+
+    def is_sticky(self, sticky_key: Hashable) -> bool:
+        expire_at = self._sticky.get(sticky_key)
+        if expire_at is None:
+            return False
+        if expire_at < time.monotonic():
+            del self._sticky[sticky_key]
+            return False
+        return True
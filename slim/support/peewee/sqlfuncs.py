@@ -1,13 +1,19 @@
+import io
+import json
 import logging
+import time
+from contextvars import ContextVar
+
 import peewee
 
-from typing import List, Tuple, Iterable, Union
-from playhouse.postgres_ext import ArrayField, SQL
+from typing import List, Tuple, Iterable, Union, Sequence, Any, Optional
+from playhouse.postgres_ext import ArrayField, JSONField, BinaryJSONField, SQL
 
 from slim.support.peewee.data_record import PeeweeDataRecord
-from slim.utils import sentinel
+from slim.utils import sentinel, to_hex
 from ...base.sqlquery import SQL_OP, SQLQueryOrder, SQLQueryInfo, DataRecord, SQLValuesToWrite
 from ...base.sqlfuncs import AbstractSQLFunctions
+from ...base.timing import get_current_timing, QueryRecord
 
 from ...exception import RecordNotFound, AlreadyExists, ResourceException, NotNullConstraintFailed
 
@@ -40,14 +46,137 @@ _peewee_method_map = {
 }
 
 
+# field types could not be used in CAST
+_case_cast_types = {
+    'AUTO': 'INT',
+    'BIGAUTO': 'BIGINT',
+}
+
+_COPY_SQL = "COPY %s (%s) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+
+
+def _copy_quote_ident(name):
+    return '"%s"' % name.replace('"', '""')
+
+
+def _copy_format_array(value):
+    items = []
+    for i in value:
+        if i is None:
+            items.append('NULL')
+        elif isinstance(i, (list, tuple)):
+            items.append(_copy_format_array(i))
+        else:
+            v = _copy_format_value(None, i)
+            items.append('"%s"' % v.replace('\\', '\\\\').replace('"', '\\"'))
+    return '{%s}' % ','.join(items)
+
+
+def _copy_format_value(field, value) -> str:
+    """
+    Convert a python value (after `field.db_value`) to text accepted by postgres `COPY ... FORMAT csv`
+    """
+    value = getattr(value, 'adapted', value)  # psycopg2.extras.Json
+    if isinstance(field, (JSONField, BinaryJSONField)):
+        return json.dumps(value)
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        return '\\x' + to_hex(bytes(value))
+    elif isinstance(value, (list, tuple)):
+        return _copy_format_array(value)
+    return str(value)
+
+
+def _copy_format_row(fields, values) -> str:
+    # NULL is written as unquoted \N, other values are always quoted,
+    # so an empty string or the text "\N" will not be treated as NULL.
+    cells = []
+    for field, value in zip(fields, values):
+        value = field.db_value(value)
+        if value is None:
+            cells.append('\\N')
+        else:
+            cells.append('"%s"' % _copy_format_value(field, value).replace('"', '""'))
+    return ','.join(cells) + '\n'
+
+
+_TRANSACTION_SQL_PREFIX = ('BEGIN', 'SAVEPOINT', 'RELEASE', 'ROLLBACK', 'COMMIT')
+
+
+def trace_database(db: peewee.Database):
+    """
+    Record statements executed by the database to the timing of current request.
+    Only the text of statements is recorded, parameters are not.
+    """
+    if isinstance(db, peewee.Proxy):
+        db = db.obj  # could be initialized later, traced by next call
+    if db is None or getattr(db, '_slim_traced', False):
+        return
+    execute_sql = db.execute_sql
+
+    def traced_execute_sql(sql, params=None, *args, **kwargs):
+        timing = get_current_timing()
+        if timing is None or sql.startswith(_TRANSACTION_SQL_PREFIX):
+            return execute_sql(sql, params, *args, **kwargs)
+
+        start = time.perf_counter()
+        cursor = execute_sql(sql, params, *args, **kwargs)
+        elapsed = time.perf_counter() - start
+
+        ctx = _current_context.get()
+        rows = getattr(cursor, 'rowcount', -1)
+        record = QueryRecord(sql, ctx and ctx.table, ctx and ctx.op, ctx and ctx.view, timing.handler_name,
+                             timing.phase, elapsed, rows if rows >= 0 else None)
+        if ctx:
+            ctx.last_query = record
+        timing.add_query(record)
+        return cursor
+
+    db.execute_sql = traced_execute_sql
+    db._slim_traced = True
+
+
 class PeeweeContext:
-    def __init__(self, db):
+    def __init__(self, db, table: str = None, op: str = None, view: str = None):
+        """
+        :param db:
+        :param table: for metrics
+        :param op: for metrics, select/insert/update/delete
+        :param view: name of the view which queries belong to
+        """
         self.db = db
+        self.table = table
+        self.op = op
+        self.view = view
+        self.timing = None
+        self.start = None
+        self.last_query: Optional[QueryRecord] = None
+        self._token = None
+
+    def set_rows(self, rows: int):
+        """
+        Set row count of the last statement, for databases which not report it for select
+        """
+        if self.last_query and self.last_query.rows is None:
+            self.last_query.rows = rows
 
     def __enter__(self):
-        pass
+        self.timing = get_current_timing()
+        if self.timing:
+            self.start = time.perf_counter()
+            self._token = _current_context.set(self)
+        return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        timing = self.timing
+        if timing:
+            _current_context.reset(self._token)
+            elapsed = time.perf_counter() - self.start
+            timing.add('sql', elapsed)
+            if timing.metrics and self.op:
+                timing.metrics.record_sql(self.table, self.op, elapsed)
+
         db = self.db
         if isinstance(exc_val, peewee.IntegrityError):
             db.rollback()
@@ -61,8 +190,33 @@ class PeeweeContext:
             raise ResourceException("database error")
 
 
+_current_context: ContextVar[Optional[PeeweeContext]] = ContextVar('slim_peewee_context', default=None)
+
+
 # noinspection PyProtectedMember,PyArgumentList
 class PeeweeSQLFunctions(AbstractSQLFunctions):
+    def __init__(self, view_cls, read_db: peewee.Database = None):
+        """
+        :param view_cls:
+        :param read_db: database (replica) for select, the primary of model if None
+        """
+        super().__init__(view_cls)
+        self.read_db = read_db
+        if view_cls.model:
+            trace_database(view_cls.model._meta.database)
+        if read_db:
+            trace_database(read_db)
+
+    def _context(self, db, op):
+        return PeeweeContext(db, self.vcls.table_name, op, self.vcls.__name__)
+
+    def _read_context(self):
+        return self._context(self.read_db or self.vcls.model._meta.database, 'select')
+
+    def _report_read(self, start):
+        if self.read_db:
+            self.vcls.REPLICAS.report(self.read_db, time.perf_counter() - start)
+
     @property
     def _fields(self):
         return self.vcls._peewee_fields
@@ -103,24 +257,28 @@ class PeeweeSQLFunctions(AbstractSQLFunctions):
 
         if nargs: q = q.where(*nargs)  # peewee 不允许 where 时 args 为空
         if orders: q = q.order_by(*orders)
+        if self.read_db: q = q.bind(self.read_db)
         return q
 
     async def select_one(self, info: SQLQueryInfo) -> DataRecord:
-        db = self.vcls.model._meta.database
-        with PeeweeContext(db):
+        start = time.perf_counter()
+        with self._read_context() as ctx:
             try:
                 item = self._make_select(info).get()
+                ctx.set_rows(1)
                 return PeeweeDataRecord(None, item, view=self.vcls)
             except self._model.DoesNotExist:
                 raise RecordNotFound(self.vcls.table_name)
+            finally:
+                self._report_read(start)
 
     async def select_page(self, info: SQLQueryInfo, page=1, size=1) -> Tuple[Tuple[DataRecord, ...], int]:
         q = self._make_select(info)
-        db = self.vcls.model._meta.database
+        start = time.perf_counter()
 
         # select may cause transaction aborted
         # for example: select * from xx where id in ()
-        with PeeweeContext(db):
+        with self._read_context() as ctx:
             count = q.count()
 
             # 0.4.2: list api does not return NOT_FOUND anymore
@@ -131,7 +289,20 @@ class PeeweeSQLFunctions(AbstractSQLFunctions):
                 size = count
 
             func = lambda item: PeeweeDataRecord(None, item, view=self.vcls)
-            return tuple(map(func, q.paginate(page, size))), count
+            ret = tuple(map(func, q.paginate(page, size))), count
+            ctx.set_rows(len(ret[0]))
+            self._report_read(start)
+            return ret
+
+    async def select_max(self, info: SQLQueryInfo, column: str) -> Tuple[Any, int]:
+        field = self._fields[column]
+        nargs = self._build_condition(info.conditions)
+        q = self._model.select(peewee.fn.MAX(field), peewee.fn.COUNT(SQL('*')))
+        if nargs: q = q.where(*nargs)
+        if self.read_db: q = q.bind(self.read_db)
+
+        with self._read_context():
+            return q.tuples().get()
 
     def _build_write_condition(self, records: Iterable[DataRecord]):
         records_pk = []
@@ -141,12 +312,9 @@ class PeeweeSQLFunctions(AbstractSQLFunctions):
         # where pk_field in records_pk
         return pk_field << records_pk
 
-    async def update(self, records: Iterable[DataRecord], values: SQLValuesToWrite, returning=False) -> Union[int, Iterable[DataRecord]]:
+    def _build_update_values(self, values: SQLValuesToWrite):
         new_vals = {}
-        model = self.vcls.model
-        db = self.vcls.model._meta.database
         fields = self.vcls._peewee_fields
-        cond = self._build_write_condition(records)
 
         for k, v in values.items():
             if k in fields:
@@ -176,8 +344,15 @@ class PeeweeSQLFunctions(AbstractSQLFunctions):
                         v = field - v
 
                 new_vals[k] = v
+        return new_vals
 
-        with db.atomic(), PeeweeContext(db):
+    async def update(self, records: Iterable[DataRecord], values: SQLValuesToWrite, returning=False) -> Union[int, Iterable[DataRecord]]:
+        model = self.vcls.model
+        db = self.vcls.model._meta.database
+        cond = self._build_write_condition(records)
+        new_vals = self._build_update_values(values)
+
+        with db.atomic(), self._context(db, 'update'):
             if isinstance(db, peewee.PostgresqlDatabase):
                 q = model.update(**new_vals).where(cond)
                 if returning:
@@ -196,12 +371,67 @@ class PeeweeSQLFunctions(AbstractSQLFunctions):
                 to_record = lambda x: PeeweeDataRecord(None, x, view=self.vcls)
                 return list(map(to_record, model.select().where(cond).execute()))
 
+    def _typed_case_value(self, db, field, value):
+        if isinstance(value, peewee.Node):
+            return value
+        value = peewee.Value(field.db_value(value), unpack=False)
+        if isinstance(db, peewee.PostgresqlDatabase) and not isinstance(field, ArrayField):
+            # postgres regards parameters in CASE as text, so cast them to the type of column
+            field_type = _case_cast_types.get(field.field_type, field.field_type)
+            field_type = db.get_context_options()['field_types'].get(field_type, field_type)
+            if field_type:
+                value = peewee.Cast(value, field_type)
+        return value
+
+    async def update_many(self, items: Sequence[Tuple[DataRecord, SQLValuesToWrite]], returning=False,
+                          chunk_size=500) -> Union[int, List[DataRecord]]:
+        model = self.vcls.model
+        db = model._meta.database
+        pk_name = self.vcls.primary_key
+        pk_field = self._fields[pk_name]
+
+        count = 0
+        records = []
+
+        with db.atomic(), self._context(db, 'update'):
+            for i in range(0, len(items), chunk_size):
+                chunk = items[i:i + chunk_size]
+                pks = []
+                columns = {}  # column: [(pk, value), ...]
+
+                for record, values in chunk:
+                    pk = record.get(pk_name)
+                    pks.append(pk)
+                    for k, v in self._build_update_values(values).items():
+                        columns.setdefault(k, []).append((pk, v))
+
+                # UPDATE t SET col = CASE pk WHEN pk1 THEN v1 ... ELSE col END WHERE pk IN (...)
+                new_vals = {}
+                for k, pairs in columns.items():
+                    field = self._fields[k]
+                    whens = [(pk_field.db_value(pk), self._typed_case_value(db, field, v)) for pk, v in pairs]
+                    new_vals[field] = peewee.Case(pk_field, whens, field)
+
+                cond = pk_field << pks
+                q = model.update(new_vals).where(cond)
+
+                if not returning:
+                    count += q.execute()
+                elif isinstance(db, peewee.PostgresqlDatabase):
+                    ret = q.returning(*model._meta.fields.values()).execute()
+                    records.extend(PeeweeDataRecord(None, x, view=self.vcls) for x in ret)
+                else:
+                    q.execute()
+                    records.extend(PeeweeDataRecord(None, x, view=self.vcls) for x in model.select().where(cond))
+
+        return records if returning else count
+
     async def insert(self, values_lst: Iterable[SQLValuesToWrite], returning=False, ignore_exists=False) -> Union[int, List[DataRecord]]:
         # 基本上，单条插入时，不忽略重复，多条时忽略
         model = self.vcls.model
         db = model._meta.database
 
-        with db.atomic(), PeeweeContext(db):
+        with db.atomic(), self._context(db, 'insert'):
             if isinstance(db, peewee.PostgresqlDatabase):
                 # 对 postgres 可以直接使用 returning，另外防止一种default的bug
                 # https://github.com/coleifer/peewee/issues/1555
@@ -239,9 +469,119 @@ class PeeweeSQLFunctions(AbstractSQLFunctions):
                     count = q.execute()
                     return count
 
+    def _copy_table_sql(self):
+        meta = self.vcls.model._meta
+        table_sql = _copy_quote_ident(meta.table_name)
+        if meta.schema:
+            table_sql = '%s.%s' % (_copy_quote_ident(meta.schema), table_sql)
+        return table_sql
+
+    def _copy_chunk(self, cursor, columns: Sequence[str], rows: Sequence[SQLValuesToWrite], returning, ignore_exists,
+                    staging_sql=None):
+        """
+        Write one chunk by COPY.
+        With `staging_sql`, rows are copied into the staging table and then merged into the table,
+        the staging table is created once by caller and reused across chunks.
+        """
+        model = self.vcls.model
+        meta = model._meta
+        fields = [self._fields[x] for x in columns]
+        columns_sql = ', '.join(_copy_quote_ident(x.column_name) for x in fields)
+        table_sql = self._copy_table_sql()
+
+        buf = io.StringIO()
+        for values in rows:
+            buf.write(_copy_format_row(fields, [values[x] for x in columns]))
+        buf.seek(0)
+
+        if not staging_sql:
+            cursor.copy_expert(_COPY_SQL % (table_sql, columns_sql), buf)
+            return cursor.rowcount
+
+        cursor.execute('TRUNCATE %s' % staging_sql)
+        cursor.copy_expert(_COPY_SQL % (staging_sql, columns_sql), buf)
+        sql = 'INSERT INTO %s (%s) SELECT %s FROM %s' % (table_sql, columns_sql, columns_sql, staging_sql)
+        if ignore_exists:
+            sql += ' ON CONFLICT DO NOTHING'
+        if not returning:
+            cursor.execute(sql)
+            return cursor.rowcount
+
+        cursor.execute(sql + ' RETURNING *')
+        names = [x[0] for x in cursor.description]
+        items = []
+        for row in cursor.fetchall():
+            data = {}
+            for name, value in zip(names, row):
+                field = meta.columns.get(name)
+                if field:
+                    data[field.name] = field.python_value(value)
+            items.append(PeeweeDataRecord(None, model(**data), view=self.vcls))
+        return items
+
+    async def copy_insert(self, values_lst: Sequence[SQLValuesToWrite], returning=False, ignore_exists=False,
+                          chunk_size=1000) -> Union[int, List[DataRecord]]:
+        model = self.vcls.model
+        db = model._meta.database
+
+        is_pg = isinstance(db, peewee.PostgresqlDatabase)
+        if not is_pg and returning:
+            return await super().copy_insert(values_lst, returning, ignore_exists, chunk_size)
+
+        # COPY skips peewee, fill python side defaults like insert_many does
+        defaults = model._meta.defaults if is_pg else None
+
+        # rows should have the same columns in one statement, group them first
+        groups = {}
+        for values in values_lst:
+            if defaults:
+                values = dict(values)
+                for field, default in defaults.items():
+                    if field.name not in values:
+                        values[field.name] = default() if callable(default) else default
+            groups.setdefault(tuple(values.keys()), []).append(values)
+
+        if not is_pg:
+            # insert_many for each chunk
+            count = 0
+            with db.atomic(), self._context(db, 'insert'):
+                for rows in groups.values():
+                    for i in range(0, len(rows), chunk_size):
+                        q = model.insert_many(rows[i:i + chunk_size])
+                        if ignore_exists:
+                            q = q.on_conflict_ignore()
+                        count += q.execute()
+            return count
+
+        records = []
+        count = 0
+        with db.atomic(), self._context(db, 'insert'):
+            cursor = db.cursor()
+            for columns, rows in groups.items():
+                staging_sql = None
+                if returning or ignore_exists:
+                    # plain COPY can't skip conflicts or return rows, so copy into a staging table
+                    # which has only the columns to write (no constraints), then merge
+                    staging_sql = _copy_quote_ident('_slim_copy_%s' % model._meta.table_name)
+                    columns_sql = ', '.join(_copy_quote_ident(self._fields[x].column_name) for x in columns)
+                    cursor.execute('CREATE TEMPORARY TABLE %s ON COMMIT DROP AS SELECT %s FROM %s WITH NO DATA' %
+                                   (staging_sql, columns_sql, self._copy_table_sql()))
+                for i in range(0, len(rows), chunk_size):
+                    ret = self._copy_chunk(cursor, columns, rows[i:i + chunk_size], returning, ignore_exists,
+                                           staging_sql)
+                    if returning:
+                        records.extend(ret)
+                    else:
+                        count += ret
+                if staging_sql:
+                    # dropped on commit or rollback anyway, drop now because next group may use the name
+                    cursor.execute('DROP TABLE %s' % staging_sql)
+
+        return records if returning else count
+
     async def delete(self, records: Iterable[DataRecord]):
         cond = self._build_write_condition(records)
         db = self.vcls.model._meta.database
 
-        with db.atomic(), PeeweeContext(db):
+        with db.atomic(), self._context(db, 'delete'):
             return self.vcls.model.delete().where(cond).execute()
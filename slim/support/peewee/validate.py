@@ -1,4 +1,5 @@
 from typing import Type, Union
+from weakref import WeakKeyDictionary
 
 import peewee
 from schematics.models import Model, ValidationError, ConversionError
@@ -74,8 +75,22 @@ def field_class_to_schematics_field(field: peewee.Field) -> BaseType:
         return JSONListType(field_class_to_schematics_field(field._ArrayField__field), **kwargs)
 
 
-# noinspection PyProtectedMember
+_model_info_cache = WeakKeyDictionary()
+
+
 def get_pv_model_info(model: Union[peewee.Model, Type[peewee.Model]]):
+    """
+    Reflected info of the model, cached for views over the same model.
+    Note: the result is shared, copy `foreign_keys` before modifying it.
+    """
+    info = _model_info_cache.get(model)
+    if info is None:
+        info = _model_info_cache[model] = _get_pv_model_info(model)
+    return info
+
+
+# noinspection PyProtectedMember
+def _get_pv_model_info(model: Union[peewee.Model, Type[peewee.Model]]):
     new_model_cls: Type[Model] = type(model.__class__.__name__ + 'Validator', (Model,), {})
     foreign_keys = {}
     peewee_fields = {}
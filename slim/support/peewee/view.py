@@ -1,7 +1,8 @@
 import logging
 import peewee
-from typing import Type, Tuple, List, Iterable, Union
+from typing import Type, Tuple, List, Iterable, Union, Sequence, Optional
 
+from slim.support.peewee.replica import ReplicaSet
 from slim.support.peewee.sqlfuncs import PeeweeSQLFunctions
 from slim.support.peewee.validate import get_pv_model_info
 
@@ -14,13 +15,29 @@ logger = logging.getLogger(__name__)
 
 
 class PeeweeSQLViewOptions(SQLViewOptions):
-    def __init__(self, *, list_page_size=20, list_accept_size_from_client=False, model: peewee.Model = None):
+    def __init__(self, *, list_page_size=20, list_accept_size_from_client=False, model: peewee.Model = None,
+                 bulk_insert_mode='insert', bulk_insert_chunk_size=1000, bulk_set_chunk_size=500,
+                 result_cache=None, etag_source=None, coalesce_reads=False,
+                 replicas: Union[Sequence[peewee.Database], ReplicaSet] = None, replica_policy='round_robin',
+                 sticky_seconds=5):
+        """
+        :param replicas: read replicas, reads of get/list/load_fk are routed to them
+        :param replica_policy: 'round_robin' or 'least_latency'
+        :param sticky_seconds: read from the primary in this window after a write of the same session
+        """
         self.model = model
-        super().__init__(list_page_size=list_page_size, list_accept_size_from_client=list_accept_size_from_client)
+        if replicas and not isinstance(replicas, ReplicaSet):
+            replicas = ReplicaSet(replicas, replica_policy, sticky_seconds)
+        self.replicas = replicas
+        super().__init__(list_page_size=list_page_size, list_accept_size_from_client=list_accept_size_from_client,
+                         bulk_insert_mode=bulk_insert_mode, bulk_insert_chunk_size=bulk_insert_chunk_size,
+                         bulk_set_chunk_size=bulk_set_chunk_size, result_cache=result_cache,
+                         etag_source=etag_source, coalesce_reads=coalesce_reads)
 
     def assign(self, obj: Type['PeeweeView']):
         if self.model:
             obj.model = self.model
+        obj.REPLICAS = self.replicas
         super().assign(obj)
 
 
@@ -29,6 +46,7 @@ class PeeweeView(AbstractSQLView):
     _sql_cls = PeeweeSQLFunctions
     options_cls = PeeweeSQLViewOptions
     model = None
+    REPLICAS: Optional[ReplicaSet] = None  # 只读副本，get/list/load_fk 的查询在其中选择
     _peewee_fields = {}
 
     @classmethod
@@ -44,6 +62,36 @@ class PeeweeView(AbstractSQLView):
         AbstractSQLView.cls_init.__func__(cls, False)
         # super().cls_init(False)
 
+    def __init__(self, app=None, req=None):
+        super().__init__(app, req)
+        self._read_sql = None
+
+    async def _sticky_key(self):
+        if self.session and self.session.key:
+            return 's', self.session.key
+        if self.can_get_user:
+            token = self.get_user_token()
+            if token:
+                return 'u', token
+        return 'ip', str(await self.get_ip())
+
+    async def _get_read_sql(self) -> PeeweeSQLFunctions:
+        if not self.REPLICAS:
+            return self._sql
+
+        if self._read_sql is None:
+            if self.REPLICAS.is_sticky(await self._sticky_key()):
+                # read your writes
+                self._read_sql = self._sql
+            else:
+                self._read_sql = self._sql_cls(self.__class__, self.REPLICAS.choose())
+        return self._read_sql
+
+    async def _after_write(self, inserted=None, updated=None, deleted=None):
+        await super()._after_write(inserted, updated, deleted)
+        if self.REPLICAS:
+            self.REPLICAS.mark_write(await self._sticky_key())
+
     @staticmethod
     async def _fetch_fields(cls_or_self):
         model = cls_or_self.model
@@ -52,6 +100,7 @@ class PeeweeView(AbstractSQLView):
             info = get_pv_model_info(model)
             cls_or_self.table_name = info['table_name']
             cls_or_self.primary_key = info['primary_key']
-            cls_or_self.foreign_keys = info['foreign_keys']
+            # soft foreign keys are added to this dict by views
+            cls_or_self.foreign_keys = {k: v.copy() for k, v in info['foreign_keys'].items()}
             cls_or_self.data_model = info['data_model']
             cls_or_self._peewee_fields = info['_peewee_fields']
@@ -3,6 +3,7 @@ import inspect
 import io
 import json
 import logging
+from contextlib import contextmanager
 from ipaddress import ip_address
 from types import FunctionType
 from typing import Optional, Callable, Union, Dict
@@ -14,6 +15,7 @@ from peewee import SqliteDatabase
 from slim import Application, ALL_PERMISSION
 from slim.base import const
 from slim.base._view.abstract_sql_view import AbstractSQLView
+from slim.base.timing import RequestTiming, get_current_timing, _current_timing
 from slim.base.web import ASGIRequest
 from slim.base._view.err_catch_context import ErrorCatchContext
 from slim.base.types.route_meta_info import RouteInterfaceInfo
@@ -139,6 +141,29 @@ async def make_mocked_view(app, view_cls, method, url, params=None, post=sentine
     return view
 
 
+@contextmanager
+def capture_queries():
+    """
+    Record SQL statements executed in the block, to the timing of current request if exists.
+        with capture_queries() as timing:
+            await invoke_interface(app, TopicView().list)
+        assert timing.query_count == 2
+    :return: RequestTiming, see `queries`, `query_count` and `n_plus_one`
+    """
+    timing = get_current_timing()
+    if timing:
+        yield timing
+        return
+
+    timing = RequestTiming()
+    token = _current_timing.set(timing)
+    try:
+        yield timing
+    finally:
+        timing.finish()
+        _current_timing.reset(token)
+
+
 async def invoke_interface(app: Application, func: FunctionType, params=None, post=sentinel, *, headers=None,
                            method=None, user=None, bulk=False, returning=None, role=None, body: Optional[bytes] = None,
                            content_type='application/json') -> Optional[BaseView]:
@@ -155,7 +180,7 @@ async def invoke_interface(app: Application, func: FunctionType, params=None, po
     :param returning:
     :param role:
     :param content_type:
-    :return:
+    :return: the view, SQL statements executed are recorded in `view.request.timing`
     """
     url = 'mock_url'
 
@@ -191,29 +216,34 @@ async def invoke_interface(app: Application, func: FunctionType, params=None, po
 
     _method = method if method else meta.methods[0]
 
-    view = await make_mocked_view(app, view, _method, url, params=params, post=post, headers=headers,
-                                  body=body, content_type=content_type, user=user)
+    with capture_queries() as timing:
+        if not timing.handler_name:
+            view_cls = view if isinstance(view, type) else type(view)
+            timing.handler_name = '%s.%s' % (view_cls.__name__, func.__name__)
+        view = await make_mocked_view(app, view, _method, url, params=params, post=post, headers=headers,
+                                      body=body, content_type=content_type, user=user)
+        view.request.timing = timing
 
-    if not func_is_method:
-        handler = handler.__get__(view)
+        if not func_is_method:
+            handler = handler.__get__(view)
 
-    # url = info.route.fullpath
-    # _method = next(iter(info.route.method))
-
-    # note: view.prepare() may case finished
-    if not view.is_finished:
-        # user's validator check
-        from slim.base._view.validate import view_validate_check
-        await view_validate_check(view, meta.va_query, meta.va_post, meta.va_headers)
+        # url = info.route.fullpath
+        # _method = next(iter(info.route.method))
 
+        # note: view.prepare() may case finished
         if not view.is_finished:
-            # call the request handler
-            if asyncio.iscoroutinefunction(handler):
-                await handler()
-            else:
-                handler()
-
-            return view
+            # user's validator check
+            from slim.base._view.validate import view_validate_check
+            await view_validate_check(view, meta.va_query, meta.va_post, meta.va_headers)
+
+            if not view.is_finished:
+                # call the request handler
+                if asyncio.iscoroutinefunction(handler):
+                    await handler()
+                else:
+                    handler()
+
+                return view
 
 
 async def make_mocked_ws_request(url):
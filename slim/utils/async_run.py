@@ -20,6 +20,30 @@ def async_corun(coroutine):
     return loop.run_until_complete(coroutine)
 
 
+def run_sync(coroutine):
+    """
+    Run a coroutine until complete in sync code.
+    If an event loop is running in current thread, the coroutine runs in a new loop of another thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(1) as executor:
+            return executor.submit(asyncio.run, coroutine).result()
+
+    try:
+        loop = get_ioloop()
+        if loop.is_closed():
+            raise RuntimeError('event loop is closed')
+    except RuntimeError:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+    return loop.run_until_complete(coroutine)
+
+
 def async_run(func):
     loop = get_ioloop()
     return loop.run_until_complete(func())
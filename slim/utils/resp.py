@@ -0,0 +1,103 @@
+import asyncio
+from typing import Any, Optional, Union
+
+
+class RESPError(Exception):
+    """
+    Error reply of the server
+    """
+    pass
+
+
+def _encode_command(args) -> bytes:
+    buf = [b'*%d\r\n' % len(args)]
+    for i in args:
+        if isinstance(i, str):
+            i = i.encode('utf-8')
+        elif isinstance(i, (int, float)):
+            i = str(i).encode('ascii')
+        buf.append(b'$%d\r\n%s\r\n' % (len(i), i))
+    return b''.join(buf)
+
+
+async def _read_reply(reader: asyncio.StreamReader) -> Any:
+    line = await reader.readuntil(b'\r\n')
+    prefix, data = line[:1], line[1:-2]
+
+    if prefix == b'+':
+        return data.decode('utf-8')
+    elif prefix == b'-':
+        return RESPError(data.decode('utf-8'))
+    elif prefix == b':':
+        return int(data)
+    elif prefix == b'$':
+        length = int(data)
+        if length == -1:
+            return None
+        return (await reader.readexactly(length + 2))[:-2]
+    elif prefix == b'*':
+        length = int(data)
+        if length == -1:
+            return None
+        return [await _read_reply(reader) for _ in range(length)]
+    raise RESPError('invalid reply: %r' % line)
+
+
+class RESPClient:
+    """
+    Minimal asyncio client of redis protocol (RESP2).
+    One connection, commands are sent one by one, reconnected at the next command after a failure.
+
+        client = RESPClient('127.0.0.1', 6379)
+        await client.execute('SET', 'key', b'value', 'PX', 1000)
+        await client.execute('GET', 'key')  # b'value'
+    """
+
+    def __init__(self, host='127.0.0.1', port=6379, *, db=0, password: Optional[str] = None, timeout: float = 5):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def _connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            await self._call(('AUTH', self.password))
+        if self.db:
+            await self._call(('SELECT', self.db))
+
+    async def _call(self, args) -> Any:
+        self._writer.write(_encode_command(args))
+        reply = await _read_reply(self._reader)
+        if isinstance(reply, RESPError):
+            raise reply
+        return reply
+
+    async def execute(self, *args: Union[str, bytes, int, float]) -> Any:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            try:
+                if self._writer is None:
+                    await asyncio.wait_for(self._connect(), self.timeout)
+                return await asyncio.wait_for(self._call(args), self.timeout)
+            except RESPError:
+                raise
+            except BaseException:
+                # the connection is in an unknown state
+                self._close()
+                raise
+
+    def _close(self):
+        if self._writer:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def close(self):
+        self._close()
@@ -3,7 +3,7 @@ from typing import Dict, List, Union, Type
 
 from slim.base.view import BaseView
 from slim.ext.decorator import require_role
-from slim.utils import sentinel, to_bin
+from slim.utils import sentinel, to_bin, to_hex
 from slim.base.user import BaseAccessTokenUserViewMixin, BaseUserViewMixin, BaseUser
 from slim.base.sqlquery import SQLValuesToWrite, DataRecord
 from slim.retcode import RETCODE
@@ -36,14 +36,20 @@ class UserMixin(BaseAccessTokenUserViewMixin):
             if token is None:
                 # clear all tokens
                 UserToken.delete().where(UserToken.user_id == u.id).execute()
+                if self.app.user_cache:
+                    self.app.user_cache.invalidate_user(u.id)
                 return
 
             if token is sentinel:
                 # clear current token
+                self.invalidate_user_token()
                 try:
                     token = to_bin(self.get_user_token())
                 except binascii.Error:
                     return
+            else:
+                # the cache is keyed by the token as the client sent, in hex
+                self.invalidate_user_token(token if isinstance(token, str) else to_hex(token))
             UserToken.delete().where(UserToken.user_id == u.id, UserToken.id == token).execute()
 
 
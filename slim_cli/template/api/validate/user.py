@@ -10,7 +10,7 @@ class SigninDataModel(Model):
     password = StringType(required=True, min_length=6, max_length=64, metadata=ValidatorDoc('Password'))
 
 
-class SignupDataModel(Model):
+class SignupDirectDataModel(Model):
     email = EmailType(min_length=3, max_length=30, required=True, metadata=ValidatorDoc('Email'))
     username = StringType(min_length=2, max_length=30, metadata=ValidatorDoc('Username'))
     password = StringType(required=True, min_length=6, max_length=64, metadata=ValidatorDoc('Password'))
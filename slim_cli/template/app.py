@@ -1,4 +1,5 @@
 from slim import Application, CORSOptions, ALL_PERMISSION, EMPTY_PERMISSION, ApplicationDocInfo
+from slim.base.user import UserCache
 import config
 
 
@@ -8,5 +9,6 @@ app = Application(
     permission=EMPTY_PERMISSION,
     doc_enable=config.DOC_ENABLE,
     doc_info=ApplicationDocInfo(title=config.PROJECT_NAME, description=config.DESC, version=config.VERSION),
-    cors_options=CORSOptions('*', allow_credentials=True, expose_headers="*", allow_headers="*")
+    cors_options=CORSOptions('*', allow_credentials=True, expose_headers="*", allow_headers="*"),
+    user_cache=UserCache(ttl=60)
 )
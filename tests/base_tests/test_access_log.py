@@ -0,0 +1,74 @@
+import io
+import json
+
+import pytest
+from peewee import *
+
+from slim import Application, ALL_PERMISSION
+from slim.base.access_log import AccessLogger
+from slim.support.peewee import PeeweeView
+from slim.tools.test import make_mocked_request
+
+pytestmark = [pytest.mark.asyncio]
+stream = io.StringIO()
+access_log = AccessLogger(stream=stream, sample_rates={'TopicView.get': 0})
+app = Application(cookies_secret=b'123456', permission=ALL_PERMISSION, access_log=access_log)
+db = SqliteDatabase(":memory:")
+
+
+class Topic(Model):
+    title = CharField(max_length=255)
+
+    class Meta:
+        database = db
+
+
+db.create_tables([Topic], safe=True)
+Topic.create(title='Hello')
+
+
+@app.route.view('topic')
+class TopicView(PeeweeView):
+    model = Topic
+
+
+app.prepare()
+
+
+async def request(path, query_string=b''):
+    req = make_mocked_request('GET', path)
+    req.scope['query_string'] = query_string
+
+    async def send(message):
+        pass
+
+    await app(req.scope, req.receive, send, raise_for_resp=True)
+
+
+async def test_access_log():
+    await request('/api/topic/list/1', b'title=Hello')
+    await request('/api/topic/get')  # not sampled
+    await request('/api/not_found')
+    access_log.close()
+
+    lines = [json.loads(x) for x in stream.getvalue().splitlines()]
+    assert len(lines) == 2
+
+    assert lines[0]['method'] == 'GET'
+    assert lines[0]['path'] == '/api/topic/list/1'
+    assert lines[0]['query'] == 'title=Hello'
+    assert lines[0]['status'] == 200
+    assert lines[0]['handler'] == 'TopicView.list'
+    assert lines[0]['retcode'] == 0
+    assert lines[0]['sample_rate'] == 1.0
+
+    assert lines[1]['status'] == 404
+    assert lines[1]['handler'] is None
+
+
+async def test_access_log_sampling():
+    log = AccessLogger(stream=io.StringIO(), sample_rate=0)
+    log.log('GET', '/', b'', 200, None, None, 1.0)
+    log.log('GET', '/', b'', 500, None, None, 1.0)  # errors are always logged
+    log.close()
+    assert len(log.stream.getvalue().splitlines()) == 1
@@ -6,7 +6,7 @@ from requests.cookies import morsel_to_cookie
 from requests.utils import dict_from_cookiejar
 
 from slim import Application, ALL_PERMISSION
-from slim.base.helper import create_signed_value, decode_signed_value, _value_decode, _value_encode
+from slim.base.helper import create_signed_value, decode_signed_value, _value_decode, _value_encode, verified_values
 from slim.base.view import BaseView
 from slim.retcode import RETCODE
 
@@ -30,6 +30,46 @@ def test_sign():
     assert decode_data is None
 
 
+def test_sign_blake2():
+    to_sign = [2, int(time.time()), 'name', {'asd': '测试'}]
+    value = create_signed_value(secret, to_sign)
+    assert decode_signed_value(secret, value) == to_sign
+    assert decode_signed_value(b'other secret', value) is None
+
+    # a long secret
+    value = create_signed_value(secret * 10, to_sign)
+    assert decode_signed_value(secret * 10, value) == to_sign
+
+
+def test_sign_verified_cache():
+    verified_values.clear()
+    value = create_signed_value(secret, [1, 0, 'name', {'a': 1}])
+    data = decode_signed_value(secret, value)
+    data[3]['a'] = 2
+
+    # mutable values are not shared
+    data = decode_signed_value(secret, value)
+    assert data == [1, 0, 'name', {'a': 1}]
+    assert decode_signed_value(secret, value) is not data
+
+    value = create_signed_value(secret, [1, 0, 'name', 'value'])
+    assert decode_signed_value(secret, value) == [1, 0, 'name', 'value']
+    assert decode_signed_value(secret, value) == [1, 0, 'name', 'value']
+    assert decode_signed_value(b'other secret', value) is None
+
+
+def test_secure_cookie_max_age():
+    app = Application(cookies_secret=secret, permission=ALL_PERMISSION)
+    view = BaseView(app)
+    view._cookies_cache = {
+        'old': create_signed_value(secret, [1, int(time.time()) - 40 * 86400, 'old', 'value']),
+        'new': create_signed_value(secret, [2, int(time.time()), 'new', 'value']),
+    }
+    assert view.get_secure_cookie('old') is None
+    assert view.get_secure_cookie('old', max_age_days=None) == 'value'
+    assert view.get_secure_cookie('new') == 'value'
+
+
 def test_app_secure_cookies():
     app = Application(cookies_secret=secret, permission=ALL_PERMISSION)
     cookies_view = BaseView(app)
@@ -1,5 +1,9 @@
+import gzip
+import json
+
 import pytest
 from slim import Application
+from slim.retcode import RETCODE
 from slim.tools.test import invoke_interface, make_mocked_request
 from slim.ext.openapi.serve import doc_serve
 
@@ -19,3 +23,59 @@ async def test_doc_serve():
             assert message['status'] == 200
 
     await app(req.scope, req.receive, send, raise_for_resp=True)
+
+
+async def test_doc_serve_openapi_cached():
+    from peewee import SqliteDatabase, Model, TextField
+    from slim import ALL_PERMISSION
+    from slim.support.peewee import PeeweeView
+
+    app2 = Application(cookies_secret=b'123456', permission=ALL_PERMISSION)
+    db = SqliteDatabase(":memory:")
+
+    class Topic(Model):
+        title = TextField()
+
+        class Meta:
+            database = db
+
+    @app2.route.view('topic')
+    class TopicView(PeeweeView):
+        model = Topic
+
+    app2.prepare()
+
+    async def request(headers=None, path='/openapi.json'):
+        req = make_mocked_request('GET', path, headers=headers)
+        resp = {'body': b''}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                resp['status'] = message['status']
+                resp['headers'] = {k.decode('utf-8').lower(): v.decode('utf-8') for k, v in message['headers']}
+            elif message['type'] == 'http.response.body':
+                resp['body'] += message.get('body', b'')
+
+        await app2(req.scope, req.receive, send, raise_for_resp=True)
+        return resp
+
+    resp = await request()
+    assert resp['status'] == 200
+    etag = resp['headers']['etag']
+    spec = json.loads(resp['body'])
+    assert '/api/topic/get' in spec['paths']
+
+    # served from cache
+    assert app2.doc_cache.get(None).etag == etag
+    resp = await request()
+    assert resp['body'] == app2.doc_cache.get(None).body
+
+    resp = await request({'If-None-Match': etag})
+    assert resp['status'] == 304
+
+    resp = await request({'Accept-Encoding': 'gzip, deflate'})
+    assert resp['headers']['content-encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(resp['body'])) == spec
+
+    resp = await request(path='/openapi.json?role=not_exists')
+    assert json.loads(resp['body'])['code'] == RETCODE.INVALID_ROLE
@@ -0,0 +1,134 @@
+import time
+
+import pytest
+from peewee import *
+
+from slim import Application, ALL_PERMISSION
+from slim.base._view.request_view import RequestView
+from slim.base.cache import ResultCache
+from slim.base.const import ETAG
+from slim.base.web import etag_match
+from slim.retcode import RETCODE
+from slim.support.peewee import PeeweeView
+from slim.support.peewee.view import PeeweeSQLViewOptions
+from slim.tools.test import make_mocked_request, invoke_interface
+
+pytestmark = [pytest.mark.asyncio]
+app = Application(cookies_secret=b'123456', permission=ALL_PERMISSION, etag=True)
+db = SqliteDatabase(":memory:")
+
+
+class Topic(Model):
+    title = CharField(index=True, max_length=255)
+    time = BigIntegerField(index=True, default=time.time)
+
+    class Meta:
+        database = db
+
+
+db.create_tables([Topic], safe=True)
+
+for i in range(5):
+    Topic.create(title='Hello%d' % i, time=i)
+
+
+@app.route.view('topic')
+class TopicView(PeeweeView):
+    options = PeeweeSQLViewOptions(model=Topic, etag_source='time')
+
+
+@app.route.view('topic2')
+class TopicVersionView(PeeweeView):
+    options = PeeweeSQLViewOptions(model=Topic, etag_source='version', result_cache=ResultCache())
+
+
+counter = 0
+
+
+@app.route.get('base')
+def for_test(request: RequestView):
+    global counter
+    request.finish(RETCODE.SUCCESS, counter)
+
+
+app.prepare()
+
+
+async def request(path, headers=None):
+    req = make_mocked_request('GET', path, headers=headers)
+    resp = {}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            resp['status'] = message['status']
+            resp['headers'] = {k.decode('utf-8').lower(): v.decode('utf-8') for k, v in message['headers']}
+        else:
+            resp['body'] = message['body']
+
+    await app(req.scope, req.receive, send, raise_for_resp=True)
+    return resp
+
+
+async def test_etag_match():
+    assert etag_match('"a", "b"', '"b"')
+    assert etag_match('W/"a"', '"a"')
+    assert etag_match('*', '"a"')
+    assert not etag_match('"a"', '"b"')
+    assert not etag_match(None, '"b"')
+
+
+async def test_etag_json_response():
+    global counter
+    resp = await request('/api/base')
+    assert resp['status'] == 200
+    etag = resp['headers']['etag']
+
+    resp = await request('/api/base', {'If-None-Match': etag})
+    assert resp['status'] == 304
+    assert resp['body'] == b''
+
+    counter += 1
+    resp = await request('/api/base', {'If-None-Match': etag})
+    assert resp['status'] == 200
+    assert resp['headers']['etag'] != etag
+
+
+async def test_etag_source_column():
+    resp = await request('/api/topic/list/1')
+    assert resp['status'] == 200
+    etag = resp['headers']['etag']
+
+    resp = await request('/api/topic/list/1', {'If-None-Match': etag})
+    assert resp['status'] == 304
+
+    # other query, other etag
+    resp = await request('/api/topic/list/1?title=Hello1', {'If-None-Match': etag})
+    assert resp['status'] == 200
+
+    Topic.update(time=100).where(Topic.id == 1).execute()
+    resp = await request('/api/topic/list/1', {'If-None-Match': etag})
+    assert resp['status'] == 200
+
+
+async def test_etag_source_version():
+    view = await invoke_interface(app, TopicVersionView().get, params={'id': 2})
+    etag = view.response.headers[ETAG]
+
+    view = await invoke_interface(app, TopicVersionView().get, params={'id': 2}, headers={'If-None-Match': etag})
+    assert view.response.status == 304
+
+    await invoke_interface(app, TopicVersionView().set, params={'id': 3}, post={'title': 'changed'})
+    view = await invoke_interface(app, TopicVersionView().get, params={'id': 2}, headers={'If-None-Match': etag})
+    assert view.ret_val['code'] == RETCODE.SUCCESS
+
+    # versions of another process (or after restart) start from 0 too
+    backend = TopicVersionView.RESULT_CACHE.backend
+    old_etag = view.response.headers[ETAG]
+    nonce, versions = backend.version_nonce, backend._versions.copy()
+    try:
+        backend.version_nonce, backend._versions = 'other', versions
+        view = await invoke_interface(app, TopicVersionView().get, params={'id': 2},
+                                      headers={'If-None-Match': old_etag})
+        assert view.ret_val['code'] == RETCODE.SUCCESS
+    finally:
+        backend.version_nonce = nonce
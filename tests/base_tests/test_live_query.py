@@ -0,0 +1,199 @@
+import json
+
+import pytest
+from peewee import *
+
+from slim import Application, EMPTY_PERMISSION
+from slim.base.live_query import LiveQueryWebSocket
+from slim.base.permission import Ability, A
+from slim.base.sqlquery import SQL_OP
+from slim.base.user import BaseAccessTokenUserViewMixin, BaseUser
+from slim.retcode import RETCODE
+from slim.support.peewee import PeeweeView
+from slim.tools.test import invoke_interface, make_mocked_ws_request
+
+pytestmark = [pytest.mark.asyncio]
+app = Application(cookies_secret=b'123456', permission=EMPTY_PERMISSION)
+db = SqliteDatabase(":memory:")
+
+
+class Topic(Model):
+    title = CharField(max_length=255)
+    board = IntegerField()
+    content = TextField(default='')
+
+    class Meta:
+        table_name = 'topic'
+        database = db
+
+
+class Note(Model):
+    owner = IntegerField()
+    text = TextField(default='')
+
+    class Meta:
+        table_name = 'note'
+        database = db
+
+
+db.create_tables([Topic, Note], safe=True)
+
+visitor = Ability({
+    'topic': {
+        'id': {A.QUERY, A.READ},
+        'title': {A.QUERY, A.QUERY_EX, A.READ},
+        'board': {A.QUERY, A.READ},
+    },
+    'note': {
+        'id': {A.QUERY, A.READ},
+        'owner': {A.QUERY, A.READ},
+        'text': {A.READ},
+    }
+})
+app.permission.add(None, visitor)
+app.permission.add('admin', Ability({'topic': '*', 'note': '*'}))
+
+
+class Admin(BaseUser):
+    id = 1
+    roles = {None, 'admin'}
+
+
+class UserMixin(BaseAccessTokenUserViewMixin):
+    def get_user_by_token(self, token):
+        if token == 'admin':
+            return Admin()
+
+
+@app.route.view('topic')
+class TopicView(PeeweeView, UserMixin):
+    model = Topic
+
+
+@app.route.view('note')
+class NoteView(PeeweeView, UserMixin):
+    model = Note
+
+    async def before_query(self, info):
+        # only my notes
+        if not self.current_user:
+            return self.finish(RETCODE.PERMISSION_DENIED)
+        info.add_condition('owner', SQL_OP.EQ, self.current_user.id)
+
+
+app.route.websocket('live')(LiveQueryWebSocket)
+app.prepare()
+
+
+async def write(func, params, post=None):
+    view = await invoke_interface(app, func, params, post, headers={'Role': 'admin'}, user=Admin(),
+                                  returning=True)
+    assert view.ret_val['code'] == RETCODE.SUCCESS
+    return view.ret_val['data']
+
+
+async def make_conn(token=b'admin'):
+    req = await make_mocked_ws_request('/api/live')
+    if token:
+        req.scope['headers'].append((b'accesstoken', token))
+    sent = []
+
+    async def send(message):
+        sent.append(json.loads(message['text']))
+
+    req.send = send
+    return LiveQueryWebSocket(app, req, {}), sent
+
+
+async def test_live_query_deltas():
+    ws, sent = await make_conn()
+    hub = app.live_queries
+    q = await hub.subscribe(ws, 'topic', {'board': 1})
+    q_other = await hub.subscribe(ws, 'topic', {'board': 2})
+    q_like = await hub.subscribe(ws, 'topic', {'title.like': 'live%'})
+    assert q.index_key == ('board', 1)
+    assert q_like.index_key is None
+
+    async def deltas(func, params, post=None):
+        ret = await write(func, params, post)
+        await ws.drain()
+        items = sorted((x['id'], x['op'], x['record'].get('title')) for x in sent)
+        sent.clear()
+        return ret, items
+
+    ret, items = await deltas(TopicView().new, {}, {'title': 'live 1', 'board': 1, 'content': 'x'})
+    assert items == sorted([(q.id, 'add', 'live 1'), (q_like.id, 'add', 'live 1')])
+    pk = ret['id']
+
+    _, items = await deltas(TopicView().set, {'id': pk}, {'title': 'changed'})
+    assert items == sorted([(q.id, 'update', 'changed'), (q_like.id, 'remove', 'live 1')])
+
+    _, items = await deltas(TopicView().set, {'id': pk}, {'board': 2})
+    assert items == sorted([(q.id, 'remove', 'changed'), (q_other.id, 'add', 'changed')])
+
+    await write(TopicView().new, {}, {'title': 'live 2', 'board': 1, 'content': 'x'})
+    await ws.drain()
+    # permission of the subscriber
+    assert len(sent) == 2
+    assert all(set(x['record'].keys()) == {'id', 'title', 'board'} for x in sent)
+    sent.clear()
+
+    _, items = await deltas(TopicView().delete, {'id': pk})
+    assert items == [(q_other.id, 'remove', 'changed')]
+
+    hub.remove_connection(ws)
+    assert len(hub) == 0
+    assert not hub.has_subscriptions('topic')
+
+
+async def test_live_query_websocket_protocol():
+    ws, sent = await make_conn()
+    await ws.on_receive(json.dumps({'op': 'subscribe', 'table': 'topic', 'query': {'board': 3}, 'role': 'admin',
+                                    'ref': 1}))
+    await ws.on_receive(json.dumps({'op': 'subscribe', 'table': 'not_found', 'ref': 2}))
+    await ws.on_receive(json.dumps({'op': 'subscribe', 'table': 'topic', 'role': 'bad', 'ref': 3}))
+    await ws.on_receive(json.dumps({'op': 'subscribe', 'table': 'topic', 'query': {'content': 'x'}, 'ref': 4}))
+    await ws.drain()
+
+    assert sent[0] == {'op': 'subscribed', 'id': sent[0]['id'], 'ref': 1}
+    assert sent[1]['op'] == 'error' and sent[1]['ref'] == 2
+    assert sent[2]['code'] == RETCODE.INVALID_ROLE
+    assert sent[3]['code'] == RETCODE.PERMISSION_DENIED
+
+    await write(TopicView().new, {}, {'title': 'x', 'board': 3, 'content': 'secret'})
+    await ws.drain()
+    assert sent[4]['op'] == 'add'
+    assert sent[4]['record']['content'] == 'secret'  # read as admin
+
+    await ws.on_receive(json.dumps({'op': 'unsubscribe', 'id': sent[0]['id'], 'ref': 5}))
+    await ws.on_receive(json.dumps({'op': 'unsubscribe', 'id': sent[0]['id'], 'ref': 6}))
+    await ws.drain()
+    assert sent[5]['op'] == 'unsubscribed'
+    assert sent[6]['code'] == RETCODE.NOT_FOUND
+
+    # removed when closed
+    await ws.on_receive(json.dumps({'op': 'subscribe', 'table': 'topic', 'ref': 7}))
+    await ws.drain()
+    assert len(app.live_queries) == 1
+    ws._on_closed()
+    assert len(app.live_queries) == 0
+
+
+async def test_live_query_before_query():
+    ws, sent = await make_conn()
+    q = await app.live_queries.subscribe(ws, 'note', {})
+    assert q.index_key == ('owner', 1)
+
+    await write(NoteView().new, {}, {'owner': 2, 'text': 'not mine'})
+    await write(NoteView().new, {}, {'owner': 1, 'text': 'mine'})
+    await ws.drain()
+    assert [x['record']['text'] for x in sent] == ['mine']
+    app.live_queries.remove_connection(ws)
+
+    # rejected by before_query
+    ws, sent = await make_conn(None)
+    await ws.on_receive(json.dumps({'op': 'subscribe', 'table': 'note', 'ref': 1}))
+    await ws.drain()
+    assert sent == [{'op': 'error', 'ref': 1, 'code': RETCODE.PERMISSION_DENIED, 'data': sent[0]['data'],
+                     'msg': sent[0]['msg']}]
+    assert len(app.live_queries) == 0
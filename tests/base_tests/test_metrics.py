@@ -0,0 +1,95 @@
+import math
+
+import pytest
+from peewee import *
+
+from slim import Application, ALL_PERMISSION
+from slim.base.metrics import MetricsRegistry, Histogram
+from slim.base.ws import WebSocket
+from slim.support.peewee import PeeweeView
+from slim.tools.test import make_mocked_request, make_mocked_ws_request
+
+pytestmark = [pytest.mark.asyncio]
+app = Application(cookies_secret=b'123456', permission=ALL_PERMISSION, metrics_enable=True)
+db = SqliteDatabase(":memory:")
+
+
+class Topic(Model):
+    title = CharField(max_length=255)
+
+    class Meta:
+        database = db
+
+
+db.create_tables([Topic], safe=True)
+Topic.create(title='Hello')
+
+
+@app.route.view('topic')
+class TopicView(PeeweeView):
+    model = Topic
+
+
+@app.route.websocket()
+class WS(WebSocket):
+    async def on_receive(self, data):
+        pass
+
+
+app.prepare()
+
+
+async def request(path):
+    req = make_mocked_request('GET', path)
+    resp = {}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            resp['status'] = message['status']
+        else:
+            resp['body'] = message['body']
+
+    await app(req.scope, req.receive, send, raise_for_resp=True)
+    return resp
+
+
+async def test_metrics_endpoint():
+    await request('/api/topic/list/1')
+    await request('/api/topic/get?id=100')
+
+    req = await make_mocked_ws_request('/api/ws')
+    await app(req.scope, req.receive, req.send)
+
+    resp = await request('/metrics')
+    assert resp['status'] == 200
+    text = resp['body'].decode('utf-8')
+    handler = 'TopicView'
+    assert 'slim_requests_total{handler="%s.list",status="200",retcode="0"} 1' % handler in text
+    assert 'slim_requests_total{handler="%s.get",status="200",retcode="-249"} 1' % handler in text
+    assert 'slim_request_seconds_count{handler="%s.list"} 1' % handler in text
+    assert 'slim_sql_seconds_count{table="topic",op="select"} 2' in text
+    assert 'slim_ws_connect_total{handler="tests.base_tests.test_metrics.WS"} 1' in text
+    assert 'slim_ws_disconnect_total{handler="tests.base_tests.test_metrics.WS"} 1' in text
+
+
+async def test_histogram():
+    h = Histogram()
+    for i in range(1, 101):
+        h.observe(i / 1000)
+    assert h.count == 100
+    assert 0.05 <= h.quantile(0.5) <= 0.06
+    assert 0.099 <= h.quantile(0.99) <= 0.12
+    h.observe(1000)
+    assert h.quantile(1) == math.inf
+
+
+async def test_registry_render():
+    m = MetricsRegistry()
+    m.incr('a_total', (('x', 'a"b'),))
+    m.set_gauge('g', 3)
+    m.observe('h_seconds', 0.001)
+    text = m.render()
+    assert 'a_total{x="a\\"b"} 1' in text
+    assert 'g 3' in text
+    assert 'h_seconds_bucket{le="+Inf"} 1' in text
+    assert 'h_seconds_count 1' in text
@@ -0,0 +1,80 @@
+import logging
+
+import pytest
+from peewee import *
+
+from slim import Application, ALL_PERMISSION
+from slim.support.peewee import PeeweeView
+from slim.tools.test import invoke_interface, capture_queries, make_mocked_request
+
+pytestmark = [pytest.mark.asyncio]
+app = Application(cookies_secret=b'123456', permission=ALL_PERMISSION, slow_query_threshold=0)
+db = SqliteDatabase(":memory:")
+
+
+class Topic(Model):
+    title = CharField(max_length=255)
+
+    class Meta:
+        database = db
+
+
+db.create_tables([Topic], safe=True)
+for i in range(3):
+    Topic.create(title='Hello %d' % i)
+
+
+@app.route.view('topic')
+class TopicView(PeeweeView):
+    model = Topic
+
+
+app.prepare()
+
+timings = []
+app.on_request_timing.append(lambda timing: timings.append(timing))
+
+
+async def test_query_accounting_invoke():
+    view = await invoke_interface(app, TopicView().list, {'title': 'Hello 1'})
+    timing = view.request.timing
+    assert timing.query_count == 2  # count and select
+
+    record = timing.queries[-1]
+    assert record.table == 'topic'
+    assert record.op == 'select'
+    assert record.view == 'TopicView'
+    assert record.handler == 'TopicView.list'
+    assert record.rows == 1
+    # parameters are not recorded
+    assert 'Hello 1' not in record.sql
+    assert '?' in record.sql
+
+
+async def test_query_accounting_n_plus_one():
+    with capture_queries() as timing:
+        for i in range(5):
+            await invoke_interface(app, TopicView().get, {'id': 1})
+
+    assert timing.query_count == 5
+    assert len(timing.n_plus_one) == 1
+    table, sql, times = timing.n_plus_one[0]
+    assert table == 'topic'
+    assert times == 5
+
+
+async def test_query_accounting_request(caplog):
+    timings.clear()
+    req = make_mocked_request('GET', '/api/topic/get')
+
+    async def send(message):
+        pass
+
+    with caplog.at_level(logging.WARNING, logger='slim.base.timing'):
+        await app(req.scope, req.receive, send, raise_for_resp=True)
+
+    timing = timings[0]
+    assert timing.query_count == 1
+    assert timing.to_dict()['counters']['sql_queries'] == 1
+    assert timing.queries[0].handler == 'TopicView.get'
+    assert 'slow query' in caplog.text
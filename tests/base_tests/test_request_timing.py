@@ -0,0 +1,72 @@
+import pytest
+from peewee import *
+
+from slim import Application, ALL_PERMISSION
+from slim.base.timing import RequestTiming, get_current_timing
+from slim.support.peewee import PeeweeView
+from slim.tools.test import make_mocked_request
+
+pytestmark = [pytest.mark.asyncio]
+app = Application(cookies_secret=b'123456', permission=ALL_PERMISSION, debug=True)
+db = SqliteDatabase(":memory:")
+
+
+class Topic(Model):
+    title = CharField(max_length=255)
+
+    class Meta:
+        database = db
+
+
+db.create_tables([Topic], safe=True)
+Topic.create(title='Hello')
+
+
+@app.route.view('topic')
+class TopicView(PeeweeView):
+    model = Topic
+
+
+app.prepare()
+
+timings = []
+app.on_request_timing.append(lambda timing: timings.append(timing))
+
+
+async def request(path):
+    req = make_mocked_request('GET', path)
+    resp = {}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            resp['status'] = message['status']
+            resp['headers'] = {k.decode('utf-8').lower(): v.decode('utf-8') for k, v in message['headers']}
+
+    await app(req.scope, req.receive, send, raise_for_resp=True)
+    return resp
+
+
+async def test_request_timing():
+    timings.clear()
+    resp = await request('/api/topic/list/1')
+    assert resp['status'] == 200
+
+    server_timing = resp['headers']['server-timing']
+    for i in ('route', 'prepare', 'validate', 'handler', 'sql', 'permission', 'serialize', 'total'):
+        assert i + ';dur=' in server_timing
+
+    assert len(timings) == 1
+    timing = timings[0]
+    assert timing.handler_name.endswith('TopicView.list')
+    assert timing.status == 200
+    assert 'send' in timing.phases
+    assert timing.phases['sql'] <= timing.phases['handler'] <= timing.total
+    assert get_current_timing() is None
+
+
+async def test_request_timing_server_timing():
+    timing = RequestTiming()
+    timing.add('sql', 0.001)
+    timing.add('sql', 0.001)
+    timing.finish()
+    assert timing.server_timing().startswith('sql;dur=2.000, total;dur=')
@@ -0,0 +1,125 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from slim import Application
+from slim.base.scheduler import CronExpr, Scheduler, ScheduleMode
+from slim.ext.decorator import D
+
+pytestmark = [pytest.mark.asyncio]
+app = Application(cookies_secret=b'123456', permission=None, metrics_enable=True)
+
+
+async def test_cron_expr():
+    now = datetime(2020, 1, 31, 10, 30, 15)
+    assert CronExpr('*/15 * * * *').next_after(now) == datetime(2020, 1, 31, 10, 45)
+    assert CronExpr('0 9-17/4 * * *').next_after(now) == datetime(2020, 1, 31, 13, 0)
+    assert CronExpr('@monthly').next_after(now) == datetime(2020, 2, 1, 0, 0)
+    assert CronExpr('0 0 29 2 *').next_after(now) == datetime(2020, 2, 29, 0, 0)
+    # 2020-02-03 is a Monday
+    assert CronExpr('0 8 * * 1').next_after(now) == datetime(2020, 2, 3, 8, 0)
+    # day or weekday
+    assert CronExpr('0 8 15 * 7').next_after(now) == datetime(2020, 2, 2, 8, 0)
+
+    for expr in ('* * *', '60 * * * *', '*/0 * * * *'):
+        with pytest.raises(ValueError):
+            CronExpr(expr)
+    with pytest.raises(ValueError):
+        CronExpr('0 0 30 2 *').next_after(now)
+
+
+async def test_scheduler_fixed_rate_overlap_and_errors():
+    scheduler = Scheduler(app)
+    calls = []
+
+    @scheduler.job(interval=0.02, run_immediately=True)
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+
+    @scheduler.job(interval=0.02)
+    def broken():
+        raise ValueError()
+
+    await scheduler.start()
+    await asyncio.sleep(0.15)
+    await scheduler.stop()
+
+    job = scheduler.jobs[slow.__qualname__]
+    assert job.runs == len(calls) >= 2
+    assert job.skipped >= 2  # never overlapped
+    assert job.running == 0
+
+    job = scheduler.jobs[broken.__qualname__]
+    assert job.failures == job.runs >= 3
+    assert isinstance(job.last_error, ValueError)
+    assert ('slim_scheduler_run_seconds' in app.metrics.histograms)
+
+
+async def test_scheduler_fixed_delay():
+    scheduler = Scheduler(app)
+    loop = asyncio.get_event_loop()
+    starts = []
+
+    async def job():
+        starts.append(loop.time())
+        await asyncio.sleep(0.03)
+
+    scheduler.add(job, interval=0.02, mode=ScheduleMode.FIXED_DELAY)
+    await scheduler.start()
+    await asyncio.sleep(0.2)
+    await scheduler.stop()
+
+    assert len(starts) >= 2
+    assert all(b - a >= 0.05 for a, b in zip(starts, starts[1:]))
+
+
+async def test_scheduler_shutdown_cancel():
+    scheduler = Scheduler(app, shutdown_timeout=0.02)
+    state = []
+
+    async def job():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            state.append('cancelled')
+            raise
+
+    scheduler.add(job, interval=10, run_immediately=True)
+    await scheduler.start()
+    await asyncio.sleep(0.01)
+    await scheduler.stop()
+    assert state == ['cancelled']
+
+
+async def test_timer_decorator():
+    calls = []
+    app2 = Application(cookies_secret=b'123456', permission=None)
+
+    @D.timer(0.01, app2, exit_when=lambda: len(calls) >= 3)
+    def tick():
+        calls.append(1)
+
+    await app2.scheduler.start()
+    await asyncio.sleep(0.1)
+    assert len(calls) == 3
+    assert app2.scheduler.jobs[tick.__qualname__]._task is None
+    await app2.scheduler.stop()
+
+
+async def test_timer_decorator_same_name():
+    app2 = Application(cookies_secret=b'123456', permission=None)
+    for i in range(2):
+        D.timer(1, app2, exit_when=None)(lambda: None)
+
+    def tick():
+        pass
+
+    D.timer(1, app2, exit_when=None)(tick)
+    D.timer(2, app2, exit_when=None)(tick)
+    assert len(app2.scheduler.jobs) == 4
+    assert tick.__qualname__ + '#2' in app2.scheduler.jobs
+
+    with pytest.raises(ValueError):
+        app2.scheduler.add(tick, interval=1, name=tick.__qualname__)
@@ -0,0 +1,66 @@
+import time
+
+import pytest
+
+from slim import Application, ALL_PERMISSION
+from slim.base.helper import create_signed_value
+from slim.base.session import CookieSession
+from slim.tools.test import make_mocked_request
+
+pytestmark = [pytest.mark.asyncio]
+app = Application(cookies_secret=b'123456', permission=ALL_PERMISSION, session_cls=CookieSession)
+
+
+@app.route.get('read')
+async def read(view):
+    return {'uid': view.session['uid']}
+
+
+@app.route.get('write')
+async def write(view):
+    view.session['uid'] = 1
+    return {}
+
+
+@app.route.get('nothing')
+async def nothing(view):
+    return {}
+
+
+app.prepare()
+
+
+async def request(path, cookie=None):
+    headers = {'Cookie': 's=%s' % cookie} if cookie else None
+    req = make_mocked_request('GET', path, headers=headers)
+    await app(req.scope, req.receive, lambda message: _noop())
+    return app._last_view
+
+
+async def _noop():
+    pass
+
+
+async def test_session_cookie_lazy():
+    view = await request('/api/nothing')
+    assert not view.session._loaded
+    assert not view._cookie_set
+
+
+async def test_session_cookie_saved_if_dirty():
+    view = await request('/api/write')
+    assert view.session.dirty
+    cookie = view._cookie_set[('s', None, None)]['value']
+
+    view = await request('/api/read', cookie)
+    assert view.session['uid'] == 1
+    assert not view.session.dirty
+    assert not view._cookie_set
+
+
+async def test_session_cookie_refresh_old():
+    timestamp = int(time.time()) - CookieSession.max_age * 3 // 4
+    old = create_signed_value(app.options.cookies_secret, [1, timestamp, 's', {'uid': 2}])
+    view = await request('/api/read', old)
+    assert view.session['uid'] == 2
+    assert ('s', None, None) in view._cookie_set
@@ -0,0 +1,161 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from slim import Application, ALL_PERMISSION
+from slim.base.session import ServerSideSession, MemorySessionBackend, RedisSessionBackend
+from slim.tools.test import make_mocked_request
+from slim.utils.resp import RESPClient, RESPError, _read_reply
+
+pytestmark = [pytest.mark.asyncio]
+
+
+class MemorySession(ServerSideSession):
+    backend = MemorySessionBackend(max_size=2, sweep_interval=None)
+    ttl = 60
+
+
+app = Application(cookies_secret=b'123456', permission=ALL_PERMISSION, session_cls=MemorySession)
+
+
+@app.route.get('signin')
+async def signin(view):
+    key = await view.session.new()
+    view.session['uid'] = 1
+    return {'key': key}
+
+
+@app.route.get('me')
+async def me(view):
+    return {'uid': view.session['uid']}
+
+
+@app.route.get('signout')
+async def signout(view):
+    await view.session.destroy()
+    return {}
+
+
+app.prepare()
+
+
+async def request(path, headers=None):
+    req = make_mocked_request('GET', path, headers=headers)
+    body = []
+
+    async def send(message):
+        if message['type'] == 'http.response.body':
+            body.append(message['body'])
+
+    await app(req.scope, req.receive, send)
+    return json.loads(b''.join(body))
+
+
+class RESPStandIn:
+    """
+    A local stand-in of redis server, supports GET/SET (with EX/PX)/DEL/PING
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, '127.0.0.1', 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def _handle(self, reader, writer):
+        while True:
+            try:
+                args = await _read_reply(reader)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                break
+            cmd = args[0].upper()
+            if cmd == b'PING':
+                writer.write(b'+PONG\r\n')
+            elif cmd == b'SET':
+                expire_at = None
+                if len(args) == 5:
+                    ttl = int(args[4]) / (1000 if args[3].upper() == b'PX' else 1)
+                    expire_at = time.monotonic() + ttl
+                self.data[args[1]] = (expire_at, args[2])
+                writer.write(b'+OK\r\n')
+            elif cmd == b'GET':
+                expire_at, value = self.data.get(args[1], (None, None))
+                if expire_at is not None and expire_at < time.monotonic():
+                    value = None
+                if value is None:
+                    writer.write(b'$-1\r\n')
+                else:
+                    writer.write(b'$%d\r\n%s\r\n' % (len(value), value))
+            elif cmd == b'DEL':
+                writer.write(b':%d\r\n' % (self.data.pop(args[1], None) is not None))
+            else:
+                writer.write(b'-ERR unknown command\r\n')
+        writer.close()
+
+    def close(self):
+        self.server.close()
+
+
+async def test_session_server_side():
+    key = (await request('/api/signin'))['key']
+    assert len(key) > 20
+    assert (await request('/api/me', {'Session': key}))['uid'] == 1
+    assert (await request('/api/me'))['uid'] is None
+
+    # a key not created by server is not accepted
+    assert (await request('/api/me', {'Session': 'forged'}))['uid'] is None
+    assert await MemorySession.backend.get('forged') is None
+
+    await request('/api/signout', {'Session': key})
+    assert (await request('/api/me', {'Session': key}))['uid'] is None
+
+
+async def test_session_memory_backend_lru():
+    backend = MemorySessionBackend(max_size=2, sweep_interval=None)
+    await backend.set('a', {'data': 1}, 60)
+    await backend.set('b', {'data': 2}, 60)
+    await backend.get('a')
+    await backend.set('c', {'data': 3}, 60)
+    assert len(backend) == 2
+    assert await backend.get('b') is None
+    assert await backend.get('a') == {'data': 1}
+
+
+async def test_session_memory_backend_expire():
+    backend = MemorySessionBackend(sweep_interval=0.01)
+    await backend.set('a', {'data': 1}, 0.01)
+    await backend.set('b', {'data': 2}, 60)
+    await asyncio.sleep(0.05)
+    # removed by the sweeper without being accessed
+    assert len(backend) == 1
+    assert await backend.get('b') == {'data': 2}
+    await backend.close()
+
+
+async def test_session_redis_backend():
+    stand_in = RESPStandIn()
+    port = await stand_in.start()
+    client = RESPClient('127.0.0.1', port)
+    backend = RedisSessionBackend(client)
+
+    assert await client.execute('PING') == 'PONG'
+    with pytest.raises(RESPError):
+        await client.execute('UNKNOWN')
+
+    await backend.set('a', {'data': {'uid': 1, 'name': '名字'}, 'ttl': None}, 60)
+    assert await backend.get('a') == {'data': {'uid': 1, 'name': '名字'}, 'ttl': None}
+    assert b'slim:session:a' in stand_in.data
+
+    await backend.set('b', {'data': {}, 'ttl': 0.01}, 0.01)
+    await asyncio.sleep(0.02)
+    assert await backend.get('b') is None
+
+    await backend.delete('a')
+    assert await backend.get('a') is None
+
+    await backend.close()
+    stand_in.close()
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from slim import Application, ALL_PERMISSION
+from slim.base.tasks import TaskQueue
+from slim.tools.test import make_mocked_request
+
+pytestmark = [pytest.mark.asyncio]
+app = Application(cookies_secret=b'123456', permission=ALL_PERMISSION, metrics_enable=True,
+                  tasks=TaskQueue(2, retry_delay=0))
+events = []
+
+
+async def notify(value):
+    await asyncio.sleep(0.01)
+    events.append(('task', value))
+
+
+@app.route.get('ok')
+async def ok(view):
+    view.add_background_task(notify, 1)
+    return {}
+
+
+@app.route.get('error')
+async def error(view):
+    view.add_background_task(notify, 2)
+    raise ValueError()
+
+
+app.prepare()
+
+
+async def request(path):
+    req = make_mocked_request('GET', path)
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            events.append(('response', message['status']))
+
+    await app(req.scope, req.receive, send)
+
+
+async def test_background_task_after_response():
+    events.clear()
+    await request('/api/ok')
+    await request('/api/error')
+    assert events == [('response', 200), ('response', 500)]
+
+    assert await app.tasks.drain(1)
+    assert events[2:] == [('task', 1)]
+    assert app.metrics.get_gauge('slim_tasks_queue_depth') == 0
+    assert 'slim_task_seconds' in app.metrics.histograms
+
+
+async def test_task_queue_retry():
+    queue = TaskQueue(1, retries=2, retry_delay=0)
+    calls = []
+
+    def flaky(n):
+        calls.append(n)
+        if len(calls) < 3:
+            raise ValueError()
+
+    def broken():
+        calls.append('broken')
+        raise ValueError()
+
+    queue.submit(flaky, 1)
+    queue.submit(broken, retries=0)
+    await queue.drain()
+    assert calls == [1, 1, 1, 'broken']
+    await queue.close()
+
+
+async def test_task_queue_bounded_and_close():
+    queue = TaskQueue(2, max_size=3)
+    running = 0
+    max_running = 0
+    done = []
+
+    async def job(i):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(running, max_running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        done.append(i)
+
+    assert all(queue.submit(job, i) for i in range(3))
+    assert not queue.submit(job, 3)  # full
+    await asyncio.sleep(0)
+    assert queue.submit(job, 4)
+
+    # drained on close
+    await queue.close()
+    assert sorted(done) == [0, 1, 2, 4]
+    assert max_running == 2
+    assert not queue.submit(job, 5)
@@ -0,0 +1,114 @@
+import time
+from typing import Union, Type
+
+import pytest
+from peewee import *
+
+from slim import Application, ALL_PERMISSION
+from slim.base.user import BaseAccessTokenUserViewMixin, BaseUserViewMixin, BaseUser, UserCache
+from slim.support.peewee import PeeweeView
+from slim.tools.test import make_mocked_view
+
+pytestmark = [pytest.mark.asyncio]
+app = Application(cookies_secret=b'123456', permission=ALL_PERMISSION, user_cache=UserCache(ttl=60, negative_ttl=60))
+db = SqliteDatabase(":memory:")
+lookups = []
+
+
+class ATestModel(Model):
+    info = BlobField()
+
+    class Meta:
+        table_name = 'test'
+        database = db
+
+
+class User(dict, BaseUser):
+    @property
+    def id(self):
+        return self['id']
+
+
+class UserMixin(BaseAccessTokenUserViewMixin):
+    def get_user_by_token(self: Union['BaseUserViewMixin', 'PeeweeView'], token) -> Type[BaseUser]:
+        lookups.append(token)
+        if token.startswith('valid'):
+            return User({'id': 1})
+
+    def teardown_user_token(self, token=None):
+        self.invalidate_user_token(token)
+
+
+@app.route.view('test')
+class ATestView(PeeweeView, UserMixin):
+    model = ATestModel
+
+
+app.prepare()
+
+
+async def get_user(token):
+    view = await make_mocked_view(app, ATestView, 'GET', '/api/test/get', headers={'AccessToken': token})
+    return view, view.current_user
+
+
+async def test_user_cache():
+    lookups.clear()
+    app.user_cache.clear()
+
+    _, u = await get_user('valid1')
+    assert u == {'id': 1}
+    view, u = await get_user('valid1')
+    assert u == {'id': 1}
+    assert lookups == ['valid1']
+
+    # negative
+    _, u = await get_user('bad')
+    _, u = await get_user('bad')
+    assert u is None
+    assert lookups == ['valid1', 'bad']
+
+    view.teardown_user_token()
+    await get_user('valid1')
+    assert lookups == ['valid1', 'bad', 'valid1']
+
+
+async def test_user_cache_invalidate_user():
+    cache = UserCache()
+    cache.set('a', User({'id': 1}))
+    cache.set('b', User({'id': 1}))
+    cache.set('c', User({'id': 2}))
+    cache.invalidate_user(1)
+    assert cache.get('a') == (False, None)
+    assert cache.get('b') == (False, None)
+    assert cache.get('c') == (True, {'id': 2})
+
+
+async def test_user_cache_expire_and_lru():
+    cache = UserCache(ttl=0.01, negative_ttl=0, max_size=2)
+    cache.set('bad', None)
+    assert len(cache) == 0
+
+    cache.set('a', User({'id': 1}))
+    time.sleep(0.02)
+    assert cache.get('a') == (False, None)
+
+    cache.ttl = 60
+    cache.set('a', User({'id': 1}))
+    cache.set('b', User({'id': 2}))
+    cache.get('a')
+    cache.set('c', User({'id': 3}))
+    assert cache.get('b') == (False, None)
+    assert cache.get('a')[0]
+    assert len(cache._tokens_by_user) == 2
+
+
+async def test_user_cache_unhashable_token():
+    lookups.clear()
+    view = await make_mocked_view(app, ATestView, 'GET', '/api/test/get')
+    view.get_user_token = lambda: ['valid', 1]  # e.g. a list from secure cookie
+    view.get_user_by_token = lambda token: lookups.append(token) or User({'id': 1})
+    assert view.get_current_user() == {'id': 1}
+    assert view.get_current_user() == {'id': 1}
+    assert len(lookups) == 2  # not cached
+    view.invalidate_user_token()
@@ -0,0 +1,67 @@
+import time
+
+import pytest
+from peewee import *
+
+from slim import Application, ALL_PERMISSION
+from slim.retcode import RETCODE
+from slim.support.peewee import PeeweeView
+from slim.support.peewee.sqlfuncs import _copy_format_row
+from slim.support.peewee.view import PeeweeSQLViewOptions
+from slim.tools.test import invoke_interface
+
+pytestmark = [pytest.mark.asyncio]
+app = Application(cookies_secret=b'123456', permission=ALL_PERMISSION)
+db = SqliteDatabase(":memory:")
+
+
+class Topic(Model):
+    title = CharField(index=True, max_length=255)
+    time = BigIntegerField(index=True, default=time.time)
+    content = TextField(null=True)
+    data = BlobField(null=True)
+    flag = BooleanField(default=False)
+
+    class Meta:
+        database = db
+
+
+db.create_tables([Topic], safe=True)
+
+
+@app.route.view('topic')
+class TopicView(PeeweeView):
+    options = PeeweeSQLViewOptions(model=Topic, bulk_insert_mode='copy', bulk_insert_chunk_size=2)
+
+
+app.prepare()
+
+
+async def test_bulk_insert_copy_count():
+    items = [{"title": 't%d' % i, "content": "test"} for i in range(5)]
+    view = await invoke_interface(app, TopicView().bulk_insert, post={'items': items})
+    assert view.ret_val['code'] == RETCODE.SUCCESS
+    assert view.ret_val['data'] == 5
+
+
+async def test_bulk_insert_copy_returning():
+    items = [{"title": 'r%d' % i} for i in range(3)]
+    view = await invoke_interface(app, TopicView().bulk_insert, post={'items': items}, returning=True)
+    assert view.ret_val['code'] == RETCODE.SUCCESS
+    assert [x['title'] for x in view.ret_val['data']] == ['r0', 'r1', 'r2']
+
+
+async def test_bulk_insert_copy_ignore_exists():
+    t = Topic.create(title='exists')
+    items = [{"id": t.id, "title": 'exists2'}, {"title": 'new'}]
+    view = await invoke_interface(app, TopicView().bulk_insert, post={'items': items})
+    assert view.ret_val['code'] == RETCODE.SUCCESS
+    assert view.ret_val['data'] == 1
+
+
+async def test_copy_format_row():
+    fields = [Topic.title, Topic.content, Topic.data, Topic.flag]
+    row = _copy_format_row(fields, ['a "b"', None, b'\x01\xff', True])
+    assert row == '"a ""b""",\\N,"\\x01ff","t"\n'
+    assert _copy_format_row([Topic.content], ['']) == '""\n'
+    assert _copy_format_row([Topic.content], ['\\N']) == '"\\N"\n'
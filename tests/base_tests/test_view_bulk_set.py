@@ -0,0 +1,90 @@
+import time
+
+import pytest
+from peewee import *
+
+from slim import Application, ALL_PERMISSION
+from slim.retcode import RETCODE
+from slim.support.peewee import PeeweeView
+from slim.tools.test import invoke_interface
+
+pytestmark = [pytest.mark.asyncio]
+app = Application(cookies_secret=b'123456', permission=ALL_PERMISSION)
+db = SqliteDatabase(":memory:")
+
+
+class Topic(Model):
+    title = CharField(index=True, max_length=255)
+    time = BigIntegerField(index=True)
+    content = TextField()
+    count = IntegerField(default=0)
+
+    class Meta:
+        database = db
+
+
+db.create_tables([Topic], safe=True)
+
+
+for i in range(5):
+    Topic.create(time=time.time(), title='Hello%d' % i, content='World')
+
+
+@app.route.view('topic')
+class TopicView(PeeweeView):
+    model = Topic
+    BULK_SET_CHUNK_SIZE = 2
+
+
+app.prepare()
+
+
+async def test_bulk_set():
+    items = [
+        {'pk': 1, 'values': {'title': 'T1'}},
+        {'pk': '2', 'values': {'content': 'C2'}},
+        {'pk': 3, 'values': {'title': 'T3', 'count.incr': 5}},
+    ]
+    view = await invoke_interface(app, TopicView().bulk_set, post={'items': items})
+    assert view.ret_val['code'] == RETCODE.SUCCESS
+    assert view.ret_val['data'] == 3
+
+    assert Topic.get_by_id(1).title == 'T1'
+    assert Topic.get_by_id(1).content == 'World'
+    assert Topic.get_by_id(2).title == 'Hello1'
+    assert Topic.get_by_id(2).content == 'C2'
+    assert Topic.get_by_id(3).title == 'T3'
+    assert Topic.get_by_id(3).count == 5
+    assert Topic.get_by_id(4).title == 'Hello3'
+
+
+async def test_bulk_set_returning():
+    items = [{'pk': 4, 'values': {'title': 'T4'}}, {'pk': 5, 'values': {'title': 'T5'}}]
+    view = await invoke_interface(app, TopicView().bulk_set, post={'items': items}, returning=True)
+    assert view.ret_val['code'] == RETCODE.SUCCESS
+    assert sorted(x['title'] for x in view.ret_val['data']) == ['T4', 'T5']
+
+
+async def test_bulk_set_not_found():
+    view = await invoke_interface(app, TopicView().bulk_set, post={'items': [{'pk': 100, 'values': {'title': 'a'}}]})
+    assert view.ret_val['code'] == RETCODE.NOT_FOUND
+
+
+async def test_bulk_set_bad_items():
+    view = await invoke_interface(app, TopicView().bulk_set, post={'items': [{'values': {'title': 'a'}}]})
+    assert view.ret_val['code'] == RETCODE.INVALID_POSTDATA
+
+    view = await invoke_interface(app, TopicView().bulk_set, post={'items': [{'pk': 1, 'values': {'asd': 'a'}}]})
+    assert view.ret_val['code'] == RETCODE.INVALID_POSTDATA
+
+    items = [{'pk': 1, 'values': {'title': 'a'}}, {'pk': 1, 'values': {'title': 'b'}}]
+    view = await invoke_interface(app, TopicView().bulk_set, post={'items': items})
+    assert view.ret_val['code'] == RETCODE.INVALID_POSTDATA
+
+
+async def test_bulk_set_partial_not_found():
+    items = [{'pk': 5, 'values': {'title': 'not written'}}, {'pk': 100, 'values': {'title': 'a'}}]
+    view = await invoke_interface(app, TopicView().bulk_set, post={'items': items})
+    assert view.ret_val['code'] == RETCODE.NOT_FOUND
+    assert view.ret_val['data'] == {'missing': [100]}
+    assert Topic.get_by_id(5).title != 'not written'
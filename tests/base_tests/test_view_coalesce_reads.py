@@ -0,0 +1,104 @@
+import asyncio
+import time
+
+import pytest
+from peewee import *
+
+from slim import Application, ALL_PERMISSION
+from slim.retcode import RETCODE
+from slim.support.peewee import PeeweeView
+from slim.support.peewee.view import PeeweeSQLViewOptions
+from slim.tools.test import invoke_interface
+
+pytestmark = [pytest.mark.asyncio]
+app = Application(cookies_secret=b'123456', permission=ALL_PERMISSION)
+db = SqliteDatabase(":memory:")
+
+
+class Topic(Model):
+    title = CharField(index=True, max_length=255)
+    time = BigIntegerField(index=True, default=time.time)
+
+    class Meta:
+        database = db
+
+
+db.create_tables([Topic], safe=True)
+
+for i in range(5):
+    Topic.create(title='Hello%d' % i)
+
+
+@app.route.view('topic')
+class TopicView(PeeweeView):
+    options = PeeweeSQLViewOptions(model=Topic, coalesce_reads=True)
+
+    async def after_read(self, records):
+        for i in records:
+            i['title'] = i['title'] + '!'
+
+
+app.prepare()
+
+queries = []
+
+
+@pytest.fixture(autouse=True)
+def slow_select(monkeypatch):
+    funcs_cls = TopicView._sql_cls
+    select_page, select_one = funcs_cls.select_page, funcs_cls.select_one
+
+    async def slow_select_page(self, *args, **kwargs):
+        queries.append('page')
+        await asyncio.sleep(0.05)
+        return await select_page(self, *args, **kwargs)
+
+    async def slow_select_one(self, *args, **kwargs):
+        queries.append('one')
+        await asyncio.sleep(0.05)
+        return await select_one(self, *args, **kwargs)
+
+    monkeypatch.setattr(funcs_cls, 'select_page', slow_select_page)
+    monkeypatch.setattr(funcs_cls, 'select_one', slow_select_one)
+    queries.clear()
+
+
+async def test_coalesce_list():
+    views = await asyncio.gather(*[invoke_interface(app, TopicView().list) for _ in range(5)])
+    assert queries == ['page']
+    for view in views:
+        assert view.ret_val['code'] == RETCODE.SUCCESS
+        # after_read works on records of each request
+        assert view.ret_val['data']['items'][0]['title'] == 'Hello0!'
+
+    await invoke_interface(app, TopicView().list)
+    assert queries == ['page', 'page']
+
+
+async def test_coalesce_different_query():
+    await asyncio.gather(
+        invoke_interface(app, TopicView().list, params={'id': 1}),
+        invoke_interface(app, TopicView().list, params={'id': 2}),
+    )
+    assert queries == ['page', 'page']
+
+
+async def test_coalesce_get_not_found():
+    views = await asyncio.gather(*[invoke_interface(app, TopicView().get, params={'id': 100}) for _ in range(3)])
+    assert queries == ['one']
+    assert all(view.ret_val['code'] == RETCODE.NOT_FOUND for view in views)
+    assert not TopicView._inflight_reads
+
+
+async def test_coalesce_leader_cancelled():
+    leader = asyncio.ensure_future(invoke_interface(app, TopicView().list))
+    await asyncio.sleep(0.01)
+    followers = asyncio.gather(*[invoke_interface(app, TopicView().list) for _ in range(2)])
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    # followers run the query again instead of being cancelled
+    views = await followers
+    assert all(view.ret_val['code'] == RETCODE.SUCCESS for view in views)
+    assert queries == ['page', 'page']
+    assert leader.cancelled()
@@ -0,0 +1,61 @@
+import pytest
+from peewee import *
+
+from slim import Application, ALL_PERMISSION
+from slim.support.peewee import PeeweeView
+from slim.tools.test import make_mocked_view
+
+pytestmark = [pytest.mark.asyncio]
+db = SqliteDatabase(":memory:")
+
+
+class Topic(Model):
+    title = CharField(max_length=255)
+    user_id = IntegerField(null=True)
+
+    class Meta:
+        database = db
+
+
+db.create_tables([Topic], safe=True)
+
+
+async def test_fetch_fields_in_prepare():
+    # views could be defined when an event loop is running
+    app = Application(cookies_secret=b'123456', permission=ALL_PERMISSION)
+
+    @app.route.view('topic')
+    class TopicView(PeeweeView):
+        model = Topic
+
+        @classmethod
+        def ready(cls):
+            cls.add_soft_foreign_key('user_id', 'user')
+
+    @app.route.view('topic2')
+    class TopicView2(PeeweeView):
+        model = Topic
+
+    assert not TopicView._fields_fetched
+    assert TopicView.table_name is None
+
+    app.prepare()
+    assert TopicView._fields_fetched
+    assert TopicView.table_name == 'topic'
+    assert app.tables['topic'] in (TopicView, TopicView2)
+
+    # reflected info is shared, but soft foreign keys are not
+    assert TopicView.data_model is TopicView2.data_model
+    assert 'user_id' in TopicView.foreign_keys
+    assert 'user_id' not in TopicView2.foreign_keys
+
+
+async def test_fetch_fields_without_app_prepare():
+    app = Application(cookies_secret=b'123456', permission=ALL_PERMISSION)
+
+    class TopicView(PeeweeView):
+        model = Topic
+
+    view = await make_mocked_view(app, TopicView, 'GET', '/api/topic/get')
+    assert view.table_name == 'topic'
+    assert 'title' in view.fields
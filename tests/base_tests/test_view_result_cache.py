@@ -0,0 +1,114 @@
+import time
+
+import pytest
+from peewee import *
+
+from slim import Application, ALL_PERMISSION
+from slim.base.cache import ResultCache, MemoryCacheBackend
+from slim.retcode import RETCODE
+from slim.support.peewee import PeeweeView
+from slim.support.peewee.view import PeeweeSQLViewOptions
+from slim.base.sqlquery import SQLQueryInfo, SQL_OP
+from slim.tools.test import invoke_interface, make_mocked_view
+
+pytestmark = [pytest.mark.asyncio]
+app = Application(cookies_secret=b'123456', permission=ALL_PERMISSION)
+db = SqliteDatabase(":memory:")
+
+
+class Topic(Model):
+    title = CharField(index=True, max_length=255)
+    time = BigIntegerField(index=True, default=time.time)
+    content = TextField(null=True)
+
+    class Meta:
+        database = db
+
+
+db.create_tables([Topic], safe=True)
+
+for i in range(5):
+    Topic.create(title='Hello%d' % i, content='World')
+
+
+@app.route.view('topic')
+class TopicView(PeeweeView):
+    options = PeeweeSQLViewOptions(model=Topic, result_cache=ResultCache(ttl=60))
+
+
+app.prepare()
+
+
+async def test_result_cache_get():
+    view = await invoke_interface(app, TopicView().get, params={'id': 1})
+    assert view.ret_val['code'] == RETCODE.SUCCESS
+    assert view.ret_val['data']['title'] == 'Hello0'
+
+    # writes not through slim are invisible until invalidated
+    Topic.update(title='Changed').where(Topic.id == 1).execute()
+    view = await invoke_interface(app, TopicView().get, params={'id': 1})
+    assert view.ret_val['data']['title'] == 'Hello0'
+
+    view = await invoke_interface(app, TopicView().set, params={'id': 1}, post={'content': 'World2'})
+    assert view.ret_val['code'] == RETCODE.SUCCESS
+    view = await invoke_interface(app, TopicView().get, params={'id': 1})
+    assert view.ret_val['data']['title'] == 'Changed'
+    assert view.ret_val['data']['content'] == 'World2'
+
+
+async def test_result_cache_not_found():
+    view = await invoke_interface(app, TopicView().get, params={'id': 100})
+    assert view.ret_val['code'] == RETCODE.NOT_FOUND
+    view = await invoke_interface(app, TopicView().get, params={'id': 100})
+    assert view.ret_val['code'] == RETCODE.NOT_FOUND
+
+    view = await invoke_interface(app, TopicView().new, post={'id': 100, 'title': 'new'})
+    assert view.ret_val['code'] == RETCODE.SUCCESS
+    view = await invoke_interface(app, TopicView().get, params={'id': 100})
+    assert view.ret_val['code'] == RETCODE.SUCCESS
+
+
+async def test_result_cache_list():
+    view = await invoke_interface(app, TopicView().list, params={'title.prefix': 'Hello'})
+    assert view.ret_val['code'] == RETCODE.SUCCESS
+    count = view.ret_val['data']['info']['items_count']
+
+    # select only one column, the cached records should not be affected
+    view = await invoke_interface(app, TopicView().list, params={'title.prefix': 'Hello', 'select': 'title'})
+    assert list(view.ret_val['data']['items'][0].keys()) == ['title']
+    view = await invoke_interface(app, TopicView().list, params={'title.prefix': 'Hello'})
+    assert 'content' in view.ret_val['data']['items'][0].keys()
+
+    view = await invoke_interface(app, TopicView().delete, params={'title': 'Hello4'})
+    assert view.ret_val['code'] == RETCODE.SUCCESS
+    view = await invoke_interface(app, TopicView().list, params={'title.prefix': 'Hello'})
+    assert view.ret_val['data']['info']['items_count'] == count - 1
+
+
+async def test_memory_backend_lru_and_ttl():
+    backend = MemoryCacheBackend(max_size=2)
+    await backend.set('a', 1, 60)
+    await backend.set('b', 2, 60)
+    assert await backend.get('a') == 1
+    await backend.set('c', 3, 60)
+    assert await backend.get('b') is None
+    assert len(backend) == 2
+
+    await backend.set('d', 4, -1)
+    assert await backend.get('d') is None
+
+    assert await backend.get_version('t') == 0
+    assert await backend.incr_version('t') == 1
+
+
+
+async def test_result_cache_get_and_list_keys():
+    view = await make_mocked_view(app, TopicView, 'GET', '/api/topic/get')
+    info = SQLQueryInfo()
+    info.add_condition('id', SQL_OP.EQ, 2)
+    info.bind(view)
+
+    records, count = await view._read_page(info, 1, 1)
+    assert count == 1
+    record = await view._read_one(info)
+    assert record['id'] == 2
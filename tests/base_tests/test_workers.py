@@ -0,0 +1,104 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import textwrap
+import time
+from urllib.request import urlopen
+
+import pytest
+import uvicorn
+
+from slim.base.workers import uvicorn_options
+
+fork_required = pytest.mark.skipif(not hasattr(os, 'fork'), reason='prefork workers need fork')
+
+SCRIPT = textwrap.dedent('''
+    import os, sys
+    from slim import Application, ALL_PERMISSION
+    from slim.base.workers import Supervisor
+
+    Supervisor.min_uptime = 0
+    app = Application(cookies_secret=b'123456', permission=ALL_PERMISSION, log_level=None)
+    state_dir = sys.argv[2]
+
+    @app.route.get('pid')
+    async def pid(view):
+        return {'pid': os.getpid(), 'worker_id': app.worker_id}
+
+    def started():
+        open(os.path.join(state_dir, 'start-%d' % os.getpid()), 'w').close()
+
+    def stopped():
+        open(os.path.join(state_dir, 'stop-%d' % os.getpid()), 'w').close()
+
+    app.on_startup.append(started)
+    app.on_shutdown.append(stopped)
+    app.run('127.0.0.1', int(sys.argv[1]), workers=2, graceful_timeout=5)
+''')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def pids(path, prefix):
+    return {int(x.split('-')[1]) for x in os.listdir(path) if x.startswith(prefix)}
+
+
+def wait_for(func, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        ret = func()
+        if ret:
+            return ret
+        time.sleep(0.05)
+    raise AssertionError('timeout')
+
+
+def test_uvicorn_options(monkeypatch):
+    class OldConfig:
+        def __init__(self, app, host='127.0.0.1', port=8000, loop='auto', http='auto', log_level=None):
+            pass
+
+    monkeypatch.setattr(uvicorn, 'Config', OldConfig)
+    assert uvicorn_options(loop='auto', timeout_graceful_shutdown=30) == {'loop': 'auto'}
+
+
+@fork_required
+def test_prefork_workers(tmp_path):
+    port = free_port()
+    script = tmp_path / 'app.py'
+    script.write_text(SCRIPT)
+    state = tmp_path / 'state'
+    state.mkdir()
+
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    proc = subprocess.Popen([sys.executable, str(script), str(port), str(state)], env=env)
+    try:
+        # startup hooks run in every worker
+        first = wait_for(lambda: len(pids(state, 'start-')) == 2 and pids(state, 'start-'))
+        resp = wait_for(lambda: urlopen('http://127.0.0.1:%d/api/pid' % port).read())
+        assert b'"pid"' in resp
+
+        # crashed worker is restarted
+        victim = next(iter(first))
+        os.kill(victim, signal.SIGKILL)
+        wait_for(lambda: len(pids(state, 'start-')) == 3)
+
+        # rolling restart: every worker replaced and stopped gracefully
+        before = pids(state, 'start-') - {victim}
+        proc.send_signal(signal.SIGHUP)
+        wait_for(lambda: len(pids(state, 'start-')) == 5 and pids(state, 'stop-') >= before)
+        assert urlopen('http://127.0.0.1:%d/api/pid' % port).status == 200
+
+        proc.send_signal(signal.SIGTERM)
+        assert proc.wait(15) == 0
+        assert pids(state, 'stop-') == pids(state, 'start-') - {victim}
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
@@ -48,6 +48,7 @@ class WSSend(WebSocket):
 
         await self.send_all('222')
         await self.send_all_json({'test': [1, 2, 3]})
+        await self.drain()
 
 
 @app.route.websocket('qqq/:test')
@@ -123,6 +124,7 @@ async def test_websocket_send():
         assert message == lst.pop(0)
 
     await app(req.scope, req.receive, send)
+    assert not lst
 
 
 async def test_websocket_regex_route():
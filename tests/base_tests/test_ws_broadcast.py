@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+
+from slim import Application
+from slim.base.ws import WebSocket, SlowConsumerPolicy, encode_message
+from slim.tools.test import make_mocked_ws_request
+
+pytestmark = [pytest.mark.asyncio]
+app = Application(cookies_secret=b'123456', permission=None, metrics_enable=True)
+
+
+@app.route.websocket()
+class WSDrop(WebSocket):
+    send_queue_size = 2
+
+    async def on_receive(self, data):
+        pass
+
+
+@app.route.websocket()
+class WSDisconnect(WebSocket):
+    send_queue_size = 2
+    slow_consumer_policy = SlowConsumerPolicy.DISCONNECT
+
+    async def on_receive(self, data):
+        pass
+
+
+app.prepare()
+
+
+async def make_conn(ws_cls, blocked: asyncio.Event = None):
+    req = await make_mocked_ws_request('/api/ws')
+    sent = []
+
+    async def send(message):
+        if blocked:
+            await blocked.wait()
+        sent.append(message)
+
+    req.send = send
+    ws = ws_cls(app, req, {})
+    ws_cls.connections.add(ws)
+    return ws, sent
+
+
+async def test_ws_broadcast_encode_once():
+    conns = [await make_conn(WSDrop) for _ in range(3)]
+    ret = WSDrop.broadcast('hello')
+    assert ret.queued == 3
+    for ws, _ in conns:
+        await ws.drain()
+
+    messages = [sent[0] for _, sent in conns]
+    assert messages[0] == {'type': 'websocket.send', 'text': 'hello'}
+    assert all(x is messages[0] for x in messages)
+
+    for ws, _ in conns:
+        ws._stop_writer()
+        WSDrop.connections.discard(ws)
+
+
+async def test_ws_broadcast_drop_oldest():
+    blocked = asyncio.Event()
+    fast, fast_sent = await make_conn(WSDrop)
+    slow, slow_sent = await make_conn(WSDrop, blocked)
+
+    results = []
+    for i in range(5):
+        results.append(WSDrop.broadcast(str(i)))
+        await asyncio.sleep(0)  # the fast one keeps up
+    await fast.drain()
+    assert [x['text'] for x in fast_sent] == ['0', '1', '2', '3', '4']
+    assert sum(x.dropped for x in results) >= 2
+
+    blocked.set()
+    await slow.drain()
+    # the newest are kept
+    assert [x['text'] for x in slow_sent][-2:] == ['3', '4']
+    assert 'slim_ws_dropped_total' in app.metrics.counters
+    assert 'slim_ws_send_seconds' in app.metrics.histograms
+
+    for ws in (fast, slow):
+        ws._stop_writer()
+        WSDrop.connections.discard(ws)
+
+
+async def test_ws_broadcast_disconnect_slow():
+    blocked = asyncio.Event()
+    slow, slow_sent = await make_conn(WSDisconnect, blocked)
+
+    results = [WSDisconnect.broadcast(str(i)) for i in range(5)]
+    assert sum(x.disconnected for x in results) == 1
+    assert slow.closed
+    assert slow not in WSDisconnect.connections
+    assert WSDisconnect.broadcast('x').queued == 0
+
+    blocked.set()
+    await asyncio.sleep(0.01)
+    assert slow_sent[-1] == {'type': 'websocket.close', 'code': 1008}
+
+
+async def test_ws_publish_topic():
+    a, a_sent = await make_conn(WSDrop)
+    b, b_sent = await make_conn(WSDrop)
+    a.subscribe('room:1')
+    b.subscribe('room:1')
+    b.subscribe('room:2')
+
+    assert WSDrop.publish('room:1', 'hi').queued == 2
+    assert WSDrop.publish_json('room:2', {'a': 1}).queued == 1
+    assert WSDrop.publish('room:3', 'nobody').queued == 0
+    await a.drain()
+    await b.drain()
+    assert [x['text'] for x in a_sent] == ['hi']
+    assert [x['text'] for x in b_sent] == ['hi', '{"a": 1}']
+
+    a.unsubscribe('room:1')
+    assert WSDrop.topics['room:1'] == {b}
+
+    # removed when disconnected
+    await b.on_disconnect(1001)
+    assert WSDrop.topics == {}
+    assert not b.subscriptions
+
+    a._stop_writer()
+    b._stop_writer()
+    WSDrop.connections.discard(a)
+
+
+async def test_ws_drain_send_failed():
+    gone = asyncio.Event()
+    req = await make_mocked_ws_request('/api/ws')
+
+    async def send(message):
+        await gone.wait()
+        raise ConnectionError()
+
+    req.send = send
+    ws = WSDrop(app, req, {})
+    ws.enqueue(encode_message('a'))
+    ws.enqueue(encode_message('b'))
+
+    drain = asyncio.ensure_future(ws.drain())
+    await asyncio.sleep(0)
+    gone.set()
+    await asyncio.wait_for(drain, 1)
+    assert ws.closed
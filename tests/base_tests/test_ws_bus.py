@@ -0,0 +1,93 @@
+import asyncio
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from slim import Application
+from slim.base.ws import WebSocket
+from slim.base.ws_bus import UnixDatagramBus
+from slim.tools.test import make_mocked_ws_request
+
+pytestmark = [pytest.mark.asyncio, pytest.mark.skipif(not hasattr(os, 'fork'), reason='unix sockets only')]
+
+path = tempfile.mkdtemp(prefix='slim-bus-test-')
+app = Application(cookies_secret=b'123456', permission=None, ws_bus=UnixDatagramBus(path))
+# another worker
+app2 = Application(cookies_secret=b'123456', permission=None, metrics_enable=True, ws_bus=UnixDatagramBus(path))
+
+
+@app.route.websocket()
+class WSChat(WebSocket):
+    async def on_receive(self, data):
+        pass
+
+
+app.prepare()
+app2.prepare()
+
+
+async def make_conn():
+    req = await make_mocked_ws_request('/api/ws_chat')
+    sent = []
+
+    async def send(message):
+        sent.append(message['text'])
+
+    req.send = send
+    ws = WSChat(app, req, {})
+    WSChat.connections.add(ws)
+    return ws, sent
+
+
+async def test_ws_bus_relay():
+    await app.ws_bus.start()
+    await app2.ws_bus.start()
+    a, a_sent = await make_conn()
+    b, b_sent = await make_conn()
+    b.subscribe(('room', 1))
+
+    try:
+        # published by other worker, in one batch
+        app2.ws_bus.publish(WSChat, 'hello')
+        app2.ws_bus.publish(WSChat, 'room msg', ('room', 1))
+        app2.ws_bus.publish(WSChat, 'nobody', ('room', 2))
+        await asyncio.sleep(0.05)
+        await a.drain()
+        await b.drain()
+        assert a_sent == ['hello']
+        assert b_sent == ['hello', 'room msg']
+        assert app2.metrics.counters['slim_ws_bus_sent_total'][()].value == 1
+
+        # local connections are sent once, and relayed to other workers
+        a_sent.clear()
+        ret = await WSChat.send_all('all')
+        assert ret.queued == 2
+        await asyncio.sleep(0.05)
+        await a.drain()
+        assert a_sent == ['all']
+        assert app2.metrics.counters['slim_ws_bus_received_total'][()].value == 1
+
+        # too large
+        app2.ws_bus.publish(WSChat, 'x' * 70000)
+        assert app2.metrics.counters['slim_ws_bus_dropped_total'][()].value == 1
+    finally:
+        a._stop_writer()
+        b._stop_writer()
+        WSChat.connections.clear()
+        WSChat.topics.clear()
+        await app.ws_bus.close()
+        await app2.ws_bus.close()
+
+    assert not os.path.exists(path)
+    shutil.rmtree(path, ignore_errors=True)
+
+
+async def test_ws_bus_single_process():
+    bus = UnixDatagramBus()
+    Application(cookies_secret=b'123456', permission=None, ws_bus=bus)
+    await bus.start()
+    assert not bus.running
+    bus.publish(WSChat, 'x')
+    await bus.close()
@@ -0,0 +1,86 @@
+import os
+import tempfile
+
+import pytest
+from peewee import *
+
+from slim import Application, ALL_PERMISSION
+from slim.base.session import MemoryHeaderKeySession
+from slim.retcode import RETCODE
+from slim.support.peewee import PeeweeView, ReplicaSet
+from slim.support.peewee.view import PeeweeSQLViewOptions
+from slim.tools.test import invoke_interface
+
+pytestmark = [pytest.mark.asyncio]
+app = Application(cookies_secret=b'123456', permission=ALL_PERMISSION, session_cls=MemoryHeaderKeySession)
+
+tmp_dir = tempfile.mkdtemp()
+db = SqliteDatabase(os.path.join(tmp_dir, 'primary.db'))
+replica_dbs = [SqliteDatabase(os.path.join(tmp_dir, 'replica%d.db' % i)) for i in range(2)]
+
+
+class Topic(Model):
+    title = CharField(max_length=255)
+
+    class Meta:
+        database = db
+
+
+# every database has its own data, so we could know where the record is read from
+for i, database in enumerate([db] + replica_dbs):
+    with database.bind_ctx([Topic]):
+        database.create_tables([Topic])
+        Topic.create(id=1, title='db%d' % i)
+
+replicas = ReplicaSet(replica_dbs, sticky_seconds=60)
+
+
+@app.route.view('topic')
+class TopicView(PeeweeView):
+    options = PeeweeSQLViewOptions(model=Topic, replicas=replicas)
+
+
+@app.route.view('topic2')
+class TopicLatencyView(PeeweeView):
+    options = PeeweeSQLViewOptions(model=Topic, replicas=replica_dbs, replica_policy='least_latency')
+
+
+app.prepare()
+
+
+async def test_replica_round_robin():
+    titles = []
+    for i in range(4):
+        view = await invoke_interface(app, TopicView().get, params={'id': 1}, headers={'Session': 'a'})
+        assert view.ret_val['code'] == RETCODE.SUCCESS
+        titles.append(view.ret_val['data']['title'])
+    assert sorted(titles) == ['db1', 'db1', 'db2', 'db2']
+
+
+async def test_replica_write_to_primary_and_sticky():
+    view = await invoke_interface(app, TopicView().new, post={'id': 2, 'title': 'new'}, headers={'Session': 'b'})
+    assert view.ret_val['code'] == RETCODE.SUCCESS
+    assert Topic.get_by_id(2).title == 'new'
+
+    # same session, read from the primary
+    view = await invoke_interface(app, TopicView().get, params={'id': 2}, headers={'Session': 'b'})
+    assert view.ret_val['data']['title'] == 'new'
+
+    # other session, read from replicas
+    view = await invoke_interface(app, TopicView().list, headers={'Session': 'c'})
+    assert view.ret_val['data']['info']['items_count'] == 1
+
+
+async def test_replica_least_latency():
+    replica_set = TopicLatencyView.REPLICAS
+    replica_set.report(replica_dbs[0], 1)
+    replica_set.report(replica_dbs[1], 0.001)
+    view = await invoke_interface(app, TopicLatencyView().get, params={'id': 1})
+    assert view.ret_val['data']['title'] == 'db2'
+
+
+async def test_replica_sticky_expire():
+    replica_set = ReplicaSet(replica_dbs, sticky_seconds=-1)
+    replica_set.mark_write('x')
+    assert not replica_set.is_sticky('x')
+    assert not replica_set.is_sticky('y')